@@ -0,0 +1,68 @@
+"""add indexes to hot lookup paths
+
+Revision ID: 2b8f41c7d9e3
+Revises: 86842d3596d3
+Create Date: 2026-10-18 10:12:41.503127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b8f41c7d9e3'
+down_revision: Union[str, None] = '86842d3596d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_participants_sid_updated_at", "participants", ["sid", "updated_at"])
+    op.create_index("ix_participants_poker_id", "participants", ["poker_id"])
+    op.create_index("ix_participants_keycloak_user_id", "participants", ["keycloak_user_id"])
+
+    op.create_index("ix_stories_poker_id_order", "stories", ["poker_id", "order"])
+
+    op.create_index("ix_pollings_story_id_completed_created_at", "pollings", ["story_id", "completed", "created_at"])
+    op.create_index("ix_pollings_poker_id_completed", "pollings", ["poker_id", "completed"])
+
+    # keeps only the latest vote of each participant before enforcing uniqueness
+    op.execute(
+        """
+        DELETE FROM votes older
+        USING votes newer
+        WHERE older.polling_id = newer.polling_id
+          AND older.participant_id = newer.participant_id
+          AND (older.updated_at, older.id) < (newer.updated_at, newer.id)
+        """
+    )
+    op.create_unique_constraint("uq_votes_polling_id_participant_id", "votes", ["polling_id", "participant_id"])
+    op.create_index("ix_votes_poker_id", "votes", ["poker_id"])
+
+    op.create_index("ix_events_story_id_revealed", "events", ["story_id", "revealed"])
+    op.create_index("ix_events_poker_id_created_at", "events", ["poker_id", "created_at"])
+
+    op.create_index("ix_invites_code_poker_id_expires_at", "invites", ["code", "poker_id", "expires_at"])
+    op.create_index("ix_invites_poker_id", "invites", ["poker_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_invites_poker_id", "invites")
+    op.drop_index("ix_invites_code_poker_id_expires_at", "invites")
+
+    op.drop_index("ix_events_poker_id_created_at", "events")
+    op.drop_index("ix_events_story_id_revealed", "events")
+
+    op.drop_index("ix_votes_poker_id", "votes")
+    op.drop_constraint("uq_votes_polling_id_participant_id", "votes", type_="unique")
+
+    op.drop_index("ix_pollings_poker_id_completed", "pollings")
+    op.drop_index("ix_pollings_story_id_completed_created_at", "pollings")
+
+    op.drop_index("ix_stories_poker_id_order", "stories")
+
+    op.drop_index("ix_participants_keycloak_user_id", "participants")
+    op.drop_index("ix_participants_poker_id", "participants")
+    op.drop_index("ix_participants_sid_updated_at", "participants")
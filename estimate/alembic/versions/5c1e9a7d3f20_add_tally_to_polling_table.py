@@ -0,0 +1,26 @@
+"""add tally to polling table
+
+Revision ID: 5c1e9a7d3f20
+Revises: 2b8f41c7d9e3
+Create Date: 2026-10-18 14:02:17.284615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d3f20'
+down_revision: Union[str, None] = '2b8f41c7d9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("pollings", sa.Column("tally", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("pollings", "tally")
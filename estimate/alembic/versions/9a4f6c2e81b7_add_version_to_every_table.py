@@ -0,0 +1,30 @@
+"""add version to every table
+
+Revision ID: 9a4f6c2e81b7
+Revises: 5c1e9a7d3f20
+Create Date: 2026-10-18 16:41:09.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f6c2e81b7'
+down_revision: Union[str, None] = '5c1e9a7d3f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["pokers", "stories", "events", "participants", "pollings", "votes", "invites"]
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, "version")
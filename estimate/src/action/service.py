@@ -3,11 +3,11 @@ import logging
 from nameko.rpc import rpc, RpcProxy
 from nameko.events import event_handler
 
+from base.logs import log_dump
 from base.service import BaseService
 
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class ActionService(BaseService):
@@ -38,7 +38,7 @@ class ActionService(BaseService):
             "revealed": True,
             "story_id": payload["storyId"]
         })
-        logger.debug(f'registered complete event for story {payload["storyId"]}! {result}')
+        log_dump('registered complete event for story %s!', payload["storyId"], entity=result)
 
     @event_handler("polling_service", "polling_restarted")
     def handle_polling_restarted(self, payload: dict):
@@ -49,4 +49,4 @@ class ActionService(BaseService):
             "revealed": True,
             "story_id": payload["storyId"]
         })
-        logger.debug(f'registered restart event for story {payload["storyId"]}! {result}')
+        log_dump('registered restart event for story %s!', payload["storyId"], entity=result)
@@ -0,0 +1,134 @@
+import logging
+from collections import deque
+
+from kombu import Queue, binding
+from nameko.containers import ServiceContainer as NamekoServiceContainer
+from nameko.extensions import iter_extensions
+from nameko.rpc import Rpc, RpcConsumer, RPC_QUEUE_TEMPLATE, get_rpc_exchange
+from nameko.utils.concurrency import SpawningSet
+
+logger = logging.getLogger(__name__)
+
+SERVICE_WORKERS_KEY = 'SERVICE_WORKERS'
+PRIORITY_QUEUE_TEMPLATE = RPC_QUEUE_TEMPLATE + '-priority'
+
+
+class RegularRpcConsumer(RpcConsumer):
+    """
+    Nameko's rpc consumer, leaving the priority methods to `PriorityRpcConsumer`.
+
+    The rpc queue stays bound to every method of the service, so it also gets
+    a copy of the priority calls; they are acked without running them.
+    """
+
+    def handle_message(self, body, message):
+        method_name = message.delivery_info['routing_key'].split('.')[-1]
+        if method_name in self.container.priority_methods:
+            self.queue_consumer.ack_message(message)
+            return
+        super().handle_message(body, message)
+
+
+class PriorityRpcConsumer(RpcConsumer):
+    """
+    Consumes the priority methods from their own queue, so they don't wait
+    behind regular calls and aren't limited by their prefetch window.
+    """
+
+    def setup(self):
+        if self.queue is None:
+            service_name = self.container.service_name
+            exchange = get_rpc_exchange(self.container.config)
+
+            self.queue = Queue(
+                PRIORITY_QUEUE_TEMPLATE.format(service_name),
+                bindings=[
+                    binding(exchange, routing_key=f'{service_name}.{method_name}')
+                    for method_name in sorted(self.container.priority_methods)
+                ],
+                durable=True)
+
+            self.queue_consumer.register_provider(self)
+            self._registered = True
+
+
+class ServiceContainer(NamekoServiceContainer):
+    """
+    Service container whose worker pool is configured per service on
+    `SERVICE_WORKERS`, e.g.:
+
+        SERVICE_WORKERS:
+          participant_service:
+            max_workers: 20
+            reserved_workers: 5
+            priority_methods: [current]
+
+    `max_workers` replaces the global `max_workers` for the service. Out of
+    them, `reserved_workers` are only used by `priority_methods`, so a burst of
+    other calls can't starve the entrypoints other services wait on.
+
+    Priority methods are consumed from their own queue: the broker delivers
+    rpc calls in order and only up to `max_workers` unacked calls per consumer,
+    so sharing the queue of regular calls would keep them waiting anyway.
+    Regular calls exceeding the regular workers are queued until one is free.
+    """
+
+    def __init__(self, service_cls, config):
+        super().__init__(service_cls, config)
+
+        settings = (config.get(SERVICE_WORKERS_KEY) or {}).get(self.service_name) or {}
+
+        self.max_workers = settings.get('max_workers') or self.max_workers
+        self.reserved_workers = min(settings.get('reserved_workers') or 0, self.max_workers - 1)
+        self.priority_methods = set(settings.get('priority_methods') or ())
+
+        self._worker_pool.resize(self.max_workers)
+        self.regular_workers = self.max_workers - self.reserved_workers
+        self._running_regular = 0
+        self._pending_regular = deque()
+
+        if self.reserved_workers and self.priority_methods:
+            self._bind_rpc_consumers()
+
+    def _bind_rpc_consumers(self):
+        # the rpc entrypoints were bound to nameko's consumer, shared by the whole service
+        self.shared_extensions.pop(RpcConsumer, None)
+        regular_consumer = RegularRpcConsumer().bind(self)
+        priority_consumer = PriorityRpcConsumer().bind(self)
+
+        for entrypoint in self.entrypoints:
+            if isinstance(entrypoint, Rpc):
+                entrypoint.rpc_consumer = priority_consumer if self.is_priority(entrypoint) else regular_consumer
+
+        self.subextensions = SpawningSet()
+        for extension in self.dependencies | self.entrypoints:
+            self.subextensions.update(iter_extensions(extension))
+
+    def is_priority(self, entrypoint) -> bool:
+        return entrypoint.method_name in self.priority_methods
+
+    def spawn_worker(self, entrypoint, args, kwargs, context_data=None, handle_result=None):
+        if self.reserved_workers == 0 or self.is_priority(entrypoint):
+            return super().spawn_worker(entrypoint, args, kwargs, context_data, handle_result)
+
+        if self._running_regular >= self.regular_workers:
+            logger.debug('queued %s.%s; regular workers are busy', self.service_name, entrypoint.method_name)
+            self._pending_regular.append((entrypoint, args, kwargs, context_data, handle_result))
+            return None
+
+        return self._spawn_regular_worker(entrypoint, args, kwargs, context_data, handle_result)
+
+    def _spawn_regular_worker(self, entrypoint, args, kwargs, context_data, handle_result):
+        self._running_regular += 1
+        try:
+            worker_ctx = super().spawn_worker(entrypoint, args, kwargs, context_data, handle_result)
+        except Exception:
+            self._running_regular -= 1
+            raise
+        self._worker_threads[worker_ctx].link(self._handle_regular_worker_exited)
+        return worker_ctx
+
+    def _handle_regular_worker_exited(self, gt):
+        self._running_regular -= 1
+        if self._pending_regular and not self._being_killed:
+            self._spawn_regular_worker(*self._pending_regular.popleft())
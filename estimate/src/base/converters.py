@@ -1,3 +1,4 @@
+from datetime import datetime
 from uuid import UUID
 
 
@@ -11,3 +12,11 @@ def from_str(value: str):
 
 def from_bool(value: str):
     return value.lower() == "true"
+
+
+def from_int(value: str):
+    return int(value)
+
+
+def from_datetime(value: str):
+    return datetime.fromisoformat(value)
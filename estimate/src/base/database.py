@@ -0,0 +1,280 @@
+import logging
+import threading
+import time
+import typing
+
+from nameko_sqlalchemy import DatabaseSession, DB_URIS_KEY
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+DB_ENGINE_OPTIONS_KEY = 'DB_ENGINE_OPTIONS'
+DB_REPLICA_URIS_KEY = 'DB_REPLICA_URIS'
+DB_REPLICA_WINDOW_KEY = 'DB_REPLICA_WINDOW'
+
+# seconds after a write in which the same sid keeps reading from the primary
+DEFAULT_REPLICA_WINDOW = 5
+
+
+class PoolMetrics:
+    """
+    Counts the connection pool activity of an engine
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+
+        event.listen(engine, 'connect', self.on_connect)
+        event.listen(engine, 'checkout', self.on_checkout)
+        event.listen(engine, 'checkin', self.on_checkin)
+        event.listen(engine, 'invalidate', self.on_invalidate)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+        self.checked_out += 1
+        self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        self.checkins += 1
+        self.checked_out -= 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        return {
+            'pool': pool.__class__.__name__,
+            # size and overflow are only available on queue pools
+            'size': pool.size() if hasattr(pool, 'size') else None,
+            'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'checkins': self.checkins,
+            'invalidations': self.invalidations,
+            'checkedOut': self.checked_out,
+            'maxCheckedOut': self.max_checked_out,
+        }
+
+
+class SharedEngine:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.metrics = PoolMetrics(engine)
+        self.users = 0
+
+
+class EngineRegistry:
+    """
+    Keeps one engine (and so one connection pool) per database URI and engine
+    options, shared by every service of the process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.engines: typing.Dict[tuple, SharedEngine] = {}
+
+    @staticmethod
+    def get_key(db_uri: str, engine_options: dict) -> tuple:
+        return db_uri, tuple(sorted(engine_options.items()))
+
+    def acquire(self, db_uri: str, engine_options: dict) -> Engine:
+        key = self.get_key(db_uri, engine_options)
+        with self.lock:
+            shared = self.engines.get(key)
+            if shared is None:
+                shared = SharedEngine(create_engine(db_uri, **engine_options))
+                self.engines[key] = shared
+                logger.debug('created shared engine for %r; %s', shared.engine.url, engine_options)
+            shared.users += 1
+            return shared.engine
+
+    def release(self, engine: Engine):
+        with self.lock:
+            for key, shared in list(self.engines.items()):
+                if shared.engine is engine:
+                    shared.users -= 1
+                    if shared.users == 0:
+                        del self.engines[key]
+                        engine.dispose()
+                    return
+
+    def get_metrics(self, engine: Engine) -> typing.Optional[PoolMetrics]:
+        for shared in self.engines.values():
+            if shared.engine is engine:
+                return shared.metrics
+        return None
+
+
+engines = EngineRegistry()
+
+
+class RecentWrites:
+    """
+    Remembers when each sid last wrote to the primary database, so its reads
+    aren't served by a replica which may not have the write yet
+    """
+
+    def __init__(self):
+        self.writes: typing.Dict[str, float] = {}
+
+    def record(self, sid: str, window: float):
+        now = time.monotonic()
+        self.writes[sid] = now
+        # forgets sids whose window is over
+        for expired in [key for key, written_at in self.writes.items() if now - written_at > window]:
+            del self.writes[expired]
+
+    def is_recent(self, sid: str, window: float) -> bool:
+        written_at = self.writes.get(sid)
+        return written_at is not None and time.monotonic() - written_at <= window
+
+
+recent_writes = RecentWrites()
+
+
+class SharedDatabaseSession(DatabaseSession):
+    """
+    Database session whose engine is shared with the other services running in
+    the same process, instead of one engine (and pool) per service.
+
+    Pool options are read from `DB_ENGINE_OPTIONS` on the config, e.g.
+    `pool_size`, `max_overflow`, `pool_recycle`, `pool_pre_ping` and
+    `pool_timeout`. Options given to the provider take precedence.
+    """
+
+    def get_uri(self, config_key: str) -> typing.Optional[str]:
+        service_name = self.container.service_name
+        decl_base_name = self.declarative_base.__name__
+        uri_key = '{}:{}'.format(service_name, decl_base_name)
+
+        db_uri = (self.container.config.get(config_key) or {}).get(uri_key)
+        if db_uri is None:
+            return None
+        return db_uri.format({
+            'service_name': service_name,
+            'declarative_base_name': decl_base_name,
+        })
+
+    def setup(self):
+        self.db_uri = self.get_uri(DB_URIS_KEY)
+
+        engine_options = {
+            **(self.container.config.get(DB_ENGINE_OPTIONS_KEY) or {}),
+            **self.engine_options,
+        }
+
+        self.engine = engines.acquire(self.db_uri, engine_options)
+        self.Session = sessionmaker(bind=self.engine, **self.session_options)
+
+    def stop(self):
+        engines.release(self.engine)
+        del self.engine
+
+    def kill(self):
+        engines.release(self.engine)
+        del self.engine
+
+
+class RoutingDatabaseSession(SharedDatabaseSession):
+    """
+    Shared database session which serves read-only entrypoints from a replica,
+    declared on `DB_REPLICA_URIS` with the same keys as `DB_URIS`. Services
+    list their read-only entrypoints on `read_only_methods`.
+
+    Reads of a sid which wrote less than `DB_REPLICA_WINDOW` seconds ago go
+    to the primary database instead (read-your-writes). Writes are tracked
+    per process, so this holds as long as the services involved run together.
+
+    Without replicas configured every entrypoint uses the primary database.
+    """
+
+    def setup(self):
+        super().setup()
+
+        self.window = self.container.config.get(DB_REPLICA_WINDOW_KEY, DEFAULT_REPLICA_WINDOW)
+        event.listen(self.Session, 'after_flush', self.on_after_flush)
+        event.listen(self.Session, 'do_orm_execute', self.on_do_orm_execute)
+        event.listen(self.Session, 'after_commit', self.on_after_commit)
+
+        self.replica_uri = self.get_uri(DB_REPLICA_URIS_KEY)
+        self.replica_engine = None
+        self.ReplicaSession = None
+        if self.replica_uri is not None:
+            engine_options = {
+                **(self.container.config.get(DB_ENGINE_OPTIONS_KEY) or {}),
+                **self.engine_options,
+            }
+            self.replica_engine = engines.acquire(self.replica_uri, engine_options)
+            self.ReplicaSession = sessionmaker(bind=self.replica_engine, **self.session_options)
+
+    def stop(self):
+        if self.replica_engine is not None:
+            engines.release(self.replica_engine)
+            self.replica_engine = None
+        super().stop()
+
+    def kill(self):
+        if self.replica_engine is not None:
+            engines.release(self.replica_engine)
+            self.replica_engine = None
+        super().kill()
+
+    @staticmethod
+    def get_sid(worker_ctx) -> typing.Optional[str]:
+        sid = worker_ctx.kwargs.get('sid')
+        if sid is None and worker_ctx.args:
+            sid = worker_ctx.args[0]
+        # event handlers receive a payload instead of a sid
+        return sid if isinstance(sid, str) else None
+
+    def use_replica(self, worker_ctx, sid: typing.Optional[str]) -> bool:
+        if self.ReplicaSession is None:
+            return False
+        read_only_methods = getattr(self.container.service_cls, 'read_only_methods', ())
+        if worker_ctx.entrypoint.method_name not in read_only_methods:
+            return False
+        return sid is None or not recent_writes.is_recent(sid, self.window)
+
+    def get_dependency(self, worker_ctx):
+        sid = self.get_sid(worker_ctx)
+
+        if self.use_replica(worker_ctx, sid):
+            session = self.ReplicaSession()
+        else:
+            session = self.Session()
+            session.info['sid'] = sid
+
+        self.sessions[worker_ctx] = session
+        return session
+
+    def on_after_flush(self, session, flush_context):
+        session.info['wrote'] = True
+
+    def on_do_orm_execute(self, orm_execute_state):
+        # bulk and upsert statements write without flushing
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            orm_execute_state.session.info['wrote'] = True
+
+    def on_after_commit(self, session):
+        sid = session.info.get('sid')
+        if session.info.pop('wrote', False) and sid is not None:
+            recent_writes.record(sid, self.window)
+
+
+def get_pool_stats(engine: Engine) -> typing.Optional[dict]:
+    metrics = engines.get_metrics(engine)
+    if metrics is None:
+        return None
+    return metrics.stats()
@@ -13,3 +13,26 @@ class InvalidInput(Exception):
 class InvalidFilter(Exception):
     def __init__(self, attr: str):
         super().__init__(f'Received invalid filter "{attr}"')
+
+
+class UnindexedFilter(InvalidFilter):
+    def __init__(self, attr: str):
+        Exception.__init__(self, f'Received filter "{attr}" which is not backed by an index')
+
+
+class InvalidField(Exception):
+    def __init__(self, field: str):
+        super().__init__(f'Received invalid field "{field}"')
+
+
+class InvalidCursor(Exception):
+    def __init__(self, cursor: str):
+        super().__init__(f'Received invalid cursor "{cursor}"')
+
+
+class VersionConflict(Exception):
+    def __init__(self, entity_name: str, version: int = None):
+        message = f'Received outdated version of "{entity_name}"'
+        if version is not None:
+            message = f'{message}, which is on version {version}'
+        super().__init__(message)
@@ -0,0 +1,46 @@
+import logging
+import random
+
+# entity dumps are logged apart, so they can be sampled (or silenced) on the LOGGING config
+dump_logger = logging.getLogger('dumps')
+
+
+class Sample(logging.Filter):
+    """
+    Lets through a random share (`rate`, from 0 to 1) of the records, e.g.:
+
+        filters:
+          sample:
+            (): base.logs.Sample
+            rate: 0.01
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return random.random() < self.rate
+
+
+class Dump:
+    """
+    Formats the entity (or serialized entity) only when the record is emitted
+    """
+
+    def __init__(self, entity):
+        self.entity = entity
+
+    def __str__(self):
+        if hasattr(self.entity, 'to_dict'):
+            return str(self.entity.to_dict())
+        return str(self.entity)
+
+
+def log_dump(message: str, *args, entity):
+    """
+    Logs the message on debug followed by a dump of the entity, through the
+    `dumps` logger
+    """
+    if dump_logger.isEnabledFor(logging.DEBUG):
+        dump_logger.debug(message + '; %s', *args, Dump(entity))
@@ -0,0 +1,278 @@
+import json
+import logging
+import threading
+import time
+import typing
+from weakref import WeakKeyDictionary
+
+from nameko.extensions import DependencyProvider
+from nameko.rpc import RpcProxy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_CALL_KEY = 'METRICS_SLOW_CALL'
+PAYLOAD_SIZES_KEY = 'METRICS_PAYLOAD_SIZES'
+
+# upper bounds (in seconds) of the wall time histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# statements kept per call for the slow call log
+MAX_CAPTURED_STATEMENTS = 50
+
+
+class CallRecord:
+    """
+    What a single worker spent while running
+    """
+
+    def __init__(self, capture_sql: bool):
+        self.started_at = time.perf_counter()
+        self.db_time = 0.0
+        self.statements = 0
+        self.rpcs = 0
+        self.request_bytes = 0
+        self.sql: typing.Optional[typing.List[str]] = [] if capture_sql else None
+
+
+class CallStack(threading.local):
+    """
+    Calls running on the current thread. Under eventlet every worker runs on
+    its own green thread, so statements are attributed to the worker issuing
+    them even when services share an engine.
+    """
+
+    def __init__(self):
+        self.calls: typing.List[CallRecord] = []
+
+    @property
+    def current(self) -> typing.Optional[CallRecord]:
+        return self.calls[-1] if self.calls else None
+
+
+call_stack = CallStack()
+
+_listening = False
+_listening_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started_at', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info['metrics_started_at'].pop()
+    call = call_stack.current
+    if call is None:
+        return
+    call.db_time += time.perf_counter() - started_at
+    call.statements += 1
+    # parameters are not kept, they may carry secrets
+    if call.sql is not None and len(call.sql) < MAX_CAPTURED_STATEMENTS:
+        call.sql.append(statement)
+
+
+def listen_to_engines():
+    """
+    Times the statements of every engine of the process, once
+    """
+    global _listening
+    with _listening_lock:
+        if _listening:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+def get_payload_size(payload) -> int:
+    return len(json.dumps(payload, default=str))
+
+
+class CountingServiceProxy:
+    """
+    Wraps the proxy of a `RpcProxy`, counting the calls made through it
+    """
+
+    def __init__(self, proxy, call: CallRecord):
+        self._proxy = proxy
+        self._call = call
+
+    def __getattr__(self, name: str):
+        return CountingMethodProxy(getattr(self._proxy, name), self._call)
+
+
+class CountingMethodProxy:
+    def __init__(self, method_proxy, call: CallRecord):
+        self._method_proxy = method_proxy
+        self._call = call
+
+    def __call__(self, *args, **kwargs):
+        self._call.rpcs += 1
+        return self._method_proxy(*args, **kwargs)
+
+    def call_async(self, *args, **kwargs):
+        self._call.rpcs += 1
+        return self._method_proxy.call_async(*args, **kwargs)
+
+
+class MethodMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.wall_time = 0.0
+        self.max_wall_time = 0.0
+        self.db_time = 0.0
+        self.statements = 0
+        self.rpcs = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def record(self, call: CallRecord, wall_time: float, response_bytes: int, failed: bool):
+        self.calls += 1
+        self.errors += int(failed)
+        self.wall_time += wall_time
+        self.max_wall_time = max(self.max_wall_time, wall_time)
+        self.db_time += call.db_time
+        self.statements += call.statements
+        self.rpcs += call.rpcs
+        self.request_bytes += call.request_bytes
+        self.response_bytes += response_bytes
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if wall_time <= bound:
+                self.buckets[index] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'wallTime': self.wall_time,
+            'maxWallTime': self.max_wall_time,
+            'dbTime': self.db_time,
+            'statements': self.statements,
+            'rpcs': self.rpcs,
+            'requestBytes': self.request_bytes,
+            'responseBytes': self.response_bytes,
+        }
+
+
+class ServiceMetrics:
+    """
+    Totals of every entrypoint of a service since the process started
+    """
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.methods: typing.Dict[str, MethodMetrics] = {}
+
+    def record(self, method_name: str, call: CallRecord, wall_time: float, response_bytes: int, failed: bool):
+        metrics = self.methods.get(method_name)
+        if metrics is None:
+            metrics = self.methods[method_name] = MethodMetrics()
+        metrics.record(call, wall_time, response_bytes, failed)
+
+    def to_dict(self) -> dict:
+        return {method_name: metrics.to_dict() for method_name, metrics in sorted(self.methods.items())}
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format of the totals
+        """
+        counters = [
+            ('estimate_worker_calls_total', 'Calls handled', 'calls'),
+            ('estimate_worker_errors_total', 'Calls which raised', 'errors'),
+            ('estimate_worker_db_seconds_total', 'Time spent running SQL statements', 'db_time'),
+            ('estimate_worker_sql_statements_total', 'SQL statements executed', 'statements'),
+            ('estimate_worker_outbound_rpcs_total', 'RPCs made to the gateway and other services', 'rpcs'),
+            ('estimate_worker_request_bytes_total', 'Size of the received arguments', 'request_bytes'),
+            ('estimate_worker_response_bytes_total', 'Size of the returned results', 'response_bytes'),
+        ]
+        methods = sorted(self.methods.items())
+
+        lines = []
+        for name, description, attr in counters:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for method_name, metrics in methods:
+                lines.append(f'{name}{{{self._labels(method_name)}}} {getattr(metrics, attr)}')
+
+        name = 'estimate_worker_duration_seconds'
+        lines.append(f'# HELP {name} Wall time of the calls')
+        lines.append(f'# TYPE {name} histogram')
+        for method_name, metrics in methods:
+            labels = self._labels(method_name)
+            for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {metrics.calls}')
+            lines.append(f'{name}_sum{{{labels}}} {metrics.wall_time}')
+            lines.append(f'{name}_count{{{labels}}} {metrics.calls}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _labels(self, method_name: str) -> str:
+        return f'service="{self.service_name}",method="{method_name}"'
+
+
+class Metrics(DependencyProvider):
+    """
+    Measures every worker of the service: wall time, time spent and statements
+    run on the database and RPCs made through `RpcProxy` dependencies.
+
+    The size of the received arguments and the returned result is only
+    measured when `METRICS_PAYLOAD_SIZES` is enabled, since it serializes
+    both on every call.
+
+    Calls slower than `METRICS_SLOW_CALL` seconds (when configured) are logged
+    along with their SQL statements.
+    """
+
+    def setup(self):
+        self.slow_call = self.container.config.get(SLOW_CALL_KEY) or None
+        self.payload_sizes = bool(self.container.config.get(PAYLOAD_SIZES_KEY))
+        self.service_metrics = ServiceMetrics(self.container.service_name)
+        self.calls = WeakKeyDictionary()
+        listen_to_engines()
+
+    def get_dependency(self, worker_ctx):
+        return self.service_metrics
+
+    def worker_setup(self, worker_ctx):
+        call = CallRecord(capture_sql=self.slow_call is not None)
+        if self.payload_sizes:
+            call.request_bytes = get_payload_size({'args': worker_ctx.args, 'kwargs': worker_ctx.kwargs})
+
+        for dependency in worker_ctx.container.dependencies:
+            if isinstance(dependency, RpcProxy):
+                proxy = getattr(worker_ctx.service, dependency.attr_name)
+                setattr(worker_ctx.service, dependency.attr_name, CountingServiceProxy(proxy, call))
+
+        self.calls[worker_ctx] = call
+        call_stack.calls.append(call)
+
+    def worker_result(self, worker_ctx, result=None, exc_info=None):
+        call: CallRecord = self.calls.pop(worker_ctx, None)
+        if call is None:
+            return
+        if call in call_stack.calls:
+            call_stack.calls.remove(call)
+
+        wall_time = time.perf_counter() - call.started_at
+        response_bytes = 0
+        if self.payload_sizes and exc_info is None:
+            response_bytes = get_payload_size(result)
+        method_name = worker_ctx.entrypoint.method_name
+
+        self.service_metrics.record(method_name, call, wall_time, response_bytes, failed=exc_info is not None)
+
+        if self.slow_call is not None and wall_time >= self.slow_call:
+            sql = '\n'.join(call.sql)
+            logger.warning('slow call %s.%s took %.3fs (%.3fs on %s statements, %s rpcs):\n%s',
+                           worker_ctx.service_name, method_name, wall_time, call.db_time, call.statements, call.rpcs,
+                           sql)
+
+    def worker_teardown(self, worker_ctx):
+        call = self.calls.pop(worker_ctx, None)
+        if call is not None and call in call_stack.calls:
+            call_stack.calls.remove(call)
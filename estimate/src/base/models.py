@@ -1,8 +1,8 @@
 import datetime
 import uuid
 
-from sqlalchemy import Column, DateTime, Uuid
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, DateTime, Integer, Uuid, inspect
+from sqlalchemy.orm import declarative_base, declared_attr
 
 DeclarativeBase = declarative_base()
 
@@ -27,6 +27,25 @@ class Model(DeclarativeBase):
         onupdate=datetime.datetime.utcnow,
         nullable=False
     )
+    # incremented by the ORM on every update, so clients can tell when they missed one
+    version = Column(
+        Integer,
+        nullable=False,
+        server_default="1"
+    )
+
+    @declared_attr.directive
+    def __mapper_args__(cls) -> dict:
+        return {'version_id_col': cls.__table__.c.version}
 
     def to_dict(self) -> dict:
-        return self.__dict__
+        """
+        Loaded column values of the entity. Expired or deferred columns are
+        left out instead of being loaded.
+        """
+        state = inspect(self)
+        return {
+            attr.key: state.dict[attr.key]
+            for attr in state.mapper.column_attrs
+            if attr.key in state.dict
+        }
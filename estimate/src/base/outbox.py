@@ -0,0 +1,76 @@
+import logging
+from weakref import WeakKeyDictionary
+
+from nameko.extensions import DependencyProvider
+
+logger = logging.getLogger(__name__)
+
+# consumed by every gateway instance, which delivers the messages to its websockets
+PUSH_EVENT = 'gateway_push'
+
+
+class OutboxBuffer:
+    """
+    Messages a worker wants to send to websocket clients through the gateway
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def broadcast(self, channel, event: str, data):
+        self.messages.append({
+            'type': 'broadcast',
+            'target': channel,
+            'event': event,
+            'data': data,
+        })
+
+    def unicast(self, sid, event: str, data):
+        self.messages.append({
+            'type': 'unicast',
+            'target': sid,
+            'event': event,
+            'data': data,
+        })
+
+
+class Outbox(DependencyProvider):
+    """
+    Collects every broadcast/unicast of a worker and publishes them to the
+    gateway as a single `gateway_push` event once the worker finishes
+    successfully. Being an event, the worker doesn't wait for the gateway to
+    reply.
+
+    Since entities are committed within the worker, clients only receive
+    messages of changes that were actually persisted. Messages of failed
+    workers are discarded.
+    """
+
+    def setup(self):
+        self.buffers = WeakKeyDictionary()
+
+    def get_dependency(self, worker_ctx):
+        buffer = OutboxBuffer()
+        self.buffers[worker_ctx] = buffer
+        return buffer
+
+    def worker_result(self, worker_ctx, result=None, exc_info=None):
+        buffer: OutboxBuffer = self.buffers.pop(worker_ctx, None)
+        if buffer is None or not buffer.messages:
+            return
+
+        if exc_info is not None:
+            logger.debug('discarded %s outbox messages of failed worker %s', len(buffer.messages), worker_ctx.call_id)
+            return
+
+        try:
+            self.flush(worker_ctx, buffer.messages)
+        except Exception:
+            # changes are already committed and replied, so there is nothing to roll back
+            logger.exception('failed to flush %s outbox messages of worker %s', len(buffer.messages), worker_ctx.call_id)
+
+    def flush(self, worker_ctx, messages: list):
+        worker_ctx.service.dispatch(PUSH_EVENT, messages)
+
+    def worker_teardown(self, worker_ctx):
+        self.buffers.pop(worker_ctx, None)
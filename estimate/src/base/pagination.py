@@ -0,0 +1,24 @@
+import base64
+import datetime
+from uuid import UUID
+
+from base.exceptions import InvalidCursor
+from base.models import Model
+
+
+def encode_cursor(entity: Model) -> str:
+    """
+    Cursors point to the last entity of a page, by its position on the
+    `created_at, id` ordering
+    """
+    value = f'{entity.created_at.isoformat()}|{entity.id}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, UUID]:
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, entity_id = value.split('|')
+        return datetime.datetime.fromisoformat(created_at), UUID(entity_id)
+    except Exception:
+        raise InvalidCursor(cursor)
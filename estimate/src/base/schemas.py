@@ -1,6 +1,9 @@
-import json
+from functools import lru_cache
+from typing import Optional, Union, List, Literal, Tuple, Type
+from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, create_model
+from pydantic.fields import FieldInfo
 from pydantic.alias_generators import to_camel
 
 from base.models import Model
@@ -12,25 +15,86 @@ class APIModel(BaseModel):
     @classmethod
     def to_json(cls, entity: Model) -> dict:
         result = cls.model_validate(entity)
-        result = result.model_dump_json(by_alias=True)
-        result = json.loads(result)  # converts to json and back to stringify Date and UUID
+        result = result.model_dump(mode='json', by_alias=True)  # stringifies Date and UUID while dumping
         return result
 
+    @classmethod
+    def loader_options(cls) -> list:
+        """
+        Loader options of the relationships serialized by this schema, so
+        they are eager loaded along with the entity instead of lazy loaded
+        one by one while serializing
+        """
+        return []
+
+    @classmethod
+    def narrow(cls, fields: Tuple[str, ...]) -> Type['APIModel']:
+        """
+        Returns a copy of this schema with only the given fields, which are
+        expected to be field names of this schema
+        """
+        return _narrow(cls, fields)
+
+    @classmethod
+    def partial(cls) -> Type['APIModel']:
+        """
+        Returns a copy of this schema where every field may be omitted. Values
+        are still validated when received, so dumping it with `exclude_unset`
+        gives only the fields sent.
+        """
+        return _partial(cls)
+
+
+@lru_cache(maxsize=None)
+def _partial(schema: Type[APIModel]) -> Type[APIModel]:
+    definitions = {
+        name: (field.annotation, FieldInfo.merge_field_infos(field, default=None))
+        for name, field in schema.model_fields.items()
+    }
+    return create_model(f'{schema.__name__}Partial', __base__=APIModel, **definitions)
+
+
+@lru_cache(maxsize=None)
+def _narrow(schema: Type[APIModel], fields: Tuple[str, ...]) -> Type[APIModel]:
+    # narrowed schemas are created once per field set
+    definitions = {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields}
+    return create_model(f'{schema.__name__}Narrowed', __base__=APIModel, **definitions)
+
+
+class RequestContext(APIModel):
+    """
+    Session information resolved once by the gateway and sent along with every
+    request, so services don't have to find it again
+    """
+    participant_id: UUID
+    poker_id: UUID
+    keycloak_user_id: Optional[str] = None
+
 
 class SimpleModel(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
     def to_json(self) -> dict:
-        result = self.model_dump_json(by_alias=True)
-        result = json.loads(result)
+        result = self.model_dump(mode='json', by_alias=True)
         return result
 
 
+FilterOperator = Literal["eq", "ne", "in", "gt", "lt", "since"]
+
+RANGE_OPERATORS = ("gt", "lt", "since")
+
+
 class Filter(SimpleModel):
     attr: str
-    value: str
+    value: Union[str, List[str]]
+    op: FilterOperator = "eq"
 
 
 class QueryMetadata(SimpleModel):
     filters: list
+    order_by: Optional[list] = None
+    limit: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class QueryRead(SimpleModel):
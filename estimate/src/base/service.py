@@ -5,26 +5,58 @@ from uuid import UUID
 
 from nameko.events import EventDispatcher
 from nameko.rpc import rpc, RpcProxy
-from nameko_sqlalchemy import DatabaseSession
-from sqlalchemy.orm import Session
-
-from base.exceptions import NotFound, InvalidFilter
+from sqlalchemy import UniqueConstraint, inspect, tuple_
+from sqlalchemy.orm import Session, Query, load_only
+from sqlalchemy.orm.exc import StaleDataError
+
+from base.database import RoutingDatabaseSession, get_pool_stats
+from base.exceptions import NotFound, InvalidFilter, InvalidInput, UnindexedFilter, InvalidField, \
+    VersionConflict
+from base.logs import log_dump
+from base.metrics import Metrics, ServiceMetrics
 from base.models import DeclarativeBase, Model
-from base.schemas import APIModel, Filter, QueryMetadata, QueryRead
+from base.outbox import Outbox, OutboxBuffer
+from base.pagination import encode_cursor, decode_cursor
+from base.schemas import APIModel, Filter, QueryMetadata, QueryRead, RequestContext, RANGE_OPERATORS
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+
+MAX_QUERY_LIMIT = 500
 
 
 class BaseService:
     # NOTE: services must have the 'name' property
+    # NOTE: rpc methods called through the gateway must accept the 'context' argument
     gateway_rpc = RpcProxy('gateway_service')
     dispatch = EventDispatcher()
+    # messages to websocket clients are sent through the outbox, after the worker succeeds
+    outbox: OutboxBuffer = Outbox()
+    # timings, statements, rpcs and payload sizes of every entrypoint
+    instrumentation: ServiceMetrics = Metrics()
+
+    @rpc
+    def metrics(self, format: str = 'json'):
+        """
+        Totals measured on every entrypoint of this service, as a dict or as
+        Prometheus text when `format` is "prometheus"
+        """
+        if format == 'prometheus':
+            return self.instrumentation.to_prometheus()
+        if format != 'json':
+            raise InvalidInput()
+        return self.instrumentation.to_dict()
 
 
 class EntityService(BaseService):
-    db: Session = DatabaseSession(DeclarativeBase)
+    db: Session = RoutingDatabaseSession(DeclarativeBase)
     broadcast_changes: bool = False
+    query_page_size: int = 100
+    # columns already filtered by equality on `get_base_query` when a sid is given
+    scope_columns: typing.Tuple[str, ...] = ()
+    # range filters and ordering on large tables must be served by an index
+    large_table: bool = False
+    # entrypoints which may be served by a read replica
+    read_only_methods: typing.Tuple[str, ...] = ('query', 'retrieve', 'pool_stats')
 
     @property
     @abstractmethod
@@ -62,6 +94,33 @@ class EntityService(BaseService):
         """
         return dict()
 
+    def get_indexed_columns(self) -> typing.List[typing.Tuple[str, ...]]:
+        """
+        Lists the columns of every index of the model table, in index order.
+        Unique constraints are included since databases back them by indexes.
+        """
+        table = self.model.__table__
+        indexed = [tuple(column.name for column in table.primary_key.columns)]
+        for index in table.indexes:
+            indexed.append(tuple(column.name for column in index.columns))
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                indexed.append(tuple(column.name for column in constraint.columns))
+        return indexed
+
+    def is_index_backed(self, attr: str, equality_attrs: typing.Set[str]) -> bool:
+        """
+        A column can be searched through an index when it is the leading column
+        of the index, or when every column preceding it is filtered by equality
+        """
+        for columns in self.get_indexed_columns():
+            for column in columns:
+                if column == attr:
+                    return True
+                if column not in equality_attrs:
+                    break
+        return False
+
     @property
     def event_queried(self):
         return f"{self.entity_name}_queried"
@@ -86,127 +145,358 @@ class EntityService(BaseService):
     def get_room_name(self, entity) -> str:
         pass
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         """
         Used to apply filters to all queried data inside the service
         """
         return self.db.query(self.model)
 
-    def handle_propagate(self, sid, event: str, entity, payload: dict):
+    def get_current_poker_id(self, sid, context: dict = None) -> UUID:
+        """
+        Finds the poker session being interacted by the SID. The request context
+        sent by the gateway is used when available, otherwise the gateway is
+        asked for it.
+        """
+        if context is not None:
+            return RequestContext(**context).poker_id
+        return self.gateway_rpc.get_current_poker_id(sid)
+
+    def handle_propagate(self, sid, event: str, entity, payload: dict, message: dict = None):
+        """
+        Dispatches the payload to other services and sends it to the clients,
+        unless a (smaller) message for the clients is given
+        """
         self.dispatch(event, payload)
 
+        if message is None:
+            message = payload
+
         if self.broadcast_changes:
             room_name = self.get_room_name(entity)
-            self.gateway_rpc.broadcast(room_name, event, payload)
+            self.outbox.broadcast(room_name, event, message)
         else:
-            self.gateway_rpc.unicast(sid, event, payload)
+            self.outbox.unicast(sid, event, message)
 
-    @rpc
-    def query(self, sid, filters: list[dict]) -> dict:
+    def check_version(self, entity, version: typing.Optional[int]):
         """
-        Queries the stored entities based on a list of filters
+        Compare-and-swap: fails unless the entity is still on the version the
+        client based its changes on. Without a version, any version is accepted.
+        """
+        if version is not None and entity.version != version:
+            raise VersionConflict(self.entity_name, entity.version)
 
-        Only does unicast
+    def commit_versioned(self):
+        """
+        Commits the changes of loaded entities. Their UPDATE statements also
+        match the version loaded, so a write committed by someone else in the
+        meantime causes a conflict instead of being overwritten.
+        """
+        try:
+            self.db.commit()
+        except StaleDataError:
+            self.db.rollback()
+            raise VersionConflict(self.entity_name)
+
+    def get_changed_attrs(self, entity) -> typing.List[str]:
+        """
+        Columns of the entity changed since it was loaded, according to the
+        SQLAlchemy attribute history. Must be called before flushing.
+        """
+        state = inspect(entity)
+        return [attr.key for attr in state.mapper.column_attrs if state.attrs[attr.key].history.has_changes()]
+
+    def get_delta(self, result: dict, changed_attrs: typing.List[str], dto_read: typing.Type[APIModel] = None) -> dict:
+        """
+        Update message holding only the changed fields of the serialized
+        entity, along with its new version. Clients apply it over the previous
+        version; when a version is skipped, they must load the entity again
+        (e.g. through `retrieve`, or the poker snapshot).
+
+        `dto_read` is the schema the result was serialized with, when the
+        entity isn't the one managed by this service.
+        """
+        fields = (dto_read or self.dto_read).model_fields
+        changes = {}
+        for key in [*changed_attrs, 'updated_at']:
+            field = fields.get(key)
+            if field is None:
+                continue  # not exposed to clients
+            alias = field.alias or key
+            changes[alias] = result[alias]
+
+        return {
+            'id': result['id'],
+            'version': result['version'],
+            'changes': changes,
+        }
+
+    def get_projection(self, fields: typing.Optional[list[str]]) -> typing.Tuple[typing.Type[APIModel], list]:
+        """
+        Resolves the requested fields (by name or alias) into a narrowed read
+        schema and the loader options that select only their columns. Fields
+        must be columns of the model, relationships can't be selected.
+        """
+        if not fields:
+            return self.dto_read, self.dto_read.loader_options()
+
+        aliases = {field.alias: name for name, field in self.dto_read.model_fields.items()}
+        columns = self.model.__table__.columns
+
+        names = []
+        for field in fields:
+            name = aliases.get(field, field)
+            if name not in self.dto_read.model_fields or name not in columns:
+                raise InvalidField(field)
+            if name not in names:
+                names.append(name)
+
+        return self.dto_read.narrow(tuple(names)), [load_only(*[getattr(self.model, name) for name in names])]
+
+    def get_page_limit(self, limit: typing.Optional[int]) -> int:
+        if limit is None:
+            return self.query_page_size
+        if limit < 1:
+            raise InvalidInput()
+        return min(limit, MAX_QUERY_LIMIT)
+
+    def paginate(self, query: Query, limit: int, cursor: typing.Optional[str]) -> Query:
+        """
+        Applies keyset pagination over `created_at, id`. One extra entity is
+        fetched to find out if there is a next page.
+        """
+        query = query \
+            .order_by(None) \
+            .order_by(self.model.created_at, self.model.id)
+
+        if cursor is not None:
+            created_at, entity_id = decode_cursor(cursor)
+            query = query.filter(tuple_(self.model.created_at, self.model.id) > tuple_(created_at, entity_id))
+
+        return query.limit(limit + 1)
+
+    def get_equality_attrs(self, sid, filters: list[Filter]) -> typing.Set[str]:
+        equality_attrs = set(self.scope_columns) if sid is not None else set()
+        equality_attrs.update(f.attr for f in filters if f.op == "eq")
+        return equality_attrs
+
+    def get_filter_clause(self, filter: Filter, converter: typing.Callable[[any], str]):
+        column = getattr(self.model, filter.attr)
+
+        if (filter.op == "in") != isinstance(filter.value, list):
+            raise InvalidFilter(filter.attr)
+
+        try:
+            if filter.op == "in":
+                converted_value = [converter(value) for value in filter.value]
+            else:
+                converted_value = converter(filter.value)
+        except Exception as exc:
+            logger.error('Unable to convert filter value. attr: %s; value: %s', filter.attr, filter.value)
+            raise InvalidFilter(filter.attr)
+
+        if filter.op == "ne":
+            return column != converted_value
+        if filter.op == "in":
+            return column.in_(converted_value)
+        if filter.op == "gt":
+            return column > converted_value
+        if filter.op == "lt":
+            return column < converted_value
+        if filter.op == "since":
+            return column >= converted_value
+        return column == converted_value
+
+    def get_filter_clauses(self, sid, filters: list[Filter]) -> list:
+        """
+        Validates the received filters against the allowed columns and converts
+        them into SQL clauses
         """
-        applied_filters = list()
         column_converters = self.get_query_column_converters()
 
-        for f in filters:
-            filter = Filter(**f)
+        equality_attrs = self.get_equality_attrs(sid, filters)
+
+        clauses = list()
+        for filter in filters:
             if filter.attr not in column_converters.keys():
                 raise InvalidFilter(filter.attr)
+            if self.large_table and filter.op in RANGE_OPERATORS \
+                    and not self.is_index_backed(filter.attr, equality_attrs):
+                raise UnindexedFilter(filter.attr)
             converter = column_converters.get(filter.attr)
-            try:
-                converted_value = converter(filter.value)
-            except Exception as exc:
-                logger.error(f'Unable to convert filter value. attr: {filter.attr}; value: {filter.value}')
-                raise InvalidFilter(filter.attr)
-            applied_filters.append(getattr(self.model, filter.attr) == converted_value)
+            clauses.append(self.get_filter_clause(filter, converter))
 
-        entities = self.get_base_query(sid=sid) \
-            .filter(*applied_filters) \
-            .all()
+        return clauses
+
+    def get_order_clauses(self, sid, order_by: list[str], filters: list[Filter]) -> list:
+        """
+        Converts the received ordering (column names, prefixed by "-" when
+        descending) into SQL clauses
+        """
+        column_converters = self.get_query_column_converters()
+
+        equality_attrs = self.get_equality_attrs(sid, filters)
+
+        clauses = list()
+        for attr in order_by:
+            descending = attr.startswith("-")
+            attr = attr.removeprefix("-")
+            if attr not in column_converters.keys():
+                raise InvalidFilter(attr)
+            if self.large_table and not self.is_index_backed(attr, equality_attrs):
+                raise UnindexedFilter(attr)
+            column = getattr(self.model, attr)
+            clauses.append(column.desc() if descending else column.asc())
+
+        return clauses
+
+    @rpc
+    def pool_stats(self) -> typing.Optional[dict]:
+        """
+        Connection pool metrics of the engine used by this service, which is
+        shared with the other services of the same process
+        """
+        return get_pool_stats(self.db.get_bind().engine)
+
+    @rpc
+    def query(self, sid, filters: list[dict], limit: int = None, cursor: str = None, order_by: list[str] = None,
+              fields: list[str] = None, context: dict = None) -> dict:
+        """
+        Queries the stored entities based on a list of filters
+
+        Filters compare a column with the received value through an operator
+        ("eq" by default, "ne", "in", "gt", "lt" or "since"). Results can be
+        ordered by any filterable column.
+
+        Results are paginated when a limit or cursor is received. In that case
+        `next_cursor` is returned on the metadata while there are more pages.
+        Paginated results are always ordered by creation.
+
+        When `fields` are received, only those columns are selected and
+        serialized.
+
+        Only does unicast
+        """
+        parsed_filters = [Filter(**f) for f in filters]
+        dto_read, loader_options = self.get_projection(fields)
+
+        query = self.get_base_query(sid=sid, context=context) \
+            .filter(*self.get_filter_clauses(sid, parsed_filters)) \
+            .options(*loader_options)
+
+        if order_by:
+            if limit is not None or cursor is not None:
+                raise InvalidInput()
+            query = query \
+                .order_by(None) \
+                .order_by(*self.get_order_clauses(sid, order_by, parsed_filters))
+
+        paginated = limit is not None or cursor is not None
+        if paginated:
+            limit = self.get_page_limit(limit)
+            query = self.paginate(query, limit, cursor)
+            if fields:
+                # cursors are encoded from the creation date
+                query = query.options(load_only(self.model.created_at))
+
+        entities = query.all()
+
+        next_cursor = None
+        if paginated and len(entities) > limit:
+            entities = entities[:limit]
+            next_cursor = encode_cursor(entities[-1])
 
         items = []
-        metadata = QueryMetadata(filters=filters)
+        metadata = QueryMetadata(filters=filters, order_by=order_by, limit=limit, next_cursor=next_cursor)
 
         for entity in entities:
-            items.append(self.dto_read.to_json(entity))
+            items.append(dto_read.to_json(entity))
 
         result = QueryRead(items=items, metadata=metadata)
         result = result.to_json()
 
         self.dispatch(self.event_queried, result)
-        self.gateway_rpc.unicast(sid, self.event_queried, result)
+        self.outbox.unicast(sid, self.event_queried, result)
 
         return result
 
     @rpc
-    def retrieve(self, sid, entity_id: str) -> dict:
+    def retrieve(self, sid, entity_id: str, fields: list[str] = None, context: dict = None) -> dict:
         entity_id = UUID(entity_id)
+        dto_read, loader_options = self.get_projection(fields)
 
-        entity = self.get_base_query(sid=sid) \
+        entity = self.get_base_query(sid=sid, context=context) \
             .filter(self.model.id == entity_id) \
+            .options(*loader_options) \
             .first()
 
         if entity is None:
             raise NotFound()
 
-        result = self.dto_read.to_json(entity)
+        result = dto_read.to_json(entity)
 
-        self.gateway_rpc.unicast(sid, self.event_retrieved, result)
+        self.outbox.unicast(sid, self.event_retrieved, result)
         self.dispatch(self.event_retrieved, result)
 
         return result
 
     @rpc
-    def create(self, sid, payload: dict) -> dict:
+    def create(self, sid, payload: dict, context: dict = None) -> dict:
         dto = self.dto_create(**payload)
         entity = self.model(**dto.model_dump())
 
         self.db.add(entity)
         self.db.commit()
 
-        logger.debug(f'created "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
-
         result = self.dto_read.to_json(entity)
 
+        log_dump('created "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
         self.handle_propagate(sid, self.event_created, entity, result)
 
         return result
 
     @rpc
-    def update(self, sid, entity_id: str, payload: dict) -> dict:
+    def update(self, sid, entity_id: str, payload: dict, version: int = None, context: dict = None) -> dict:
+        """
+        Partially updates an entity: only the fields present on the payload
+        are written. When a version is received, the update is only applied
+        if the entity is still on it, otherwise `VersionConflict` is raised and
+        the client must retry over the current entity.
+        """
         entity_id = UUID(entity_id)
 
-        entity = self.get_base_query(sid=sid) \
+        entity = self.get_base_query(sid=sid, context=context) \
             .filter(self.model.id == entity_id) \
             .first()
 
         if entity is None:
             raise NotFound()
 
-        dto = self.dto_update(**payload)
-        values: dict = dto.model_dump()
+        self.check_version(entity, version)
+
+        dto = self.dto_update.partial()(**payload)
+        values: dict = dto.model_dump(exclude_unset=True)
 
         for key, value in values.items():
             setattr(entity, key, value)
 
-        self.db.commit()
-
-        logger.debug(f'update "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
+        changed_attrs = self.get_changed_attrs(entity)
+        self.commit_versioned()
 
         result = self.dto_read.to_json(entity)
 
-        self.handle_propagate(sid, self.event_updated, entity, result)
+        log_dump('update "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
+        # other services get the whole entity, clients only what changed
+        self.handle_propagate(sid, self.event_updated, entity, result, message=self.get_delta(result, changed_attrs))
 
         return result
 
     @rpc
-    def delete(self, sid, entity_id: str) -> dict:
+    def delete(self, sid, entity_id: str, context: dict = None) -> dict:
         entity_id = UUID(entity_id)
 
-        old = self.get_base_query(sid=sid) \
+        old = self.get_base_query(sid=sid, context=context) \
             .filter(self.model.id == entity_id) \
             .first()
 
@@ -218,7 +508,7 @@ class EntityService(BaseService):
         self.db.delete(old)
         self.db.commit()
 
-        logger.debug(f'delete "{self.entity_name}" entity! {old.id}; {old.to_dict()}')
+        log_dump('delete "%s" entity! %s', self.entity_name, result['id'], entity=result)
 
         self.handle_propagate(sid, self.event_deleted, old, result)
 
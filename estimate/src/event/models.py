@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey
+from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from base.models import Model
@@ -6,6 +6,10 @@ from base.models import Model
 
 class Event(Model):
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_story_id_revealed", "story_id", "revealed"),
+        Index("ix_events_poker_id_created_at", "poker_id", "created_at"),
+    )
 
     type = Column(
         String(),
@@ -12,6 +12,7 @@ class EventRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     type: EventType
     content: str
     creator: str
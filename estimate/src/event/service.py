@@ -3,9 +3,12 @@ import logging
 from uuid import UUID
 
 from nameko.rpc import rpc, RpcProxy
+from sqlalchemy import update
 
 from base.exceptions import NotFound
-from base.converters import from_uuid, from_str, from_bool
+from base.logs import log_dump
+from base.converters import from_uuid, from_str, from_bool, from_datetime
+from base.schemas import RequestContext, SimpleListing
 from base.service import EntityService
 from event.models import Event
 from event.schemas import EventRead, EventCreate, EventUpdate
@@ -13,7 +16,6 @@ from story.models import Story
 from participant.models import Participant
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class EventService(EntityService):
@@ -25,6 +27,8 @@ class EventService(EntityService):
     dto_create = EventCreate
     dto_update = EventUpdate
     broadcast_changes = True
+    scope_columns = ('poker_id',)
+    large_table = True
 
     participant_rpc = RpcProxy("participant_service")
 
@@ -33,28 +37,31 @@ class EventService(EntityService):
             'type': from_str,
             'creator': from_str,
             'revealed': from_bool,
-            'story_id': from_uuid
+            'story_id': from_uuid,
+            'created_at': from_datetime
         }
 
     def get_room_name(self, entity) -> str:
         event: Event = entity
         return f'story:{event.story_id}'
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Event).filter(Event.poker_id == current_poker_id)
 
-    def _get_current_creator(self, sid) -> str:
+    def _get_current_creator(self, sid, context: dict = None) -> str:
+        if context is not None:
+            return str(RequestContext(**context).participant_id)
         participant = self.participant_rpc.current(sid)
         return str(participant['id'])
 
     @rpc
-    def create(self, sid, payload: dict, _system_event: bool = False) -> dict:
+    def create(self, sid, payload: dict, _system_event: bool = False, context: dict = None) -> dict:
         creator = 'system'
         if not _system_event:
-            creator = self._get_current_creator(sid)
+            creator = self._get_current_creator(sid, context)
 
         dto = EventCreate(**payload)
 
@@ -67,10 +74,42 @@ class EventService(EntityService):
         self.db.add(entity)
         self.db.commit()
 
-        logger.debug(f'created "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
-
         result = self.dto_read.to_json(entity)
 
+        log_dump('created "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
         self.handle_propagate(sid, self.event_created, entity, result)
 
         return result
+
+    @rpc
+    def reveal_story(self, sid, story_id: str, context: dict = None) -> dict:
+        """
+        Reveals every unrevealed event of a story at once. Revealed events are
+        broadcasted together, as a single message.
+        """
+        story_id = UUID(story_id)
+
+        statement = update(Event) \
+            .where(Event.story_id == story_id) \
+            .where(Event.revealed == False) \
+            .values(revealed=True, version=Event.version + 1) \
+            .returning(Event)
+
+        if sid is not None:
+            statement = statement.where(Event.poker_id == self.get_current_poker_id(sid, context))
+
+        entities = self.db.scalars(statement).all()
+
+        # serialized before committing, since committing expires the returned entities
+        items = [self.dto_read.to_json(entity) for entity in entities]
+        self.db.commit()
+
+        logger.debug('revealed %s "%s" entities of story %s', len(items), self.entity_name, story_id)
+
+        result = SimpleListing(items=items).to_json()
+
+        self.dispatch('events_revealed', result)
+        self.outbox.broadcast(f'story:{story_id}', 'events_revealed', result)
+
+        return result
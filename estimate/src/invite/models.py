@@ -1,10 +1,14 @@
-from sqlalchemy import Column, String, Uuid, ForeignKey, DateTime
+from sqlalchemy import Column, String, Uuid, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from base.models import Model
 
 
 class Invite(Model):
     __tablename__ = "invites"
+    __table_args__ = (
+        Index("ix_invites_code_poker_id_expires_at", "code", "poker_id", "expires_at"),
+        Index("ix_invites_poker_id", "poker_id"),
+    )
 
     code = Column(
         String(),
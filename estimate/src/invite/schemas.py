@@ -9,6 +9,7 @@ class InviteRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     code: str
     expires_at: datetime
     poker_id: UUID
@@ -7,6 +7,7 @@ from nameko.rpc import rpc
 
 from base.converters import from_uuid, from_str
 from base.exceptions import NotFound, NotAllowed
+from base.logs import log_dump
 from base.service import EntityService
 from invite.models import Invite
 from invite.schemas import InviteRead, InviteCreate, InviteUpdate
@@ -15,7 +16,6 @@ from utils import random_str
 INVITE_CODE_SIZE = 48
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class InviteService(EntityService):
@@ -27,23 +27,26 @@ class InviteService(EntityService):
     dto_create = InviteCreate
     dto_update = InviteUpdate
     broadcast_changes = False
+    scope_columns = ('poker_id',)
 
     def get_room_name(self, entity):
         invite: Invite = entity
         return str(invite.poker_id)
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Invite).filter(Invite.poker_id == current_poker_id)
     
     @rpc
-    def query(self, sid, filters: list[dict]) -> dict:
+    def query(self, sid, filters: list[dict], limit: int = None, cursor: str = None, order_by: list[str] = None,
+              fields: list[str] = None, context: dict = None) -> dict:
+        # same signature as `EntityService.query`, so every request is refused alike
         raise NotAllowed()
     
     @rpc
-    def create(self, sid, payload: dict) -> dict:
+    def create(self, sid, payload: dict, context: dict = None) -> dict:
         code = random_str(INVITE_CODE_SIZE)
 
         dto = self.dto_create(**payload)
@@ -52,10 +55,10 @@ class InviteService(EntityService):
         self.db.add(entity)
         self.db.commit()
 
-        logger.debug(f'created "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
-
         result = self.dto_read.to_json(entity)
 
+        log_dump('created "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
         self.handle_propagate(sid, self.event_created, entity, result)
 
         return result
@@ -0,0 +1,5 @@
+"""
+Load generator which runs the estimate services in a single process, without a
+broker, and measures the latency of every RPC and event handler on realistic
+planning poker sessions. See `python -m loadtest --help`.
+"""
@@ -0,0 +1,72 @@
+"""
+Plays planning poker sessions against the estimate services and reports the
+latency percentiles and call rate of every RPC and event handler, e.g.:
+
+    PYTHONPATH=src python -m loadtest --sessions 20 --participants 8 --stories 10
+
+Sessions run one after the other, so results are reproducible for a seed, and
+the call rates are sequential, not the throughput of concurrent sessions. By
+default an in-memory SQLite database is used; pass `--db-url` to measure
+against PostgreSQL (its schema must already be migrated).
+
+With `--wire`, the bytes the websockets would receive on the whole run are
+reported too, per encoding offered by the gateway.
+
+With `--blocking-push`, services send their messages with blocking gateway
+RPCs instead of the `gateway_push` event, to compare the latency of writes
+(e.g. `story_service.create` and `story_service.update`) with both. Calls run
+in process, without the round trip through the broker a blocking RPC also
+waits for, so the difference is a lower bound.
+"""
+import argparse
+import json
+import random
+
+from loadtest.cluster import LocalCluster, create_database_engine
+from loadtest.scenario import run_session
+from loadtest.stats import format_report
+from loadtest.wire import measure_wire, format_wire_report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='loadtest', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--participants', type=int, default=8)
+    parser.add_argument('--stories', type=int, default=10)
+    parser.add_argument('--db-url', default='sqlite:///:memory:')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='prints the report as JSON')
+    parser.add_argument('--wire', action='store_true', help='reports bytes on wire per websocket encoding')
+    parser.add_argument('--blocking-push', action='store_true',
+                        help='sends messages to websockets with blocking gateway rpcs, as before gateway_push')
+    args = parser.parse_args(argv)
+
+    engine = create_database_engine(args.db_url)
+    cluster = LocalCluster(engine, blocking_push=args.blocking_push)
+    if engine.dialect.name == 'sqlite':
+        cluster.create_schema()
+
+    rng = random.Random(args.seed)
+    cluster.stats.start()
+    for _ in range(args.sessions):
+        run_session(cluster.gateway, rng, participants=args.participants, stories=args.stories)
+    cluster.stats.finish()
+
+    rows = cluster.stats.report()
+    wire = measure_wire(cluster.gateway.frames) if args.wire else None
+    if args.json:
+        print(json.dumps({'elapsed': cluster.stats.elapsed, 'calls': rows, 'wire': wire}, indent=2))
+    else:
+        print(format_report(rows))
+        print(f'\n{sum(row["calls"] for row in rows)} calls in {cluster.stats.elapsed:.2f}s; '
+              f'{cluster.gateway.pushed} messages pushed to websockets')
+        if wire is not None:
+            print()
+            print(format_wire_report(wire, args.sessions))
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
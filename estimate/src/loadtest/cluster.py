@@ -0,0 +1,325 @@
+import json
+import time
+import typing
+from collections import deque
+
+from nameko.events import EventHandler
+from nameko.exceptions import serialize, deserialize
+from nameko.extensions import ENTRYPOINT_EXTENSIONS_ATTR
+from nameko.rpc import RpcProxy
+from nameko.testing.services import worker_factory
+from nameko.web.websocket import SocketInfo
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from base.models import DeclarativeBase
+from base.outbox import OutboxBuffer
+from loadtest.gateway import GatewayService, SessionCache, transport
+from loadtest.stats import LatencyStats
+
+from poker.service import PokerService
+from story.service import StoryService
+from participant.service import ParticipantService
+from event.service import EventService
+from vote.service import VoteService
+from action.service import ActionService
+from polling.service import PollingService
+from invite.service import InviteService
+
+SERVICES = [
+    PokerService,
+    StoryService,
+    ParticipantService,
+    EventService,
+    VoteService,
+    ActionService,
+    PollingService,
+    InviteService,
+]
+
+
+def create_database_engine(db_url: str) -> Engine:
+    if db_url == 'sqlite:///:memory:':
+        # every session must see the same in-memory database
+        return create_engine(db_url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+    return create_engine(db_url)
+
+
+class ServiceProxy:
+    """
+    Stands in for a `RpcProxy`, calling the target service of the cluster
+    """
+
+    def __init__(self, cluster: 'LocalCluster', service_name: str):
+        self.cluster = cluster
+        self.service_name = service_name
+
+    def __getattr__(self, method: str):
+        def call(*args, **kwargs):
+            try:
+                return self.cluster.call(self.service_name, method, *args, **kwargs)
+            except Exception as exc:
+                # errors reach the caller serialized, as they do through the broker
+                raise deserialize(serialize(exc))
+        return call
+
+
+class EventCollector:
+    """
+    Stands in for an `EventDispatcher`, keeping the events until the worker
+    finishes
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event_type: str, payload):
+        self.events.append((event_type, payload))
+
+
+class BlockingOutbox:
+    """
+    Stands in for the outbox as services sent their messages before the
+    `gateway_push` event: right away, with a blocking `gateway_rpc` call, so
+    the worker waits for the gateway to deliver them
+    """
+
+    def __init__(self, gateway_rpc):
+        self.gateway_rpc = gateway_rpc
+        # nothing is left to push once the worker finishes
+        self.messages = []
+
+    def broadcast(self, channel, event: str, data):
+        self.gateway_rpc.broadcast(channel, event, data)
+
+    def unicast(self, sid, event: str, data):
+        self.gateway_rpc.unicast(sid, event, data)
+
+
+class RequestFailed(Exception):
+    pass
+
+
+class GatewayProxy:
+    """
+    Stands in for the `RpcProxy` of the gateway, calling the local gateway
+    """
+
+    def __init__(self, gateway: 'LocalGateway'):
+        self.gateway = gateway
+
+    def __getattr__(self, method: str):
+        def call(*args, **kwargs):
+            return self.gateway.run(method, *args, **kwargs)
+        return call
+
+
+class LocalSocket:
+    """
+    Websocket of a sid, keeping the frames it is sent
+    """
+
+    def __init__(self, gateway: 'LocalGateway', sid: str):
+        self.gateway = gateway
+        self.sid = sid
+
+    def send(self, payload):
+        self.gateway.frames[self.sid].append(payload)
+        self.gateway.pushed += 1
+
+
+class LocalRequestEntrypoint(transport.EncodingWebSocketRpc):
+    """
+    Stands in for the websocket entrypoint of `GatewayService.request`,
+    running it on a worker of the local gateway
+    """
+
+    def __init__(self, gateway: 'LocalGateway'):
+        super().__init__()
+        self.gateway = gateway
+        self.method_name = 'request'
+
+    def handle_message(self, socket_id, data, context_data):
+        return self.gateway.run(self.method_name, socket_id, **data)
+
+
+class LocalGateway:
+    """
+    Runs the gateway (`GatewayService`) in process. Requests are sent as
+    websocket frames to its transport and run by its `request` entrypoint,
+    which resolves the request context and builds the result envelope.
+    Messages pushed by the services are delivered by `handle_push` through
+    its hub, to a socket per sid.
+
+    Every frame the websocket of a sid receives (request results and pushed
+    events) is kept encoded on `frames`, in order, to measure bytes on wire.
+    """
+
+    def __init__(self, cluster: 'LocalCluster'):
+        self.cluster = cluster
+        self.sessions = SessionCache()
+        self.server = transport.EncodingWebSocketServer()
+        self.hub = transport.EncodingWebSocketHub(self.server)
+        self.server.register_provider(LocalRequestEntrypoint(self))
+        self.proxy = GatewayProxy(self)
+        self.frames: typing.Dict[str, list] = {}
+        self.pushed = 0
+
+    def create_worker(self):
+        dependencies = {
+            'hub': self.hub,
+            'sessions': self.sessions,
+        }
+        for name in dir(GatewayService):
+            proxy = getattr(GatewayService, name)
+            if isinstance(proxy, RpcProxy):
+                dependencies[name] = ServiceProxy(self.cluster, proxy.target_service)
+        return worker_factory(GatewayService, **dependencies)
+
+    def run(self, method_name: str, *args, **kwargs):
+        worker = self.create_worker()
+        return getattr(worker, method_name)(*args, **kwargs)
+
+    def connect(self, sid: str):
+        if sid not in self.server.sockets:
+            self.server.sockets[sid] = SocketInfo(LocalSocket(self, sid), {})
+            self.frames[sid] = []
+
+    def request(self, sid: str, service: str, method: str, data: dict):
+        """
+        Sends a request frame on the websocket of the sid, returning the result
+        of the service. Failed requests raise `RequestFailed`, after being
+        recorded.
+        """
+        self.connect(sid)
+        frame = json.dumps({
+            'method': 'request',
+            'data': {'service': service, 'method': method, 'data': data},
+            'correlation_id': None,
+        })
+
+        started = time.perf_counter()
+        response = self.server.handle_websocket_request(sid, {}, frame)
+        self.cluster.stats.record('gateway_service.request', time.perf_counter() - started)
+        self.frames[sid].append(response)
+
+        response = transport.decode(response)
+        envelope = response.get('data') or {}
+        if not response['success'] or not envelope.get('success'):
+            raise RequestFailed(response.get('error') or envelope.get('error'))
+        return envelope['result']
+
+    def deliver(self, messages: list):
+        if messages:
+            self.run('handle_push', messages)
+
+    def received(self, sid: str, event: str) -> typing.List[dict]:
+        frames = (transport.decode(frame) for frame in self.frames.get(sid, ()))
+        return [frame['data'] for frame in frames if frame['type'] == 'event' and frame['event'] == event]
+
+
+class LocalCluster:
+    """
+    Runs every estimate service in the current process, on the received
+    database. Each call gets a fresh worker, with its own database session,
+    outbox and event dispatcher, as a container would give it.
+
+    RPCs between services are called synchronously. Events are handled once
+    the worker that dispatched them finishes, since they are asynchronous on
+    a broker too. Every RPC and event handler call is measured on `stats`.
+
+    With `blocking_push`, workers send their messages to the gateway with
+    blocking RPCs instead of the `gateway_push` event, so their latency
+    includes the delivery, as it did before the outbox.
+    """
+
+    def __init__(self, engine: Engine, services: typing.List[type] = None, blocking_push: bool = False):
+        self.engine = engine
+        self.blocking_push = blocking_push
+        self.Session = sessionmaker(bind=engine)
+        self.services = {service.name: service for service in (services or SERVICES)}
+        self.gateway = LocalGateway(self)
+        self.stats = LatencyStats()
+        self.pending_events = deque()
+        self.depth = 0
+        self.handlers = self.find_event_handlers()
+
+    def create_schema(self):
+        DeclarativeBase.metadata.create_all(bind=self.engine)
+
+    def find_event_handlers(self) -> typing.Dict[tuple, typing.List[tuple]]:
+        handlers = {}
+        for service_name, service_cls in self.services.items():
+            for method_name in dir(service_cls):
+                method = getattr(service_cls, method_name)
+                for entrypoint in getattr(method, ENTRYPOINT_EXTENSIONS_ATTR, ()):
+                    if isinstance(entrypoint, EventHandler):
+                        key = (entrypoint.source_service, entrypoint.event_type)
+                        handlers.setdefault(key, []).append((service_name, method_name))
+        return handlers
+
+    def create_worker(self, service_cls: type):
+        dependencies = {
+            'gateway_rpc': self.gateway.proxy,
+            'dispatch': EventCollector(),
+            'outbox': BlockingOutbox(self.gateway.proxy) if self.blocking_push else OutboxBuffer(),
+        }
+        if hasattr(service_cls, 'db'):
+            dependencies['db'] = self.Session()
+        for name in dir(service_cls):
+            proxy = getattr(service_cls, name)
+            if isinstance(proxy, RpcProxy) and name not in dependencies:
+                dependencies[name] = ServiceProxy(self, proxy.target_service)
+        return worker_factory(service_cls, **dependencies)
+
+    def run_worker(self, service_name: str, method_name: str, args: tuple, kwargs: dict):
+        worker = self.create_worker(self.services[service_name])
+
+        started = time.perf_counter()
+        success = False
+        try:
+            result = getattr(worker, method_name)(*args, **kwargs)
+            success = True
+        finally:
+            duration = time.perf_counter() - started
+            if hasattr(worker, 'db'):
+                worker.db.close()
+            self.stats.record(f'{service_name}.{method_name}', duration, success)
+
+        # like the outbox, only successful workers push messages and events
+        self.gateway.deliver(worker.outbox.messages)
+        for event_type, payload in worker.dispatch.events:
+            self.pending_events.append((service_name, event_type, payload))
+
+        return result
+
+    def call(self, service_name: str, method_name: str, *args, **kwargs):
+        """
+        Calls an RPC of a service. Once the outermost call finishes, the events
+        it caused are handled.
+        """
+        self.depth += 1
+        try:
+            result = self.run_worker(service_name, method_name, args, kwargs)
+        finally:
+            self.depth -= 1
+
+        if self.depth == 0:
+            self.handle_pending_events()
+        return result
+
+    def handle_pending_events(self):
+        self.depth += 1
+        try:
+            while self.pending_events:
+                source_service, event_type, payload = self.pending_events.popleft()
+                for service_name, method_name in self.handlers.get((source_service, event_type), ()):
+                    try:
+                        self.run_worker(service_name, method_name, (payload,), {})
+                    except Exception:
+                        # already recorded as an error, the other handlers still run
+                        pass
+        finally:
+            self.depth -= 1
@@ -0,0 +1,31 @@
+"""
+Code of the gateway project (`gateway/src`) used by the load test, so the
+requests and messages go through the shipped `GatewayService` and transport
+instead of a copy of them.
+
+The gateway modules are imported by their flat names, as the gateway does
+itself. Its path is appended, so estimate modules keep precedence.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+GATEWAY_SRC = Path(__file__).resolve().parents[3] / 'gateway' / 'src'
+
+if str(GATEWAY_SRC) not in sys.path:
+    sys.path.append(str(GATEWAY_SRC))
+
+import transport  # noqa (after the gateway path is set)
+from sessions import SessionCache  # noqa
+
+
+def _load_gateway_main():
+    # `main` is the name of the estimate entry module too, so it's loaded by path
+    spec = importlib.util.spec_from_file_location('gateway_main', GATEWAY_SRC / 'main.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+GatewayService = _load_gateway_main().GatewayService
@@ -0,0 +1,68 @@
+import random
+import typing
+import uuid
+
+from loadtest.cluster import LocalGateway
+
+
+def new_sid() -> str:
+    return uuid.uuid4().hex
+
+
+def run_session(gateway: LocalGateway, rng: random.Random, participants: int, stories: int) -> dict:
+    """
+    Plays a whole planning poker session through the gateway: the owner starts
+    the poker, participants join it, and every story is described, voted by
+    everyone, revealed and completed. Returns the snapshot of the finished poker.
+    """
+    owner_sid = new_sid()
+    gateway.request(owner_sid, 'poker_service', 'start', {'payload': {'creator': 'owner'}})
+    invite = gateway.received(owner_sid, 'poker_started')[-1]
+
+    sids = [owner_sid] + [new_sid() for _ in range(participants - 1)]
+    for index, sid in enumerate(sids):
+        created = gateway.request(sid, 'participant_service', 'create', {'payload': {
+            'name': f'participant {index}',
+            'pokerId': invite['pokerId'],
+            'inviteCode': invite['code'],
+        }})
+        # rejoins from a new connection, as a reloaded page does
+        gateway.request(sid, 'participant_service', 'join', {
+            'entity_id': created['id'],
+            'payload': {'secretKey': created['secretKey']},
+        })
+
+    poker = gateway.request(owner_sid, 'poker_service', 'retrieve', {'entity_id': invite['pokerId']})
+    vote_values = [value for value in poker['votePattern'].split(',') if value]
+
+    for index in range(stories):
+        story = gateway.request(owner_sid, 'story_service', 'create', {'payload': {
+            'name': f'story {index}',
+            'pokerId': invite['pokerId'],
+        }})
+        gateway.request(owner_sid, 'story_service', 'update', {
+            'entity_id': story['id'],
+            'payload': {'description': f'description of story {index}'},
+        })
+        gateway.request(owner_sid, 'poker_service', 'select_story', {
+            'poker_id': invite['pokerId'],
+            'story_id': story['id'],
+        })
+
+        polling = gateway.request(owner_sid, 'polling_service', 'current', {'story_id': story['id']})
+        for sid in sids:
+            gateway.request(sid, 'vote_service', 'place', {'payload': {
+                'value': rng.choice(vote_values),
+                'pollingId': polling['id'],
+            }})
+
+        gateway.request(owner_sid, 'story_service', 'reveal', {'entity_id': story['id']})
+        tally = gateway.request(owner_sid, 'polling_service', 'tally', {'entity_id': polling['id']})['tally']
+        value = tally['median'] if tally['median'] is not None else rng.choice(vote_values)
+        gateway.request(owner_sid, 'polling_service', 'complete', {'payload': {
+            'id': polling['id'],
+            'value': str(value),
+        }})
+
+    gateway.request(owner_sid, 'poker_service', 'snapshot', {})
+    return gateway.received(owner_sid, 'poker_snapshot')[-1]
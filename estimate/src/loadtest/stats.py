@@ -0,0 +1,78 @@
+import math
+import time
+import typing
+from collections import defaultdict
+
+
+def percentile(durations: typing.List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of the received durations
+    """
+    if not durations:
+        return 0.0
+    ordered = sorted(durations)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class LatencyStats:
+    """
+    Durations (in seconds) of every call, grouped by name (e.g.
+    `vote_service.place`)
+    """
+
+    def __init__(self):
+        self.durations: typing.Dict[str, typing.List[float]] = defaultdict(list)
+        self.errors: typing.Dict[str, int] = defaultdict(int)
+        self.started_at: typing.Optional[float] = None
+        self.finished_at: typing.Optional[float] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        finished_at = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return finished_at - self.started_at
+
+    def record(self, name: str, duration: float, success: bool = True):
+        self.durations[name].append(duration)
+        if not success:
+            self.errors[name] += 1
+
+    def report(self) -> typing.List[dict]:
+        """
+        Latency percentiles (in milliseconds) and rate (calls per second over
+        the whole run) of every call name. Calls are made one after the other,
+        so the rate is sequential, not concurrent throughput.
+        """
+        elapsed = self.elapsed
+        rows = []
+        for name in sorted(self.durations):
+            durations = self.durations[name]
+            rows.append({
+                'name': name,
+                'calls': len(durations),
+                'errors': self.errors[name],
+                'p50': percentile(durations, 50) * 1000,
+                'p95': percentile(durations, 95) * 1000,
+                'p99': percentile(durations, 99) * 1000,
+                'sequential_rate': len(durations) / elapsed if elapsed else 0.0,
+            })
+        return rows
+
+
+def format_report(rows: typing.List[dict]) -> str:
+    header = f'{"call":<40} {"calls":>7} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"seq/s":>9}'
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        lines.append(
+            f'{row["name"]:<40} {row["calls"]:>7} {row["errors"]:>7} '
+            f'{row["p50"]:>9.2f} {row["p95"]:>9.2f} {row["p99"]:>9.2f} {row["sequential_rate"]:>9.1f}'
+        )
+    return '\n'.join(lines)
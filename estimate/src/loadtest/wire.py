@@ -0,0 +1,61 @@
+import typing
+
+from eventlet.websocket import RFC6455WebSocket
+
+from loadtest.gateway import transport
+
+# encodings of the gateway transport, with and without permessage-deflate
+ENCODINGS = ('json', 'json+deflate', 'msgpack', 'msgpack+deflate')
+
+# what a browser offers on `Sec-WebSocket-Extensions`
+CLIENT_EXTENSIONS = {'permessage-deflate': [{'client_max_window_bits': True}]}
+
+
+class Connection:
+    """
+    Bytes sent to a single websocket. Messages are encoded by the gateway
+    transport and framed (and compressed, keeping the deflate context between
+    messages) by the eventlet websocket the gateway serves them with.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding, _, deflate = encoding.partition('+')
+        wsgi = transport.NegotiatingWebSocketWSGI(handler=None, deflate=bool(deflate))
+        extensions = {}
+        negotiated = wsgi._negotiate_permessage_deflate(CLIENT_EXTENSIONS)
+        if negotiated is not None:
+            extensions['permessage-deflate'] = negotiated
+        self.websocket = RFC6455WebSocket(None, {}, version=13, extensions=extensions)
+        self.bytes = 0
+
+    def send(self, message: dict):
+        payload = transport.encode(self.encoding, message)
+        self.bytes += len(self.websocket._pack_message(payload))
+
+
+def measure_wire(frames: typing.Dict[str, list]) -> typing.Dict[str, int]:
+    """
+    Total bytes on wire (frame headers included) of the frames sent to every
+    sid, per encoding. Frames are received as sent by the gateway, and
+    encoded again for every encoding.
+    """
+    messages = {sid: [transport.decode(frame) for frame in sid_frames] for sid, sid_frames in frames.items()}
+
+    totals = {}
+    for encoding in ENCODINGS:
+        total = 0
+        for sid_messages in messages.values():
+            connection = Connection(encoding)
+            for message in sid_messages:
+                connection.send(message)
+            total += connection.bytes
+        totals[encoding] = total
+    return totals
+
+
+def format_wire_report(totals: typing.Dict[str, int], sessions: int) -> str:
+    header = f'{"encoding":<20} {"bytes":>12} {"per session":>12} {"vs json":>8}'
+    lines = [header, '-' * len(header)]
+    for encoding, total in totals.items():
+        lines.append(f'{encoding:<20} {total:>12} {total // max(sessions, 1):>12} {total / totals["json"]:>8.2f}')
+    return '\n'.join(lines)
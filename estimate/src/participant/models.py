@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Uuid, ForeignKey
+from sqlalchemy import Column, String, Uuid, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from base.models import Model
 from participant.secret import generate_secret
@@ -6,6 +6,11 @@ from participant.secret import generate_secret
 
 class Participant(Model):
     __tablename__ = "participants"
+    __table_args__ = (
+        Index("ix_participants_sid_updated_at", "sid", "updated_at"),
+        Index("ix_participants_poker_id", "poker_id"),
+        Index("ix_participants_keycloak_user_id", "keycloak_user_id"),
+    )
 
     name = Column(
         String(),
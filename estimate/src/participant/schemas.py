@@ -9,6 +9,7 @@ class ParticipantRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     name: str
     sid: str
     poker_id: UUID
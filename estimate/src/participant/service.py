@@ -7,6 +7,7 @@ from nameko.rpc import rpc, RpcProxy
 
 from base.converters import from_uuid, from_str
 from base.exceptions import NotFound, NotAllowed
+from base.logs import log_dump
 from base.service import EntityService
 from participant.models import Participant
 from participant.schemas import (ParticipantRead, ParticipantCreate, ParticipantUpdate, ParticipantCreateWithInvite,
@@ -14,7 +15,6 @@ from participant.schemas import (ParticipantRead, ParticipantCreate, Participant
 from participant.exceptions import InvalidInviteCode
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class ParticipantService(EntityService):
@@ -26,6 +26,8 @@ class ParticipantService(EntityService):
     dto_create = ParticipantCreate
     dto_update = ParticipantUpdate
     broadcast_changes = True
+    scope_columns = ('poker_id',)
+    read_only_methods = EntityService.read_only_methods + ('current',)
 
     invite_rpc = RpcProxy('invite_service')
 
@@ -40,14 +42,14 @@ class ParticipantService(EntityService):
         participant: Participant = entity
         return str(participant.poker_id)
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Participant).filter(Participant.poker_id == current_poker_id)
 
     @rpc
-    def create(self, sid, payload: dict) -> dict:
+    def create(self, sid, payload: dict, context: dict = None) -> dict:
         dto = ParticipantCreateWithInvite(**payload)
         
         valid = self.invite_rpc.validate(code=dto.invite_code, poker_id=dto.poker_id)
@@ -61,16 +63,16 @@ class ParticipantService(EntityService):
         self.db.add(entity)
         self.db.commit()
 
-        logger.debug(f'created "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
-
         result = ParticipantCreated.to_json(entity)
 
+        log_dump('created "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
         self.handle_propagate(sid, self.event_created, entity, result)
 
         return result
 
     @rpc
-    def update(self, sid, entity_id: str, payload: dict) -> dict:
+    def update(self, sid, entity_id: str, payload: dict, version: int = None, context: dict = None) -> dict:
         entity_id = UUID(entity_id)
         dto = ParticipantUpdate(**payload)
 
@@ -84,21 +86,24 @@ class ParticipantService(EntityService):
         if entity.secret_key != dto.secret_key:
             raise NotAllowed()
 
+        self.check_version(entity, version)
+
         # this method overrides default update to only update sid
         entity.sid = sid
 
-        self.db.commit()
-
-        logger.debug(f'update "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
+        changed_attrs = self.get_changed_attrs(entity)
+        self.commit_versioned()
 
         result = self.dto_read.to_json(entity)
 
-        self.handle_propagate(sid, self.event_updated, entity, result)
+        log_dump('update "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
+        self.handle_propagate(sid, self.event_updated, entity, result, message=self.get_delta(result, changed_attrs))
 
         return result
 
     @rpc
-    def join(self, sid, entity_id: str, payload: dict) -> dict:
+    def join(self, sid, entity_id: str, payload: dict, context: dict = None) -> dict:
         entity_id = UUID(entity_id)
         dto = ParticipantJoin(**payload)
 
@@ -118,22 +123,23 @@ class ParticipantService(EntityService):
 
         poker_id = str(entity.poker_id)
 
-        self.db.commit()
-
-        logger.debug(f'join participant! {entity.id}; {entity.to_dict()}')
+        changed_attrs = self.get_changed_attrs(entity)
+        self.commit_versioned()
 
         result = self.dto_read.to_json(entity)
 
-        self.handle_propagate(sid, self.event_updated, entity, result)
+        log_dump('join participant! %s', entity.id, entity=entity)
+
+        self.handle_propagate(sid, self.event_updated, entity, result, message=self.get_delta(result, changed_attrs))
 
         self.gateway_rpc.subscribe(sid, poker_id)
         self.dispatch('poker_joined', result)
-        self.gateway_rpc.broadcast(poker_id, 'poker_joined', result)
+        self.outbox.broadcast(poker_id, 'poker_joined', result)
 
         return result
 
     @rpc
-    def current(self, sid) -> dict:
+    def current(self, sid, context: dict = None) -> dict:
         """
         Finds the current participant used by a certain SID. This is useful to discover which poker session is being
         interacted.
@@ -2,7 +2,9 @@ from datetime import datetime
 from uuid import UUID
 from typing import List, Optional
 from pydantic import BaseModel
+from sqlalchemy.orm import selectinload
 from base.schemas import APIModel, SimpleModel
+from poker.models import Poker
 from story.schemas import StoryRead
 from participant.schemas import ParticipantRead
 from invite.schemas import InviteRead
@@ -22,6 +24,7 @@ class PokerRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     creator: str
     vote_pattern: str
     anonymous_voting: bool
@@ -29,8 +32,18 @@ class PokerRead(APIModel):
     stories: List[StoryRead] = None
     participants: List[ParticipantRead] = None
 
+    @classmethod
+    def loader_options(cls) -> list:
+        return [
+            selectinload(Poker.stories).options(*StoryRead.loader_options()),
+            selectinload(Poker.participants).options(*ParticipantRead.loader_options()),
+        ]
+
 
 class PokerContext(SimpleModel):
     poker: dict
     stories: list
     participants: list
+    # latest change within the room, clients send it back as `since` to receive only newer changes
+    version: str
+    since: Optional[str] = None
@@ -4,17 +4,16 @@ from uuid import UUID
 from typing import Union
 
 from nameko.rpc import rpc, RpcProxy
-
+from base.converters import from_datetime
 from base.service import EntityService
 from base.schemas import SimpleListing
-from base.exceptions import NotFound, NotAllowed
+from base.exceptions import NotFound, NotAllowed, InvalidInput
 from poker.models import Poker
 from poker.schemas import PokerRead, PokerCreate, PokerUpdate, PokerContext
 from participant.models import Participant
 from invite.models import Invite
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class PokerService(EntityService):
@@ -26,6 +25,8 @@ class PokerService(EntityService):
     dto_create = PokerCreate
     dto_update = PokerUpdate
     broadcast_changes = True
+    scope_columns = ('id',)
+    read_only_methods = EntityService.read_only_methods + ('history', 'snapshot')
 
     story_rpc = RpcProxy("story_service")
     participant_rpc = RpcProxy("participant_service")
@@ -35,26 +36,26 @@ class PokerService(EntityService):
         poker: Poker = entity
         return str(poker.id)
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Poker).filter(Poker.id == current_poker_id)
 
     @rpc
-    def start(self, sid, payload: dict) -> dict:
-        poker = self.create(sid=sid, payload=payload)
+    def start(self, sid, payload: dict, context: dict = None) -> dict:
+        poker = self.create(sid=sid, payload=payload, context=context)
         invite = self.invite_rpc.create(sid=sid, payload={
             'pokerId': poker['id'],
             'expiresAt': str(datetime.datetime.now() + datetime.timedelta(hours=1))
         })
-        self.gateway_rpc.unicast(sid, 'poker_started', invite)
+        self.outbox.unicast(sid, 'poker_started', invite)
 
     # TODO: leave event
 
     @rpc
-    def select_story(self, sid: str, poker_id: str, story_id: Union[str | None] = None):
-        poker = self.get_base_query(sid=sid) \
+    def select_story(self, sid: str, poker_id: str, story_id: Union[str | None] = None, context: dict = None):
+        poker = self.get_base_query(sid=sid, context=context) \
             .filter(Poker.id == UUID(poker_id)) \
             .first()
 
@@ -67,21 +68,24 @@ class PokerService(EntityService):
             story_id = UUID(story_id)
 
         poker.current_story_id = story_id
-        self.db.commit()
+        changed_attrs = self.get_changed_attrs(poker)
+        self.commit_versioned()
 
         serialized_poker = self.dto_read.to_json(poker)
 
-        self.handle_propagate(sid, self.event_updated, poker, serialized_poker)
-        self.gateway_rpc.broadcast(poker_id, 'poker_selected_story', story)
+        self.handle_propagate(sid, self.event_updated, poker, serialized_poker,
+                              message=self.get_delta(serialized_poker, changed_attrs))
+        self.outbox.broadcast(poker_id, 'poker_selected_story', story)
         self.dispatch('poker_selected_story', story)
 
         return story
 
     @rpc
-    def history(self, sid: str, keycloak_id: str):
+    def history(self, sid: str, keycloak_id: str, context: dict = None):
         entities = self.db.query(Poker) \
             .join(Participant, Poker.id == Participant.poker_id) \
             .filter(Participant.keycloak_user_id == keycloak_id) \
+            .options(*self.dto_read.loader_options()) \
             .order_by(Poker.created_at.desc()) \
             .all()
 
@@ -92,6 +96,68 @@ class PokerService(EntityService):
         result = SimpleListing(items=items)
         result = result.to_json()
 
-        self.gateway_rpc.unicast(sid, 'poker_queried_history', result)
+        self.outbox.unicast(sid, 'poker_queried_history', result)
+
+        return result
+
+    @rpc
+    def snapshot(self, sid: str, since: str = None, context: dict = None):
+        """
+        Loads the whole state of the current poker room at once. When `since`
+        is given, only stories and participants changed after it are sent.
+        Deletions are not part of the snapshot, they are still broadcasted.
+        """
+        if since is not None:
+            try:
+                since = from_datetime(since)
+            except ValueError:
+                raise InvalidInput()
+
+        # one query per relationship level, regardless of the room size
+        poker: Poker = self.get_base_query(sid=sid, context=context) \
+            .options(*self.dto_read.loader_options()) \
+            .first()
+
+        if poker is None:
+            raise NotFound()
+
+        story_versions = {
+            story.id: max([
+                story.updated_at,
+                *[event.updated_at for event in story.events],
+                *[polling.updated_at for polling in story.pollings],
+                *[vote.updated_at for polling in story.pollings for vote in polling.votes],
+            ])
+            for story in poker.stories
+        }
+        version = max([
+            poker.updated_at,
+            *story_versions.values(),
+            *[participant.updated_at for participant in poker.participants],
+        ])
+
+        serialized = self.dto_read.to_json(poker)
+        stories = serialized.pop('stories')
+        participants = serialized.pop('participants')
+
+        if since is not None:
+            stories = [
+                item for item, story in zip(stories, poker.stories)
+                if story_versions[story.id] > since
+            ]
+            participants = [
+                item for item, participant in zip(participants, poker.participants)
+                if participant.updated_at > since
+            ]
+
+        result = PokerContext(
+            poker=serialized,
+            stories=stories,
+            participants=participants,
+            version=version.isoformat(),
+            since=since.isoformat() if since is not None else None,
+        ).to_json()
+
+        self.outbox.unicast(sid, 'poker_snapshot', result)
 
         return result
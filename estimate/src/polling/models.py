@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey
+from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship, backref
 
 from base.models import Model
@@ -6,6 +6,10 @@ from base.models import Model
 
 class Polling(Model):
     __tablename__ = "pollings"
+    __table_args__ = (
+        Index("ix_pollings_story_id_completed_created_at", "story_id", "completed", "created_at"),
+        Index("ix_pollings_poker_id_completed", "poker_id", "completed"),
+    )
 
     value = Column(
         String(),
@@ -30,6 +34,12 @@ class Polling(Model):
         server_default='false'
     )
 
+    # summary of the votes, see `polling.tally`
+    tally = Column(
+        JSON(),
+        nullable=True
+    )
+
     story_id = Column(
         Uuid(),
         ForeignKey("stories.id", name="fk_pollings_story_id", ondelete="CASCADE"),
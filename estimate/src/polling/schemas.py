@@ -2,7 +2,10 @@ from datetime import datetime
 from typing import Optional, List
 from uuid import UUID
 
+from sqlalchemy.orm import selectinload
+
 from base.schemas import APIModel
+from polling.models import Polling
 from vote.schemas import VoteRead
 
 
@@ -10,14 +13,20 @@ class PollingRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     value: Optional[str] = None
     completed: bool
     revealed: bool
     anonymous: bool
     story_id: UUID
     poker_id: UUID
+    tally: Optional[dict] = None
     votes: List[VoteRead] = None
 
+    @classmethod
+    def loader_options(cls) -> list:
+        return [selectinload(Polling.votes).options(*VoteRead.loader_options())]
+
 
 class PollingCreate(APIModel):
     story_id: UUID
@@ -5,16 +5,23 @@ from uuid import UUID
 
 from nameko.rpc import rpc, RpcProxy
 from nameko.events import event_handler
+from sqlalchemy import update, func
+from sqlalchemy.orm import selectinload, joinedload
 
 from base.exceptions import NotFound
+from base.logs import log_dump
+from base.schemas import SimpleListing
 from base.converters import from_uuid, from_bool
 from base.service import EntityService
 from polling.models import Polling
 from polling.schemas import PollingRead, PollingCreate, PollingUpdate, PollingComplete
+from polling.tally import build_tally
+from poker.models import Poker
 from story.models import Story
+from story.schemas import StoryRead
+from vote.models import Vote
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class PollingService(EntityService):
@@ -26,6 +33,8 @@ class PollingService(EntityService):
     dto_create = PollingCreate
     dto_update = PollingUpdate
     broadcast_changes = True
+    scope_columns = ('poker_id',)
+    read_only_methods = EntityService.read_only_methods + ('current', 'tally')
 
     def get_query_column_converters(self) -> typing.Dict[str, typing.Callable[[any], str]]:
         return {
@@ -38,10 +47,10 @@ class PollingService(EntityService):
         polling: Polling = entity
         return f'story:{str(polling.story_id)}'
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Polling).filter(Polling.poker_id == current_poker_id)
 
     @event_handler("story_service", "story_created")
@@ -52,7 +61,7 @@ class PollingService(EntityService):
         })
 
     @rpc
-    def create(self, sid, payload: dict) -> dict:
+    def create(self, sid, payload: dict, context: dict = None) -> dict:
         dto = PollingCreate(**payload)
 
         story = self.db.query(Story).filter(Story.id == dto.story_id).first()
@@ -64,16 +73,16 @@ class PollingService(EntityService):
         self.db.add(entity)
         self.db.commit()
 
-        logger.debug(f'created "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
-
         result = self.dto_read.to_json(entity)
 
+        log_dump('created "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
         self.handle_propagate(sid, self.event_created, entity, result)
 
         return result
 
     @rpc
-    def current(self, sid, story_id):
+    def current(self, sid, story_id, context: dict = None):
         story_id = UUID(story_id)
 
         entity = self.db.query(Polling) \
@@ -90,48 +99,189 @@ class PollingService(EntityService):
         return result
 
     @rpc
-    def complete(self, sid, payload):
+    def complete(self, sid, payload, context: dict = None):
+        """
+        Completes the polling and sets its value on the story, within a single
+        transaction. Both rows are locked until the commit.
+
+        Publishes, after the commit:
+        - `polling_completed` with the completed polling, to the story room;
+        - `story_updated` with the story, whose clients get the value change
+          as a delta on the poker room (as `StoryService.update` does).
+        """
         dto = PollingComplete(**payload)
 
-        original = self.retrieve(sid=None, entity_id=dto.id)
+        entity: Polling = self.get_base_query(sid=sid, context=context) \
+            .filter(Polling.id == UUID(dto.id)) \
+            .options(
+                *self.dto_read.loader_options(),
+                joinedload(Polling.story, innerjoin=True).options(*StoryRead.loader_options()),
+            ) \
+            .with_for_update() \
+            .first()
 
-        result = self.update(sid=sid, entity_id=dto.id, payload={
-            "value": dto.value,
-            "completed": True,
-            "revealed": True,
-            "anonymous": original["anonymous"],
-            "storyId": original["storyId"],
-        })
+        if entity is None:
+            raise NotFound()
 
-        logger.debug(f'completed "{self.entity_name}" entity! {result["id"]}; {result}')
+        story: Story = entity.story
+
+        entity.value = dto.value
+        entity.completed = True
+        entity.revealed = True
+        story.value = dto.value
+        story_changed_attrs = self.get_changed_attrs(story)
+
+        # serialized before committing, so the entities aren't loaded again
+        self.db.flush()
+        result = self.dto_read.to_json(entity)
+        story_result = StoryRead.to_json(story)
+        self.commit_versioned()
+
+        log_dump('completed "%s" entity! %s', self.entity_name, result["id"], entity=result)
 
         room_name = f'story:{result["storyId"]}'
         self.dispatch('polling_completed', result)
-        self.gateway_rpc.broadcast(room_name, 'polling_completed', result)
+        self.outbox.broadcast(room_name, 'polling_completed', result)
+
+        self.dispatch('story_updated', story_result)
+        self.outbox.broadcast(str(story.poker_id), 'story_updated',
+                              self.get_delta(story_result, story_changed_attrs, dto_read=StoryRead))
 
         return result
 
     @rpc
-    def restart(self, sid, entity_id):
-        original = self.retrieve(sid=None, entity_id=entity_id)
-        story_id = original["storyId"]
+    def restart(self, sid, entity_id, context: dict = None):
+        """
+        Completes every open polling of the story and starts a new one, within
+        a single transaction. The story row is locked, so concurrent restarts
+        can't leave the story with two open pollings.
+
+        Publishes, after the commit, to the story room:
+        - `pollings_updated` with the pollings it completed;
+        - `polling_created` with the new polling, as `create` does;
+        - `polling_restarted` with the new polling.
+        """
+        original: Polling = self.get_base_query(sid=sid, context=context) \
+            .filter(Polling.id == UUID(entity_id)) \
+            .first()
+
+        if original is None:
+            raise NotFound()
+
+        story: Story = self.db.query(Story) \
+            .filter(Story.id == original.story_id) \
+            .with_for_update() \
+            .one()
 
         # completes current polling
-        completed = self.update(sid=sid, entity_id=entity_id, payload={
-            **original,
-            "completed": True,
-        })
+        completed_ids = self.db.scalars(
+            update(Polling)
+            .where(Polling.story_id == story.id)
+            .where(Polling.completed == False)
+            .values(completed=True, version=Polling.version + 1)
+            .returning(Polling.id)
+        ).all()
+
+        completed = self.db.query(Polling) \
+            .filter(Polling.id.in_(completed_ids)) \
+            .options(*self.dto_read.loader_options()) \
+            .order_by(Polling.created_at) \
+            .all()
 
         # starts a new polling
-        result = self.create(sid=sid, payload={
-            "storyId": story_id
-        })
+        entity = self.model(story_id=story.id, poker_id=story.poker_id, anonymous=story.poker.anonymous_voting,
+                            votes=[])
+        self.db.add(entity)
 
-        logger.debug(f'restarted "{self.entity_name}" entity! {result["id"]}; {result}')
+        self.db.flush()
+        completed_result = SimpleListing(items=[self.dto_read.to_json(polling) for polling in completed]).to_json()
+        result = self.dto_read.to_json(entity)
+        self.db.commit()
+
+        log_dump('restarted "%s" entity! %s', self.entity_name, result["id"], entity=result)
+
+        room_name = f'story:{story.id}'
+        if completed:
+            self.dispatch('pollings_updated', completed_result)
+            self.outbox.broadcast(room_name, 'pollings_updated', completed_result)
+
+        self.handle_propagate(sid, self.event_created, entity, result)
 
-        room_name = f'story:{story_id}'
         self.dispatch('polling_restarted', result)
-        self.gateway_rpc.broadcast(room_name, 'polling_restarted', result)
+        self.outbox.broadcast(room_name, 'polling_restarted', result)
+
+        return result
+
+    def count_votes(self, polling_id: UUID) -> dict:
+        return dict(
+            self.db.query(Vote.value, func.count(Vote.id))
+            .filter(Vote.polling_id == polling_id)
+            .group_by(Vote.value)
+            .all()
+        )
+
+    @event_handler("vote_service", "vote_placed")
+    @event_handler("vote_service", "vote_created")
+    @event_handler("vote_service", "vote_updated")
+    @event_handler("vote_service", "vote_deleted")
+    def handle_vote_changed(self, payload: dict):
+        # the tally is recounted rather than incremented, so events delivered
+        # more than once or out of order can't skew it
+        polling_id = UUID(payload['pollingId'])
+
+        # the polling is locked until the commit, so concurrent recounts of it
+        # run one after the other and the last one counts every vote
+        row = self.db.query(Polling.id, Polling.story_id, Poker.vote_pattern) \
+            .join(Poker, Poker.id == Polling.poker_id) \
+            .filter(Polling.id == polling_id) \
+            .with_for_update(of=Polling) \
+            .first()
+
+        if row is None:
+            return
+
+        tally = build_tally(row.vote_pattern, self.count_votes(polling_id))
+
+        # written without bumping the version: the tally is derived from the
+        # votes and sent on its own event, not as a change of the polling
+        self.db.execute(
+            update(Polling)
+            .where(Polling.id == polling_id)
+            .values(tally=tally)
+        )
+        self.db.commit()
+
+        result = {
+            "pollingId": str(row.id),
+            "storyId": str(row.story_id),
+            "tally": tally,
+        }
+        room_name = f'story:{row.story_id}'
+
+        self.dispatch('polling_tallied', result)
+        self.outbox.broadcast(room_name, 'polling_tallied', result)
+
+    @rpc
+    def tally(self, sid, entity_id: str, context: dict = None) -> dict:
+        row = self.get_base_query(sid=sid, context=context) \
+            .join(Poker, Poker.id == Polling.poker_id) \
+            .filter(Polling.id == UUID(entity_id)) \
+            .with_entities(Polling.id, Polling.story_id, Polling.tally, Poker.vote_pattern) \
+            .first()
+
+        if row is None:
+            raise NotFound()
+
+        result = {
+            "pollingId": str(row.id),
+            "storyId": str(row.story_id),
+            # pollings without votes have no tally stored yet
+            "tally": row.tally if row.tally is not None else build_tally(row.vote_pattern, {}),
+        }
+
+        self.outbox.unicast(sid, 'polling_tallied', result)
+
+        return result
 
     @event_handler("poker_service", "poker_updated")
     def handle_poker_updated(self, payload: dict):
@@ -140,23 +290,34 @@ class PollingService(EntityService):
 
         anonymous = payload['anonymousVoting']
 
-        uncompleted_pollings = self.db.query(Polling) \
-            .filter(Polling.poker_id == poker_id) \
-            .filter(Polling.completed == False) \
-            .filter(Polling.revealed == False)
+        # updates every open polling at once; the broadcasts go after the commit
+        polling_ids = self.db.scalars(
+            update(Polling)
+            .where(Polling.poker_id == poker_id)
+            .where(Polling.completed == False)
+            .where(Polling.revealed == False)
+            .where(Polling.anonymous != anonymous)
+            .values(anonymous=anonymous, version=Polling.version + 1)
+            .returning(Polling.id)
+        ).all()
+        self.db.commit()
 
-        polling_ids = []
+        # e.g. the poker update selected a story, anonymity didn't change
+        if not polling_ids:
+            return
 
-        for entity in uncompleted_pollings:
-            entity: Polling = entity
-            entity.anonymous = anonymous
-            self.db.commit()
+        entities = self.db.query(Polling) \
+            .options(selectinload(Polling.votes).joinedload(Vote.participant)) \
+            .filter(Polling.id.in_(polling_ids)) \
+            .order_by(Polling.created_at)
 
-            polling_ids.append(str(entity.id))
+        rooms: typing.Dict[str, list] = {}
+        for entity in entities:
+            rooms.setdefault(self.get_room_name(entity), []).append(self.dto_read.to_json(entity))
 
-            serialized = self.dto_read.to_json(entity)
-            room_name = self.get_room_name(entity)
-            self.dispatch('polling_updated', serialized)
-            self.gateway_rpc.broadcast(room_name, 'polling_updated', serialized)
+        for room_name, items in rooms.items():
+            serialized = SimpleListing(items=items).to_json()
+            self.dispatch('pollings_updated', serialized)
+            self.outbox.broadcast(room_name, 'pollings_updated', serialized)
 
-        logger.debug(f'updated pollings based on poker change! anonymous={anonymous}; {polling_ids};')
+        logger.debug('updated pollings based on poker change! anonymous=%s; %s;', anonymous, polling_ids)
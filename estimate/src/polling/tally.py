@@ -0,0 +1,39 @@
+import typing
+from statistics import median
+
+
+def parse_pattern(vote_pattern: str) -> typing.List[str]:
+    return [value for value in vote_pattern.split(",") if value]
+
+
+def to_number(value: str) -> typing.Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def build_tally(vote_pattern: str, counts: typing.Dict[str, int]) -> dict:
+    """
+    Summarizes the votes of a polling from the amount of votes per value.
+    Every value of the vote pattern is counted, even without votes. Mean and
+    median only consider numeric values (e.g. "?" is ignored).
+    """
+    tally_counts = {value: 0 for value in parse_pattern(vote_pattern)}
+    tally_counts.update({value: count for value, count in counts.items() if count > 0})
+
+    numbers = []
+    for value, count in tally_counts.items():
+        number = to_number(value)
+        if number is not None:
+            numbers.extend([number] * count)
+
+    voted_values = [value for value, count in tally_counts.items() if count > 0]
+
+    return {
+        "counts": tally_counts,
+        "total": sum(tally_counts.values()),
+        "mean": sum(numbers) / len(numbers) if numbers else None,
+        "median": median(numbers) if numbers else None,
+        "consensus": len(voted_values) == 1,
+    }
@@ -1,19 +1,77 @@
+"""
+Runs groups of services in a single process, as declared on `PROCESS_GROUPS`
+of the config. Each group is meant to run on its own process, e.g.:
+
+    python src/runner.py critical
+    python src/runner.py core
+
+Without groups, every service is run.
+"""
+import eventlet
+
+eventlet.monkey_patch()  # noqa (code before rest of imports)
+
+import logging.config
+import sys
+
 import yaml
+from nameko.cli.main import setup_yaml_parser
 from nameko.runners import ServiceRunner
+
 from poker.service import PokerService
 from story.service import StoryService
+from participant.service import ParticipantService
+from event.service import EventService
+from vote.service import VoteService
+from action.service import ActionService
+from polling.service import PollingService
+from invite.service import InviteService
 
+SERVICES = {
+    service.name: service for service in [
+        PokerService,
+        StoryService,
+        ParticipantService,
+        EventService,
+        VoteService,
+        ActionService,
+        PollingService,
+        InviteService,
+    ]
+}
 
-def main():
+
+def get_services(config: dict, groups: list) -> list:
+    if not groups:
+        return list(SERVICES.values())
+
+    process_groups = config.get('PROCESS_GROUPS') or {}
+    services = []
+    for group in groups:
+        if group not in process_groups:
+            raise ValueError(f'Unknown process group "{group}"')
+        services.extend(SERVICES[name] for name in process_groups[group])
+    return services
+
+
+def main(groups: list):
+    setup_yaml_parser()
     with open("config.yaml") as stream:
         config = yaml.safe_load(stream)
-        print(config)
+
+    # same as `nameko run`
+    if 'LOGGING' in config:
+        logging.config.dictConfig(config['LOGGING'])
+    else:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     runner = ServiceRunner(config=config)
-    runner.add_service(PokerService)
-    runner.add_service(StoryService)
+    for service in get_services(config, groups):
+        runner.add_service(service)
+
     runner.start()
+    runner.wait()
 
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Uuid, ForeignKey, Integer, select, func, table
+from sqlalchemy import Column, String, Uuid, ForeignKey, Integer, Index, select, func, table
 from sqlalchemy.orm import relationship
 
 from base.models import Model
@@ -6,6 +6,9 @@ from base.models import Model
 
 class Story(Model):
     __tablename__ = "stories"
+    __table_args__ = (
+        Index("ix_stories_poker_id_order", "poker_id", "order"),
+    )
 
     name = Column(
         String(),
@@ -2,7 +2,10 @@ from datetime import datetime
 from typing import Optional, List
 from uuid import UUID
 
+from sqlalchemy.orm import selectinload
+
 from base.schemas import APIModel
+from story.models import Story
 from event.schemas import EventRead
 from polling.schemas import PollingRead
 
@@ -11,6 +14,7 @@ class StoryRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     name: str
     order: int
     poker_id: UUID
@@ -19,6 +23,13 @@ class StoryRead(APIModel):
     events: List[EventRead] = None
     pollings: List[PollingRead] = None
 
+    @classmethod
+    def loader_options(cls) -> list:
+        return [
+            selectinload(Story.events).options(*EventRead.loader_options()),
+            selectinload(Story.pollings).options(*PollingRead.loader_options()),
+        ]
+
 
 class StoryCreate(APIModel):
     name: str
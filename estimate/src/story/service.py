@@ -2,12 +2,11 @@ import typing
 from uuid import UUID
 
 from nameko.rpc import rpc, RpcProxy
-from nameko.events import event_handler
 
 from base.schemas import APIModel
 from base.service import EntityService
 from base.exceptions import NotFound
-from base.converters import from_uuid, from_str
+from base.converters import from_uuid, from_str, from_int
 from story.schemas import StoryRead, StoryCreate, StoryUpdate
 from story.models import Story
 
@@ -21,62 +20,38 @@ class StoryService(EntityService):
     dto_create = StoryCreate
     dto_update = StoryUpdate
     broadcast_changes = True
+    scope_columns = ('poker_id',)
 
     event_rpc = RpcProxy("event_service")
 
     def get_query_column_converters(self) -> typing.Dict[str, typing.Callable[[any], str]]:
         return {
-            'poker_id': from_uuid
+            'poker_id': from_uuid,
+            'order': from_int
         }
 
     def get_room_name(self, entity):
         story: Story = entity
         return str(story.poker_id)
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Story) \
             .filter(Story.poker_id == current_poker_id) \
             .order_by(Story.order)
 
-    @event_handler("polling_service", "polling_completed")
-    def handle_polling_completed(self, payload: dict):
-        story_id = payload["storyId"]
-        value = payload["value"]
-
-        story = self.retrieve(sid=None, entity_id=story_id)
-
-        self.update(sid=None, entity_id=story_id, payload={
-            "name": story["name"],
-            "description": story["description"],
-            "pokerId": story["pokerId"],
-            "order": story["order"],
-            "value": value
-        })
-
     @rpc
-    def reveal(self, sid, entity_id: str):
+    def reveal(self, sid, entity_id: str, context: dict = None):
         # TODO: remove this method
-        unrevealed_events = self.event_rpc.query(sid=None, filters=[{
-            "attr": "story_id",
-            "value": entity_id
-        }, {
-            "attr": "revealed",
-            "value": "false"
-        }])
-
-        for event in unrevealed_events['items']:
-            self.event_rpc.update(sid=sid, entity_id=event['id'], payload={
-                "content": event["content"],
-                "revealed": True
-            })
+        self.event_rpc.reveal_story(sid=sid, story_id=entity_id, context=context)
 
         entity_id = UUID(entity_id)
 
         entity = self.db.query(self.model) \
             .filter(self.model.id == entity_id) \
+            .options(*self.dto_read.loader_options()) \
             .first()
 
         if entity is None:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey
+from sqlalchemy import Column, String, Boolean, Uuid, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, backref
 
 from base.models import Model
@@ -6,6 +6,10 @@ from base.models import Model
 
 class Vote(Model):
     __tablename__ = "votes"
+    __table_args__ = (
+        UniqueConstraint("polling_id", "participant_id", name="uq_votes_polling_id_participant_id"),
+        Index("ix_votes_poker_id", "poker_id"),
+    )
 
     value = Column(
         String(),
@@ -1,8 +1,11 @@
 from datetime import datetime
 from uuid import UUID
 
+from sqlalchemy.orm import joinedload
+
 from base.schemas import APIModel
 from participant.schemas import ParticipantRead
+from vote.models import Vote
 
 
 class VotePlace(APIModel):
@@ -14,12 +17,17 @@ class VoteRead(APIModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    version: int
     value: str
     participant_id: UUID
     polling_id: UUID
     poker_id: UUID
     participant: ParticipantRead = None
 
+    @classmethod
+    def loader_options(cls) -> list:
+        return [joinedload(Vote.participant)]
+
 
 class VoteCreate(APIModel):
     value: str
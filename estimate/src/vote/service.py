@@ -1,18 +1,25 @@
+import datetime
 import typing
 import logging
+import uuid
 from uuid import UUID
 
 from nameko.rpc import rpc, RpcProxy
+from sqlalchemy import select, literal, Uuid, DateTime, String
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
 
-from base.converters import from_uuid
+from base.converters import from_uuid, from_datetime
+from base.schemas import RequestContext
 from base.service import EntityService
 from base.exceptions import NotFound, InvalidInput
+from base.logs import log_dump
 from vote.schemas import VotePlace, VoteRead, VoteCreate, VoteUpdate
 from vote.models import Vote
 from polling.models import Polling
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 class VoteService(EntityService):
@@ -24,15 +31,16 @@ class VoteService(EntityService):
     dto_create = VoteCreate
     dto_update = VoteUpdate
     broadcast_changes = True
+    scope_columns = ('poker_id',)
+    large_table = True
 
-    event_rpc = RpcProxy("event_service")
-    polling_rpc = RpcProxy("polling_service")
     participant_rpc = RpcProxy("participant_service")
 
     def get_query_column_converters(self) -> typing.Dict[str, typing.Callable[[any], str]]:
         return {
             'participant_id': from_uuid,
-            'polling_id': from_uuid
+            'polling_id': from_uuid,
+            'created_at': from_datetime
         }
 
     def get_room_name(self, entity) -> str:
@@ -40,51 +48,87 @@ class VoteService(EntityService):
         polling: Polling = vote.polling
         return f'story:{polling.story_id}'
 
-    def get_base_query(self, sid):
+    def get_base_query(self, sid, context: dict = None):
         if sid is None:
-            return super().get_base_query(sid)
-        current_poker_id: UUID = self.gateway_rpc.get_current_poker_id(sid)
+            return super().get_base_query(sid, context)
+        current_poker_id: UUID = self.get_current_poker_id(sid, context)
         return self.db.query(Vote).filter(Vote.poker_id == current_poker_id)
 
+    def _get_current_participant_id(self, sid, context: dict = None) -> UUID:
+        if context is not None:
+            return RequestContext(**context).participant_id
+        participant = self.participant_rpc.current(sid=sid)
+        return UUID(participant['id'])
+
+    def _insert(self):
+        """
+        Returns the `insert` construct of the bound dialect, which supports
+        `ON CONFLICT` clauses
+        """
+        if self.db.get_bind().dialect.name == 'sqlite':
+            return sqlite_insert
+        return postgresql_insert
+
     @rpc
-    def place(self, sid, payload: dict):
+    def place(self, sid, payload: dict, context: dict = None):
         dto = VotePlace(**payload)
 
-        participant = self.participant_rpc.current(sid=sid)
-        participant_id = UUID(participant['id'])
+        participant_id = self._get_current_participant_id(sid, context)
+
+        # inserts or updates the vote in one statement; the polling is selected
+        # in the same statement, so no vote is placed on a completed polling
+        now = datetime.datetime.utcnow()
+        polling_values = select(
+            literal(uuid.uuid4(), Uuid()),
+            literal(now, DateTime()),
+            literal(now, DateTime()),
+            literal(dto.value, String()),
+            literal(participant_id, Uuid()),
+            Polling.id,
+            Polling.poker_id,
+        ).where(Polling.id == dto.polling_id, Polling.completed.is_(False))
+
+        insert = self._insert()(Vote).from_select(
+            ['id', 'created_at', 'updated_at', 'value', 'participant_id', 'polling_id', 'poker_id'],
+            polling_values
+        )
+        upsert = insert.on_conflict_do_update(
+            index_elements=[Vote.polling_id, Vote.participant_id],
+            set_={
+                'value': insert.excluded.value,
+                'updated_at': insert.excluded.updated_at,
+                'version': Vote.version + 1,
+            }
+        ).returning(Vote.id)
+
+        vote_id = self.db.execute(upsert).scalar()
+
+        if vote_id is None:
+            self.db.rollback()
+            polling = self.db.query(Polling).filter(Polling.id == dto.polling_id).first()
+            if polling is None:
+                raise NotFound()
+            raise InvalidInput()
 
-        polling = self.polling_rpc.retrieve(sid=None, entity_id=str(dto.polling_id))
+        self.db.commit()
 
-        if polling["completed"]:
-            raise InvalidInput()
+        entity = self.db.query(Vote) \
+            .options(joinedload(Vote.participant), joinedload(Vote.polling)) \
+            .filter(Vote.id == vote_id) \
+            .one()
 
-        entity = self.db.query(self.model) \
-            .filter(self.model.polling_id == dto.polling_id) \
-            .filter(self.model.participant_id == participant_id) \
-            .first()
-
-        result: dict
-
-        if entity is None:
-            result = self.create(sid, {
-                "value": dto.value,
-                "pollingId": str(dto.polling_id)
-            })
-        else:  # vote already exists
-            result = self.update(sid, str(entity.id), {
-                "value": dto.value
-            })
-
-        room_name = f"story:{polling['storyId']}"
-        self.gateway_rpc.broadcast(room_name, "vote_placed", result)
+        logger.debug('placed "%s" entity! %s', self.entity_name, entity.id)
+
+        result = self.dto_read.to_json(entity)
+
+        self.outbox.broadcast(self.get_room_name(entity), "vote_placed", result)
         self.dispatch("vote_placed", result)
 
         return result
 
     @rpc
-    def create(self, sid, payload: dict) -> dict:
-        participant = self.participant_rpc.current(sid=sid)
-        participant_id = UUID(participant['id'])
+    def create(self, sid, payload: dict, context: dict = None) -> dict:
+        participant_id = self._get_current_participant_id(sid, context)
 
         dto = VoteCreate(**payload)
 
@@ -97,10 +141,10 @@ class VoteService(EntityService):
         self.db.add(entity)
         self.db.commit()
 
-        logger.debug(f'created "{self.entity_name}" entity! {entity.id}; {entity.to_dict()}')
-
         result = self.dto_read.to_json(entity)
 
+        log_dump('created "%s" entity! %s', self.entity_name, entity.id, entity=entity)
+
         self.handle_propagate(sid, self.event_created, entity, result)
 
         return result
@@ -1,5 +1,7 @@
+from contextlib import contextmanager
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from base.models import DeclarativeBase
 
 # MODELS:
@@ -12,6 +14,24 @@ from vote.models import Vote
 from invite.models import Invite
 
 
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', default=False, help='also runs the benchmarks')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: compares timings, only run with --benchmark')
+
+
+def pytest_collection_modifyitems(config, items):
+    """Benchmarks depend on the load of the machine, so they are opt-in"""
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason='benchmarks only run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(scope='session')
 def db_url():
     """Overriding db_url fixture from `nameko_sqlalchemy`
@@ -44,3 +64,33 @@ def db_connection(db_url, model_base, db_engine_options):
     # fixes missing "bind=" on nameko-sqlalchemy
     model_base.metadata.drop_all(bind=engine)
     engine.dispose()
+
+
+@pytest.fixture
+def sql_statements(db_connection):
+    """Records every SQL statement (and its parameters) executed while the test runs"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db_connection.engine, 'before_cursor_execute', before_cursor_execute)
+
+    yield statements
+
+    event.remove(db_connection.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def assert_query_count(sql_statements):
+    """Asserts the exact number of SQL statements executed within a block, catching lazy loads on serialization"""
+
+    @contextmanager
+    def assert_count(expected: int):
+        sql_statements.clear()
+        yield sql_statements
+        executed = [statement for statement, _ in sql_statements]
+        assert len(executed) == expected, f'expected {expected} statements, executed {len(executed)}:\n' + \
+            '\n'.join(executed)
+
+    return assert_count
@@ -0,0 +1,159 @@
+import json
+import time
+from unittest.mock import Mock
+
+import eventlet
+from kombu import Connection
+from nameko.rpc import rpc
+
+from base.containers import ServiceContainer, PriorityRpcConsumer, RegularRpcConsumer
+
+SLOW_CALL = 0.1
+
+AMQP_URI = 'memory://'
+
+
+class FakeParticipantService:
+    name = "participant_service"
+
+    calls = []
+
+    @rpc
+    def join(self):
+        eventlet.sleep(SLOW_CALL)
+        self.calls.append(('join', time.perf_counter()))
+
+    @rpc
+    def current(self):
+        self.calls.append(('current', time.perf_counter()))
+
+
+def _create_config(reserved_workers: int) -> dict:
+    return {
+        'AMQP_URI': AMQP_URI,
+        # the in-memory broker polls its queues, once a second by default
+        'TRANSPORT_OPTIONS': {'polling_interval': 0.01},
+        'SERVICE_WORKERS': {
+            'participant_service': {
+                'max_workers': 4,
+                'reserved_workers': reserved_workers,
+                'priority_methods': ['current'],
+            },
+        },
+    }
+
+
+def _create_container(reserved_workers: int) -> ServiceContainer:
+    return ServiceContainer(FakeParticipantService, _create_config(reserved_workers))
+
+
+def _spawn(container: ServiceContainer, method_name: str):
+    return container.spawn_worker(Mock(method_name=method_name), (), {})
+
+
+def _wait_for_workers(container: ServiceContainer, timeout: float = 5):
+    with eventlet.Timeout(timeout):
+        while container._worker_threads or container._pending_regular:
+            eventlet.sleep(0.01)
+
+
+def _call(channel, method_name: str):
+    # published like an rpc proxy does; nobody waits for the reply
+    message = channel.prepare_message(
+        json.dumps({'args': [], 'kwargs': {}}),
+        content_type='application/json',
+        properties={'content_type': 'application/json', 'reply_to': 'unused', 'correlation_id': method_name},
+    )
+    channel.basic_publish(message, exchange='nameko-rpc', routing_key=f'participant_service.{method_name}')
+
+
+def _measure_current_during_burst(container, burst: int) -> tuple[float, list[str]]:
+    FakeParticipantService.calls = []
+    container.start()
+
+    with Connection(AMQP_URI) as connection:
+        channel = connection.channel()
+        for _ in range(burst):
+            _call(channel, 'join')
+        started = time.perf_counter()
+        _call(channel, 'current')
+
+        with eventlet.Timeout(10):
+            while len(FakeParticipantService.calls) < burst + 1:
+                eventlet.sleep(0.01)
+
+    # every call has run already, no need to wait for the consumers to drain
+    container.kill()
+    calls = FakeParticipantService.calls
+    latency = next(called for method_name, called in calls if method_name == 'current') - started
+    return latency, [method_name for method_name, _ in calls]
+
+
+def test_when_service_is_configured_should_size_worker_pool():
+    # act
+    container = _create_container(reserved_workers=1)
+
+    # assert
+    assert container.max_workers == 4
+    assert container._worker_pool.size == 4
+    assert container.regular_workers == 3
+
+
+def test_when_service_is_not_configured_should_use_global_max_workers():
+    # act
+    container = ServiceContainer(FakeParticipantService, {'AMQP_URI': AMQP_URI, 'max_workers': 7})
+
+    # assert
+    assert container.max_workers == 7
+    assert container.reserved_workers == 0
+
+
+def test_when_regular_calls_exceed_workers_should_queue_and_run_them_all():
+    # arrange
+    container = _create_container(reserved_workers=1)
+
+    # act
+    for _ in range(10):
+        _spawn(container, 'join')
+    queued = len(container._pending_regular)
+    _wait_for_workers(container)
+
+    # assert
+    assert queued == 7
+    assert len(container._pending_regular) == 0
+    assert container._running_regular == 0
+
+
+def test_when_service_has_priority_methods_should_consume_them_from_their_own_queue():
+    # arrange
+    container = _create_container(reserved_workers=1)
+
+    # act
+    rpc_consumers = {entrypoint.method_name: entrypoint.rpc_consumer for entrypoint in container.entrypoints}
+
+    # assert
+    assert isinstance(rpc_consumers['join'], RegularRpcConsumer)
+    assert isinstance(rpc_consumers['current'], PriorityRpcConsumer)
+    assert {type(extension) for extension in container.subextensions} >= {RegularRpcConsumer, PriorityRpcConsumer}
+    assert not any(type(extension).__name__ == 'RpcConsumer' for extension in container.subextensions)
+
+
+def test_load_burst_of_regular_calls_should_not_starve_priority_calls(container_factory):
+    # arrange
+    burst = 20
+    starved = container_factory(FakeParticipantService, _create_config(reserved_workers=1))
+    reserved = container_factory(FakeParticipantService, {
+        **_create_config(reserved_workers=1),
+        'SERVICE_CONTAINER_CLS': 'base.containers.ServiceContainer',
+    })
+
+    # act
+    starved_latency, starved_calls = _measure_current_during_burst(starved, burst)
+    reserved_latency, reserved_calls = _measure_current_during_burst(reserved, burst)
+
+    # assert
+    assert starved_latency >= SLOW_CALL
+    assert reserved_latency < SLOW_CALL
+    assert starved_calls[-1] == 'current'
+    assert reserved_calls.count('current') == 1
+    assert reserved_calls.count('join') == burst
@@ -0,0 +1,221 @@
+import uuid
+from unittest.mock import Mock
+
+from nameko.testing.services import worker_factory
+from sqlalchemy import text, create_engine
+
+from base.database import SharedDatabaseSession, RoutingDatabaseSession, engines, get_pool_stats
+from base.models import DeclarativeBase
+from poker.models import Poker
+from story.models import Story
+from participant.models import Participant
+from polling.models import Polling
+from vote.service import VoteService
+
+
+def _create_provider(service_name: str, config: dict) -> SharedDatabaseSession:
+    provider = SharedDatabaseSession(DeclarativeBase)
+    provider.container = Mock(service_name=service_name, config=config)
+    provider.setup()
+    return provider
+
+
+def test_when_services_use_same_database_should_share_engine(tmp_path):
+    # arrange
+    db_uri = f'sqlite:///{tmp_path}/estimate.db'
+    config = {
+        'DB_URIS': {
+            'poker_service:Base': db_uri,
+            'story_service:Base': db_uri,
+            'vote_service:Base': f'sqlite:///{tmp_path}/another.db',
+        },
+        'DB_ENGINE_OPTIONS': {'pool_size': 3, 'max_overflow': 1, 'pool_pre_ping': True},
+    }
+
+    # act
+    poker = _create_provider('poker_service', config)
+    story = _create_provider('story_service', config)
+    vote = _create_provider('vote_service', config)
+
+    # assert
+    assert poker.engine is story.engine
+    assert vote.engine is not poker.engine
+    assert poker.engine.pool.size() == 3
+
+    poker.stop()
+    story.stop()
+    vote.stop()
+
+
+def test_when_last_service_stops_should_dispose_shared_engine(tmp_path):
+    # arrange
+    config = {'DB_URIS': {
+        'poker_service:Base': f'sqlite:///{tmp_path}/estimate.db',
+        'story_service:Base': f'sqlite:///{tmp_path}/estimate.db',
+    }}
+    poker = _create_provider('poker_service', config)
+    story = _create_provider('story_service', config)
+    engine = poker.engine
+
+    # act
+    poker.stop()
+    still_shared = get_pool_stats(engine) is not None
+    story.stop()
+
+    # assert
+    assert still_shared
+    assert get_pool_stats(engine) is None
+    assert engine not in [shared.engine for shared in engines.engines.values()]
+
+
+def test_when_checking_out_connections_should_count_pool_activity(tmp_path):
+    # arrange
+    config = {'DB_URIS': {'poker_service:Base': f'sqlite:///{tmp_path}/estimate.db'}}
+    provider = _create_provider('poker_service', config)
+
+    # act
+    with provider.engine.connect() as first:
+        with provider.engine.connect() as second:
+            first.execute(text('SELECT 1'))
+            second.execute(text('SELECT 1'))
+            during = get_pool_stats(provider.engine)
+    after = get_pool_stats(provider.engine)
+
+    # assert
+    assert during['checkedOut'] == 2
+    assert after['checkedOut'] == 0
+    assert after['checkouts'] == 2
+    assert after['checkins'] == 2
+    assert after['maxCheckedOut'] == 2
+    assert after['connects'] == 2
+    assert after['pool'] == 'QueuePool'
+
+    provider.stop()
+
+
+class FakeService:
+    read_only_methods = ('query', 'retrieve')
+
+
+def _create_routing_provider(tmp_path, with_replica: bool = True, service_cls=FakeService,
+                             service_name: str = 'poker_service') -> RoutingDatabaseSession:
+    primary_uri = f'sqlite:///{tmp_path}/primary.db'
+    replica_uri = f'sqlite:///{tmp_path}/replica.db'
+
+    for db_uri, name in [(primary_uri, 'primary'), (replica_uri, 'replica')]:
+        engine = create_engine(db_uri)
+        DeclarativeBase.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(Poker.__table__.insert().values(id=uuid.uuid4(), creator=name))
+        engine.dispose()
+
+    config = {
+        'DB_URIS': {f'{service_name}:Base': primary_uri},
+        'DB_REPLICA_WINDOW': 60,
+    }
+    if with_replica:
+        config['DB_REPLICA_URIS'] = {f'{service_name}:Base': replica_uri}
+
+    provider = RoutingDatabaseSession(DeclarativeBase)
+    provider.container = Mock(service_name=service_name, config=config, service_cls=service_cls)
+    provider.setup()
+    return provider
+
+
+def _create_worker_ctx(method_name: str, sid: str) -> Mock:
+    worker_ctx = Mock(args=(sid,), kwargs={})
+    worker_ctx.entrypoint.method_name = method_name
+    return worker_ctx
+
+
+def _read_creator(provider, method_name: str, sid: str) -> str:
+    worker_ctx = _create_worker_ctx(method_name, sid)
+    session = provider.get_dependency(worker_ctx)
+    creator = session.query(Poker.creator).order_by(Poker.created_at).first()[0]
+    provider.worker_teardown(worker_ctx)
+    return creator
+
+
+def test_when_calling_read_only_method_should_read_from_replica(tmp_path):
+    # arrange
+    provider = _create_routing_provider(tmp_path)
+
+    # act
+    read = _read_creator(provider, 'query', '1aaa')
+    written = _read_creator(provider, 'create', '1aaa')
+
+    # assert
+    assert read == 'replica'
+    assert written == 'primary'
+
+    provider.stop()
+
+
+def test_when_sid_wrote_recently_should_read_own_writes_from_primary(tmp_path):
+    # arrange
+    provider = _create_routing_provider(tmp_path)
+    worker_ctx = _create_worker_ctx('create', '1aaa')
+    session = provider.get_dependency(worker_ctx)
+    session.add(Poker(creator='written'))
+    session.commit()
+    provider.worker_teardown(worker_ctx)
+
+    # act
+    writer = _read_creator(provider, 'query', '1aaa')
+    another = _read_creator(provider, 'query', '2bbb')
+
+    # assert
+    assert writer == 'primary'
+    assert another == 'replica'
+
+    provider.stop()
+
+
+def test_when_sid_placed_vote_should_query_own_votes_from_primary(tmp_path):
+    # arrange
+    fake_sid = str(uuid.uuid4())
+    fake_poker_id = uuid.uuid4()
+    fake_participant_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+    fake_context = {'participantId': str(fake_participant_id), 'pokerId': str(fake_poker_id)}
+
+    provider = _create_routing_provider(tmp_path, service_cls=VoteService, service_name='vote_service')
+    worker_ctx = _create_worker_ctx('create', None)
+    session = provider.get_dependency(worker_ctx)
+    session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    session.add(Participant(id=fake_participant_id, poker_id=fake_poker_id, name="Arthur", sid=fake_sid))
+    session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    session.commit()
+    provider.worker_teardown(worker_ctx)
+
+    worker_ctx = _create_worker_ctx('place', fake_sid)
+    service = worker_factory(VoteService, db=provider.get_dependency(worker_ctx))
+    service.place(fake_sid, {'value': '1', 'pollingId': str(fake_polling_id)}, context=fake_context)
+    provider.worker_teardown(worker_ctx)
+
+    # act
+    worker_ctx = _create_worker_ctx('query', fake_sid)
+    service = worker_factory(VoteService, db=provider.get_dependency(worker_ctx))
+    result = service.query(fake_sid, [], context=fake_context)
+    provider.worker_teardown(worker_ctx)
+
+    # assert
+    # the vote was only placed on the primary database
+    assert [vote['value'] for vote in result['items']] == ['1']
+
+    provider.stop()
+
+
+def test_when_replica_is_not_configured_should_read_from_primary(tmp_path):
+    # arrange
+    provider = _create_routing_provider(tmp_path, with_replica=False)
+
+    # act
+    read = _read_creator(provider, 'query', '1aaa')
+
+    # assert
+    assert read == 'primary'
+
+    provider.stop()
@@ -0,0 +1,64 @@
+import logging
+from unittest.mock import Mock
+
+from base.logs import Sample, log_dump, dump_logger
+
+
+def _create_record() -> logging.LogRecord:
+    return logging.LogRecord('dumps', logging.DEBUG, __file__, 1, 'message', (), None)
+
+
+def test_sample_filter_should_let_through_only_the_configured_share():
+    # arrange
+    none = Sample(rate=0)
+    every = Sample(rate=1)
+
+    # act
+    result = [(none.filter(_create_record()), every.filter(_create_record())) for _ in range(100)]
+
+    # assert
+    assert result == [(False, True)] * 100
+
+
+def test_when_dumps_are_disabled_should_not_format_entity():
+    # arrange
+    entity = Mock()
+    dump_logger.setLevel(logging.INFO)
+
+    # act
+    log_dump('created "%s" entity! %s', 'poker', '1', entity=entity)
+
+    # assert
+    entity.to_dict.assert_not_called()
+
+    dump_logger.setLevel(logging.NOTSET)
+
+
+def test_when_dump_is_sampled_out_should_not_format_entity():
+    # arrange
+    entity = Mock()
+    sample = Sample(rate=0)
+    dump_logger.setLevel(logging.DEBUG)
+    dump_logger.addFilter(sample)
+
+    # act
+    log_dump('created "%s" entity! %s', 'poker', '1', entity=entity)
+
+    # assert
+    entity.to_dict.assert_not_called()
+
+    dump_logger.removeFilter(sample)
+    dump_logger.setLevel(logging.NOTSET)
+
+
+def test_when_dump_is_logged_should_format_entity(caplog):
+    # arrange
+    entity = Mock()
+    entity.to_dict.return_value = {'creator': 'someone'}
+
+    # act
+    with caplog.at_level(logging.DEBUG, logger='dumps'):
+        log_dump('created "%s" entity! %s', 'poker', '1', entity=entity)
+
+    # assert
+    assert caplog.messages == ["created \"poker\" entity! 1; {'creator': 'someone'}"]
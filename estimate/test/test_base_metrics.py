@@ -0,0 +1,158 @@
+import logging
+from unittest.mock import Mock
+
+import pytest
+from nameko.rpc import RpcProxy
+from nameko.testing.services import worker_factory
+from sqlalchemy import create_engine, text
+
+from base.exceptions import InvalidInput
+from base.metrics import Metrics, ServiceMetrics
+from story.service import StoryService
+
+
+def _create_metrics(config: dict = None) -> Metrics:
+    event_rpc = RpcProxy('event_service')
+    event_rpc.attr_name = 'event_rpc'
+
+    metrics = Metrics()
+    metrics.container = Mock(service_name='story_service', config=config or {}, dependencies=[event_rpc])
+    metrics.setup()
+    return metrics
+
+
+def _create_worker_ctx(metrics: Metrics, method_name: str, *args, **kwargs):
+    return Mock(
+        service_name='story_service',
+        container=metrics.container,
+        entrypoint=Mock(method_name=method_name),
+        args=args,
+        kwargs=kwargs,
+    )
+
+
+def test_when_worker_finishes_should_record_statements_rpcs_and_payloads():
+    # arrange
+    engine = create_engine('sqlite:///:memory:')
+    metrics = _create_metrics({'METRICS_PAYLOAD_SIZES': True})
+    worker_ctx = _create_worker_ctx(metrics, 'reveal', sid='1aaa', entity_id='1')
+
+    # act
+    metrics.worker_setup(worker_ctx)
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+        connection.execute(text('SELECT 2'))
+    worker_ctx.service.event_rpc.reveal_story(sid='1aaa', story_id='1')
+    metrics.worker_result(worker_ctx, result={'id': '1'})
+
+    # assert
+    result = metrics.get_dependency(worker_ctx).to_dict()['reveal']
+    assert result['calls'] == 1
+    assert result['errors'] == 0
+    assert result['statements'] == 2
+    assert result['rpcs'] == 1
+    assert 0 < result['dbTime'] <= result['wallTime']
+    assert result['requestBytes'] == len('{"args": [], "kwargs": {"sid": "1aaa", "entity_id": "1"}}')
+    assert result['responseBytes'] == len('{"id": "1"}')
+
+    engine.dispose()
+
+
+def test_when_payload_sizes_are_disabled_should_not_serialize_payloads(monkeypatch):
+    # arrange
+    get_payload_size = Mock()
+    monkeypatch.setattr('base.metrics.get_payload_size', get_payload_size)
+    metrics = _create_metrics()
+    worker_ctx = _create_worker_ctx(metrics, 'reveal', sid='1aaa', entity_id='1')
+
+    # act
+    metrics.worker_setup(worker_ctx)
+    metrics.worker_result(worker_ctx, result={'id': '1'})
+
+    # assert
+    get_payload_size.assert_not_called()
+    result = metrics.get_dependency(worker_ctx).to_dict()['reveal']
+    assert result['calls'] == 1
+    assert result['requestBytes'] == 0
+    assert result['responseBytes'] == 0
+
+
+def test_when_statements_run_outside_worker_should_not_record_them():
+    # arrange
+    engine = create_engine('sqlite:///:memory:')
+    metrics = _create_metrics()
+    worker_ctx = _create_worker_ctx(metrics, 'query')
+
+    # act
+    metrics.worker_setup(worker_ctx)
+    metrics.worker_result(worker_ctx, result=None)
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+    # assert
+    assert metrics.get_dependency(worker_ctx).to_dict()['query']['statements'] == 0
+
+    engine.dispose()
+
+
+def test_when_worker_fails_should_count_error():
+    # arrange
+    metrics = _create_metrics()
+    worker_ctx = _create_worker_ctx(metrics, 'reveal')
+
+    # act
+    metrics.worker_setup(worker_ctx)
+    metrics.worker_result(worker_ctx, exc_info=(ValueError, ValueError(), None))
+
+    # assert
+    result = metrics.get_dependency(worker_ctx).to_dict()['reveal']
+    assert result['calls'] == 1
+    assert result['errors'] == 1
+
+
+def test_when_call_is_slow_should_log_its_statements(caplog):
+    # arrange
+    engine = create_engine('sqlite:///:memory:')
+    metrics = _create_metrics({'METRICS_SLOW_CALL': 0.000001})
+    worker_ctx = _create_worker_ctx(metrics, 'query')
+
+    # act
+    with caplog.at_level(logging.WARNING, logger='base.metrics'):
+        metrics.worker_setup(worker_ctx)
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 42'))
+        metrics.worker_result(worker_ctx, result=None)
+
+    # assert
+    assert 'slow call story_service.query' in caplog.text
+    assert 'SELECT 42' in caplog.text
+
+    engine.dispose()
+
+
+def test_prometheus_text_should_expose_counters_and_histogram():
+    # arrange
+    metrics = _create_metrics()
+    for _ in range(3):
+        worker_ctx = _create_worker_ctx(metrics, 'query')
+        metrics.worker_setup(worker_ctx)
+        metrics.worker_result(worker_ctx, result=[])
+
+    # act
+    result = metrics.get_dependency(None).to_prometheus()
+
+    # assert
+    assert '# TYPE estimate_worker_calls_total counter' in result
+    assert 'estimate_worker_calls_total{service="story_service",method="query"} 3' in result
+    assert 'estimate_worker_duration_seconds_bucket{service="story_service",method="query",le="+Inf"} 3' in result
+    assert 'estimate_worker_duration_seconds_count{service="story_service",method="query"} 3' in result
+
+
+def test_when_metrics_format_is_unknown_should_raise_invalid_input():
+    # arrange
+    service = worker_factory(StoryService, instrumentation=ServiceMetrics('story_service'))
+
+    # act
+    # assert
+    with pytest.raises(InvalidInput):
+        service.metrics(format='xml')
@@ -0,0 +1,57 @@
+from unittest.mock import Mock
+
+from base.outbox import Outbox
+
+
+def _create_outbox() -> Outbox:
+    outbox = Outbox()
+    outbox.setup()
+    return outbox
+
+
+def test_when_worker_succeeds_should_flush_all_messages_in_a_single_event():
+    # arrange
+    outbox = _create_outbox()
+    worker_ctx = Mock()
+    buffer = outbox.get_dependency(worker_ctx)
+
+    buffer.broadcast('story:1', 'polling_completed', {'id': '1'})
+    buffer.unicast('1aaa', 'vote_placed', {'id': '2'})
+
+    # act
+    outbox.worker_result(worker_ctx, result={'id': '1'})
+
+    # assert
+    worker_ctx.service.dispatch.assert_called_once_with('gateway_push', [
+        {'type': 'broadcast', 'target': 'story:1', 'event': 'polling_completed', 'data': {'id': '1'}},
+        {'type': 'unicast', 'target': '1aaa', 'event': 'vote_placed', 'data': {'id': '2'}},
+    ])
+    worker_ctx.service.gateway_rpc.assert_not_called()
+
+
+def test_when_worker_fails_should_discard_messages():
+    # arrange
+    outbox = _create_outbox()
+    worker_ctx = Mock()
+    buffer = outbox.get_dependency(worker_ctx)
+
+    buffer.broadcast('story:1', 'polling_completed', {'id': '1'})
+
+    # act
+    outbox.worker_result(worker_ctx, exc_info=(ValueError, ValueError(), None))
+
+    # assert
+    worker_ctx.service.dispatch.assert_not_called()
+
+
+def test_when_worker_sends_nothing_should_not_call_gateway():
+    # arrange
+    outbox = _create_outbox()
+    worker_ctx = Mock()
+    outbox.get_dependency(worker_ctx)
+
+    # act
+    outbox.worker_result(worker_ctx, result=None)
+
+    # assert
+    worker_ctx.service.dispatch.assert_not_called()
@@ -0,0 +1,90 @@
+import json
+import timeit
+import uuid
+
+import pytest
+
+from poker.models import Poker
+from poker.schemas import PokerRead
+from story.models import Story
+from participant.models import Participant
+
+
+def _legacy_dump(model: PokerRead) -> dict:
+    # previous implementation: dumps to a json string and parses it back
+    result = model.model_dump_json(by_alias=True)
+    return json.loads(result)
+
+
+def _create_poker(db_session, stories: int, participants: int) -> Poker:
+    fake_poker_id = uuid.uuid4()
+
+    poker = Poker(id=fake_poker_id, creator='user@test.com')
+    db_session.add(poker)
+    db_session.commit()
+
+    for i in range(stories):
+        # optional fields are left empty on some stories
+        description = "As a user..." if i % 2 else None
+        value = str(i) if i % 3 else None
+        db_session.add(Story(name=f"Story {i}", description=description, value=value, poker_id=fake_poker_id, order=i))
+    for i in range(participants):
+        db_session.add(Participant(name=f"Participant {i}", sid=f"sid{i}", poker_id=fake_poker_id))
+    db_session.commit()
+
+    # loads relationships before measuring, so only serialization is compared
+    assert len(poker.stories) == stories
+    assert len(poker.participants) == participants
+
+    return poker
+
+
+def test_when_serializing_poker_should_return_same_output_as_json_round_trip(db_session):
+    # arrange
+    poker = _create_poker(db_session, stories=3, participants=3)
+
+    # act
+    result = PokerRead.to_json(poker)
+
+    # assert
+    assert result == _legacy_dump(PokerRead.model_validate(poker))
+    assert type(result['id']) is str
+    assert type(result['createdAt']) is str
+    assert type(result['stories'][0]['pokerId']) is str
+
+
+def test_when_serializing_larger_poker_should_return_same_output_as_json_round_trip(db_session):
+    # arrange
+    poker = _create_poker(db_session, stories=30, participants=20)
+    model = PokerRead.model_validate(poker)
+
+    # act
+    result = model.model_dump(mode='json', by_alias=True)
+
+    # assert
+    expected = _legacy_dump(model)
+    assert result == expected
+    assert any(story['description'] is None for story in result['stories'])
+
+
+@pytest.mark.benchmark
+def test_benchmark_single_pass_serialization_should_be_faster_than_json_round_trip(db_session):
+    # arrange
+    poker = _create_poker(db_session, stories=30, participants=20)
+    model = PokerRead.model_validate(poker)  # validation is shared by both paths
+    rounds = 200
+
+    # act
+    # both paths are measured in turns, so a busy machine slows them alike
+    legacy_runs, single_pass_runs = [], []
+    for _ in range(7):
+        legacy_runs.append(timeit.timeit(lambda: _legacy_dump(model), number=rounds))
+        single_pass_runs.append(timeit.timeit(lambda: model.model_dump(mode='json', by_alias=True), number=rounds))
+    legacy = min(legacy_runs)
+    single_pass = min(single_pass_runs)
+
+    # reported with `-s`
+    print(f'\nPokerRead dump x{rounds}: json round trip {legacy * 1000:.1f}ms; single pass {single_pass * 1000:.1f}ms')
+
+    # assert
+    assert single_pass < legacy
@@ -4,7 +4,7 @@ import pytest
 from nameko.testing.services import worker_factory
 from pydantic import ValidationError
 
-from base.exceptions import NotFound, InvalidFilter
+from base.exceptions import NotFound, InvalidFilter, InvalidCursor
 from poker.models import Poker
 from story.models import Story
 from event.models import Event
@@ -52,7 +52,7 @@ def test_when_querying_revealed_events_from_story_should_return_only_revealed_fr
 
     service = worker_factory(EventService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id1
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -77,7 +77,7 @@ def test_when_querying_revealed_events_from_story_should_return_only_revealed_fr
     assert type(result['metadata']['filters'][0]['value']) is str
     assert result['metadata']['filters'][0]['attr'] == 'revealed'
     assert result['metadata']['filters'][0]['value'] == 'false'
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -106,7 +106,7 @@ def test_when_creating_event_should_return_as_dict(db_session, monkeypatch):
         return str(fake_participant_id)
 
     service = worker_factory(EventService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     monkeypatch.setattr(service, "_get_current_creator", fake_get_creator)
@@ -126,7 +126,7 @@ def test_when_creating_event_should_return_as_dict(db_session, monkeypatch):
     assert result['content'] == "5"
     assert result['revealed'] is False
     assert result['storyId'] == str(fake_story_id1)
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -154,7 +154,7 @@ def test_when_creating_event_with_invalid_type_should_cause_error(db_session, mo
         return str(fake_participant_id)
 
     service = worker_factory(EventService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     monkeypatch.setattr(service, "_get_current_creator", fake_get_creator)
@@ -195,7 +195,7 @@ def test_when_creating_event_with_valid_participant_should_return_dict(db_sessio
 
     service = worker_factory(EventService, db=db_session)
     service.participant_rpc.current.side_effect = fake_current_participant
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -215,7 +215,7 @@ def test_when_creating_event_with_valid_participant_should_return_dict(db_sessio
     assert result['revealed'] is False
     assert result['storyId'] == str(fake_story_id1)
     assert result['creator'] == str(fake_participant_id)
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -244,7 +244,7 @@ def test_when_creating_event_with_non_existing_participant_should_cause_error(db
 
     service = worker_factory(EventService, db=db_session)
     service.participant_rpc.current.side_effect = fake_current_participant
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -278,7 +278,7 @@ def test_when_creating_system_event_should_return_dict_with_system_creator(db_se
 
     service = worker_factory(EventService, db=db_session)
     service.participant_rpc.query.side_effect = fake_query_participants
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -298,5 +298,130 @@ def test_when_creating_system_event_should_return_dict_with_system_creator(db_se
     assert result['revealed'] is False
     assert result['storyId'] == str(fake_story_id1)
     assert result['creator'] == "system"
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
+
+
+def test_when_creating_event_with_request_context_should_use_context_participant_as_creator(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id1 = uuid.uuid4()
+    fake_story_id1 = uuid.uuid4()
+    fake_participant_id = uuid.uuid4()
+
+    fake_payload = {
+        "type": "comment",
+        "content": "looks big",
+        "revealed": "false",
+        "story_id": str(fake_story_id1)
+    }
+    fake_context = {
+        "participantId": str(fake_participant_id),
+        "pokerId": str(fake_poker_id1)
+    }
+
+    db_session.add(Poker(id=fake_poker_id1, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id1, poker_id=fake_poker_id1, name="Story 1"))
+    db_session.add(Participant(id=fake_participant_id, poker_id=fake_poker_id1, name="Arthur", sid=fake_sid))
+    db_session.commit()
+
+    service = worker_factory(EventService, db=db_session)
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    result = service.create(fake_sid, fake_payload, context=fake_context)
+
+    # assert
+    assert result['creator'] == str(fake_participant_id)
+    service.participant_rpc.current.assert_not_called()
+
+
+def test_when_querying_events_with_limit_should_page_through_all_events_by_cursor(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_event_ids = set()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    for i in range(7):
+        fake_event_id = uuid.uuid4()
+        fake_event_ids.add(str(fake_event_id))
+        db_session.add(Event(id=fake_event_id, story_id=fake_story_id, poker_id=fake_poker_id,
+                             type="comment", revealed=True, content=str(i), creator="user1"))
+        db_session.commit()
+
+    service = worker_factory(EventService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    pages = [service.query(fake_sid, [], limit=3)]
+    while pages[-1]['metadata']['nextCursor'] is not None:
+        pages.append(service.query(fake_sid, [], limit=3, cursor=pages[-1]['metadata']['nextCursor']))
+
+    # assert
+    assert [len(page['items']) for page in pages] == [3, 3, 1]
+    assert all(page['metadata']['limit'] == 3 for page in pages)
+    contents = [item['content'] for page in pages for item in page['items']]
+    assert contents == [str(i) for i in range(7)]
+    assert {item['id'] for page in pages for item in page['items']} == fake_event_ids
+    assert service.outbox.unicast.call_count == 3
+
+
+def test_when_querying_events_with_invalid_cursor_should_cause_error(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+
+    service = worker_factory(EventService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    # assert
+    with pytest.raises(InvalidCursor):
+        result = service.query(fake_sid, [], cursor='not-a-cursor')
+
+
+def test_when_revealing_story_events_should_update_in_bulk_and_broadcast_once(db_session, sql_statements):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_another_story_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id, order=0))
+    db_session.add(Story(id=fake_another_story_id, name="Story 2", poker_id=fake_poker_id, order=1))
+    db_session.commit()
+    for content in ["1", "2", "3", "5", "8"]:
+        db_session.add(Event(story_id=fake_story_id, poker_id=fake_poker_id, type="comment", revealed=False,
+                             content=content, creator="user1"))
+    db_session.add(Event(story_id=fake_another_story_id, poker_id=fake_poker_id, type="comment", revealed=False,
+                         content="13", creator="user1"))
+    db_session.commit()
+
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(fake_poker_id)}
+    service = worker_factory(EventService, db=db_session)
+    sql_statements.clear()
+
+    # act
+    result = service.reveal_story(fake_sid, str(fake_story_id), context=fake_context)
+
+    # assert
+    assert len(sql_statements) == 1
+    assert sql_statements[0][0].lstrip().startswith("UPDATE events")
+    assert sorted(item['content'] for item in result['items']) == ["1", "2", "3", "5", "8"]
+    assert all(item['revealed'] for item in result['items'])
+    assert db_session.query(Event).filter(Event.revealed == False).count() == 1
+    service.outbox.broadcast.assert_called_once_with(f'story:{fake_story_id}', 'events_revealed', result)
+    service.dispatch.assert_called_once_with('events_revealed', result)
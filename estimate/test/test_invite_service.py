@@ -20,7 +20,7 @@ def test_when_creating_invite_should_return_as_dict(db_session):
     }
     
     service = worker_factory(InviteService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -30,7 +30,7 @@ def test_when_creating_invite_should_return_as_dict(db_session):
     assert type(result) is dict
     assert 'id' in result
     assert type(result['id']) is str
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -46,7 +46,7 @@ def test_when_creating_invite_with_code_should_ignore_and_generate_fixed_size_st
     }
     
     service = worker_factory(InviteService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -60,7 +60,7 @@ def test_when_creating_invite_with_code_should_ignore_and_generate_fixed_size_st
     assert type(result['code']) is str
     assert not result['code'] == fake_code_to_be_ignored
     assert len(result['code']) == 48
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -76,7 +76,7 @@ def test_when_creating_invite_with_code_should_be_different_from_last_one(db_ses
     }
     
     service = worker_factory(InviteService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -169,3 +169,16 @@ def test_when_listing_invites_should_cause_error(db_session):
     # assert
     with pytest.raises(NotAllowed):
         result = service.query(fake_sid, fake_filters)
+
+
+def test_when_listing_invites_with_ordering_and_fields_should_cause_error(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_filters = []
+
+    service = worker_factory(InviteService, db=db_session)
+
+    # act
+    # assert
+    with pytest.raises(NotAllowed):
+        result = service.query(fake_sid, fake_filters, order_by=["-expiresAt"], fields=["code"], context=None)
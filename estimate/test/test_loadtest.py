@@ -0,0 +1,161 @@
+import random
+import uuid
+from collections import Counter
+
+import pytest
+from sqlalchemy.orm import Session
+
+from loadtest.cluster import LocalCluster, RequestFailed, create_database_engine
+from loadtest.gateway import transport
+from loadtest.scenario import run_session
+from loadtest.stats import percentile
+from loadtest.wire import measure_wire
+from polling.models import Polling
+from vote.models import Vote
+
+
+def test_percentile_should_use_nearest_rank():
+    # arrange
+    durations = [float(value) for value in range(1, 101)]
+
+    # act
+    result = [percentile(durations, percent) for percent in (50, 95, 99, 100)]
+
+    # assert
+    assert result == [50.0, 95.0, 99.0, 100.0]
+
+
+def test_when_session_is_played_should_report_every_call():
+    # arrange
+    engine = create_database_engine('sqlite:///:memory:')
+    cluster = LocalCluster(engine)
+    cluster.create_schema()
+
+    # act
+    cluster.stats.start()
+    snapshot = run_session(cluster.gateway, random.Random(0), participants=3, stories=2)
+    cluster.stats.finish()
+
+    # assert
+    rows = {row['name']: row for row in cluster.stats.report()}
+    assert all(row['errors'] == 0 for row in rows.values())
+    assert rows['vote_service.place']['calls'] == 6
+    assert rows['polling_service.handle_vote_changed']['calls'] == 6
+    assert rows['polling_service.complete']['calls'] == 2
+    assert all(row['p50'] <= row['p95'] <= row['p99'] for row in rows.values())
+    assert len(snapshot['stories']) == 2
+    assert len(snapshot['participants']) == 3
+
+    with Session(engine) as session:
+        assert session.query(Vote).count() == 6
+        assert session.query(Polling).filter(Polling.completed == False).count() == 0
+
+    engine.dispose()
+
+
+def test_when_session_is_played_should_go_through_gateway():
+    # arrange
+    engine = create_database_engine('sqlite:///:memory:')
+    cluster = LocalCluster(engine)
+    cluster.create_schema()
+
+    # act
+    run_session(cluster.gateway, random.Random(0), participants=3, stories=1)
+
+    # assert
+    rows = {row['name']: row for row in cluster.stats.report()}
+    assert rows['gateway_service.request']['calls'] > rows['vote_service.place']['calls']
+    # contexts are resolved by the gateway session cache, filled on join
+    assert 'participant_service.current' not in rows
+    assert cluster.gateway.sessions.stats()['hits'] > 0
+
+    engine.dispose()
+
+
+def test_when_request_fails_should_raise_with_error_envelope():
+    # arrange
+    engine = create_database_engine('sqlite:///:memory:')
+    cluster = LocalCluster(engine)
+    cluster.create_schema()
+
+    # act
+    # assert
+    with pytest.raises(RequestFailed) as exc_info:
+        cluster.gateway.request('1aaa', 'poker_service', 'retrieve', {'entity_id': str(uuid.uuid4())})
+
+    assert exc_info.value.args[0]['exc_type'] == 'NotFound'
+
+    engine.dispose()
+
+
+def test_when_measuring_wire_should_report_smaller_compact_and_compressed_encodings():
+    # arrange
+    engine = create_database_engine('sqlite:///:memory:')
+    cluster = LocalCluster(engine)
+    cluster.create_schema()
+    run_session(cluster.gateway, random.Random(0), participants=3, stories=2)
+
+    # act
+    result = measure_wire(cluster.gateway.frames)
+
+    # assert
+    assert result['msgpack'] < result['json']
+    assert result['json+deflate'] < result['json']
+    assert result['msgpack+deflate'] < result['msgpack']
+
+    engine.dispose()
+
+
+def _play_sessions(blocking_push: bool, sessions: int, stories: int) -> LocalCluster:
+    engine = create_database_engine('sqlite:///:memory:')
+    cluster = LocalCluster(engine, blocking_push=blocking_push)
+    cluster.create_schema()
+    rng = random.Random(0)
+    for _ in range(sessions):
+        run_session(cluster.gateway, rng, participants=8, stories=stories)
+    engine.dispose()
+    return cluster
+
+
+def _received_events(cluster: LocalCluster) -> Counter:
+    frames = (transport.decode(frame) for sid_frames in cluster.gateway.frames.values() for frame in sid_frames)
+    return Counter(frame['event'] for frame in frames if frame['type'] == 'event')
+
+
+def test_when_pushing_with_blocking_rpc_should_deliver_messages_as_soon_as_sent():
+    # act
+    pushed = _play_sessions(blocking_push=False, sessions=1, stories=2)
+    blocking = _play_sessions(blocking_push=True, sessions=1, stories=2)
+
+    # assert
+    # joining sids are subscribed to the poker after their update is broadcast,
+    # so they only receive it when messages are pushed once the worker finishes
+    assert _received_events(pushed) - _received_events(blocking) == Counter({'participant_updated': 8})
+    assert not _received_events(blocking) - _received_events(pushed)
+    rows = {row['name']: row for row in blocking.stats.report()}
+    assert rows['story_service.update']['calls'] == 2
+    assert all(row['errors'] == 0 for row in rows.values())
+
+
+@pytest.mark.benchmark
+def test_benchmark_pushed_event_should_make_writes_faster_than_blocking_rpc():
+    # arrange
+    writes = ['story_service.create', 'story_service.update']
+
+    # act
+    # both modes are played in turns, so a busy machine slows them alike
+    pushed, blocking = [], []
+    for _ in range(3):
+        pushed.append(_play_sessions(blocking_push=False, sessions=2, stories=10))
+        blocking.append(_play_sessions(blocking_push=True, sessions=2, stories=10))
+
+    def p50(clusters: list, name: str) -> float:
+        return percentile([duration for cluster in clusters for duration in cluster.stats.durations[name]], 50)
+
+    # reported with `-s`, without the broker round trip a blocking rpc also waits for
+    for name in writes:
+        print(f'\n{name} p50: blocking rpc {p50(blocking, name) * 1000:.2f}ms; '
+              f'pushed event {p50(pushed, name) * 1000:.2f}ms')
+
+    # assert
+    assert all(p50(pushed, name) < p50(blocking, name) for name in writes)
@@ -30,7 +30,7 @@ def test_when_creating_participant_with_invite_code_should_return_as_dict(db_ses
 
     service = worker_factory(ParticipantService, db=db_session)
     service.invite_rpc.validate.side_effect = fake_validate
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -47,7 +47,7 @@ def test_when_creating_participant_with_invite_code_should_return_as_dict(db_ses
     assert type(result['pokerId']) is str
     assert result['pokerId'] == str(fake_poker_id)
     service.invite_rpc.validate.assert_called_once()
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -68,7 +68,7 @@ def test_when_creating_participant_without_passing_invite_code_should_cause_erro
 
     service = worker_factory(ParticipantService, db=db_session)
     service.invite_rpc.validate.side_effect = fake_validate
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -94,7 +94,7 @@ def test_when_creating_participant_with_invalid_invite_code_should_cause_error(d
 
     service = worker_factory(ParticipantService, db=db_session)
     service.invite_rpc.validate.side_effect = fake_validate
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -122,7 +122,7 @@ def test_when_creating_participant_with_keycloak_id_should_return_as_dict(db_ses
 
     service = worker_factory(ParticipantService, db=db_session)
     service.invite_rpc.validate.side_effect = fake_validate
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -141,7 +141,7 @@ def test_when_creating_participant_with_keycloak_id_should_return_as_dict(db_ses
     assert 'keycloakUserId' in result
     assert type(result['keycloakUserId']) is str
     assert result['keycloakUserId'] == str(fake_keycloak_id)
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -162,7 +162,7 @@ def test_when_creating_participant_should_return_with_secret_key(db_session):
 
     service = worker_factory(ParticipantService, db=db_session)
     service.invite_rpc.validate.side_effect = fake_validate
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -182,7 +182,7 @@ def test_when_creating_participant_should_return_with_secret_key(db_session):
     assert type(result['secretKey']) is str
     assert len(result['secretKey']) == 48
     service.invite_rpc.validate.assert_called_once()
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -208,7 +208,7 @@ def test_when_updating_participant_should_return_as_dict(db_session):
     db_session.commit()
 
     service = worker_factory(ParticipantService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -224,7 +224,7 @@ def test_when_updating_participant_should_return_as_dict(db_session):
     assert 'pokerId' in result
     assert type(result['pokerId']) is str
     assert result['pokerId'] == str(fake_poker_id)
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -251,7 +251,7 @@ def test_when_updating_participant_with_wrong_secret_key_should_return_as_dict(d
     db_session.commit()
 
     service = worker_factory(ParticipantService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -280,7 +280,7 @@ def test_when_joining_poker_should_subscribe_to_room(db_session):
 
     service = worker_factory(ParticipantService, db=db_session)
     service.gateway_rpc.subscribe.side_effect = lambda *args, **kwargs: None
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -292,7 +292,7 @@ def test_when_joining_poker_should_subscribe_to_room(db_session):
     assert type(result['id']) is str
     assert result['id'] == str(fake_participant_id)  # defined in fake_participant
     service.gateway_rpc.subscribe.assert_called_once()
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
 
 
@@ -316,7 +316,7 @@ def test_when_joining_non_existing_user_in_poker_should_cause_error(db_session):
 
     service = worker_factory(ParticipantService, db=db_session)
     service.gateway_rpc.subscribe.side_effect = lambda *args, **kwargs: None
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -70,3 +70,24 @@ def test_when_reading_poker_stories_should_include_stories_ordered_by_order_valu
     assert type(stories[1]) is Story
     assert stories[0].order == 1
     assert stories[1].order == 2
+
+
+def test_poker_to_dict_should_only_have_loaded_column_values(db_session: Session, assert_query_count):
+    # arrange
+    poker = Poker(creator='someone')
+    db_session.add(poker)
+    db_session.commit()
+    poker_id = poker.id
+
+    # act
+    result = poker.to_dict()
+    with assert_query_count(0):
+        db_session.expire(poker)
+        expired = poker.to_dict()
+
+    # assert
+    assert result['id'] == poker_id
+    assert result['creator'] == 'someone'
+    assert '_sa_instance_state' not in result
+    assert 'stories' not in result
+    assert expired == {}
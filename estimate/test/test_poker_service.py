@@ -1,3 +1,4 @@
+import datetime
 import pytest
 import uuid
 from nameko.testing.services import worker_factory
@@ -7,6 +8,9 @@ from poker.service import PokerService
 from poker.models import Poker
 from participant.models import Participant
 from story.models import Story
+from polling.models import Polling
+from vote.models import Vote
+from event.models import Event
 
 
 def test_when_creating_poker_should_return_as_dict(db_session):
@@ -17,7 +21,7 @@ def test_when_creating_poker_should_return_as_dict(db_session):
     }
 
     service = worker_factory(PokerService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -31,7 +35,7 @@ def test_when_creating_poker_should_return_as_dict(db_session):
     assert type(result['stories']) is list
     assert 'participants' in result
     assert type(result['participants']) is list
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -41,7 +45,7 @@ def test_when_creating_poker_without_creator_should_cause_error(db_session):
     fake_payload = {}
 
     service = worker_factory(PokerService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -60,7 +64,7 @@ def test_when_retrieving_poker_should_return_as_dict(db_session):
 
     service = worker_factory(PokerService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_entity_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -74,7 +78,7 @@ def test_when_retrieving_poker_should_return_as_dict(db_session):
     assert type(result['stories']) is list
     assert 'participants' in result
     assert type(result['participants']) is list
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
 
 
 def test_when_retrieving_non_existing_poker_should_return_error(db_session):
@@ -84,7 +88,7 @@ def test_when_retrieving_non_existing_poker_should_return_error(db_session):
 
     service = worker_factory(PokerService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: None
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -111,7 +115,7 @@ def test_when_selecting_story_should_return_story_dict(db_session, monkeypatch):
     service = worker_factory(PokerService, db=db_session)
     service.story_rpc.retrieve.side_effect = lambda *args, **kwargs: fake_story
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -122,7 +126,7 @@ def test_when_selecting_story_should_return_story_dict(db_session, monkeypatch):
     assert 'id' in result
     assert type(result['id']) is str
     assert result['id'] == str(fake_story_id)
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
 
 
@@ -141,7 +145,7 @@ def test_when_selecting_non_existing_story_should_cause_error(db_session, monkey
     service = worker_factory(PokerService, db=db_session)
     service.story_rpc.retrieve.side_effect = fake_story_retrieve
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -161,7 +165,7 @@ def test_when_selecting_story_with_none_should_unselect(db_session, monkeypatch)
     service = worker_factory(PokerService, db=db_session)
     service.story_rpc.retrieve.side_effect = lambda *args, **kwargs: None
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -169,7 +173,7 @@ def test_when_selecting_story_with_none_should_unselect(db_session, monkeypatch)
 
     # assert
     assert result is None
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
 
 
@@ -187,10 +191,102 @@ def test_when_retrieving_poker_without_being_participant_should_return_not_found
 
     service = worker_factory(PokerService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = fake_get_current_poker_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
     # assert
     with pytest.raises(NotFound):
         result = service.retrieve(fake_sid, str(fake_entity_id))
+
+
+def _create_room(db_session, stories: int) -> dict:
+    fake_poker_id = uuid.uuid4()
+    fake_participant_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Participant(id=fake_participant_id, poker_id=fake_poker_id, name="Arthur", sid='1aaa'))
+    for order in range(stories):
+        story = Story(name=f"Story {order}", poker_id=fake_poker_id, order=order)
+        polling = Polling(story=story, poker_id=fake_poker_id)
+        db_session.add_all([
+            story,
+            polling,
+            Event(story=story, poker_id=fake_poker_id, type="comment", revealed=False, content="hi", creator="Arthur"),
+            Vote(polling=polling, participant_id=fake_participant_id, poker_id=fake_poker_id, value="3"),
+        ])
+    db_session.commit()
+    db_session.expire_all()
+
+    return {"participantId": str(fake_participant_id), "pokerId": str(fake_poker_id)}
+
+
+def test_when_taking_snapshot_should_load_room_with_fixed_number_of_queries(db_session, sql_statements):
+    # arrange
+    small_context = _create_room(db_session, stories=1)
+    large_context = _create_room(db_session, stories=10)
+
+    service = worker_factory(PokerService, db=db_session)
+
+    # act
+    sql_statements.clear()
+    small = service.snapshot('1aaa', context=small_context)
+    small_statements = len(sql_statements)
+
+    sql_statements.clear()
+    large = service.snapshot('1aaa', context=large_context)
+    large_statements = len(sql_statements)
+
+    # assert
+    assert small_statements == large_statements
+    assert large['poker']['id'] == large_context['pokerId']
+    assert 'stories' not in large['poker']
+    assert len(large['stories']) == 10
+    assert len(large['stories'][0]['events']) == 1
+    assert large['stories'][0]['pollings'][0]['votes'][0]['participant']['name'] == "Arthur"
+    assert len(large['participants']) == 1
+    assert large['since'] is None
+    service.outbox.unicast.assert_called_with('1aaa', 'poker_snapshot', large)
+
+
+def test_when_taking_snapshot_since_version_should_return_only_changes(db_session):
+    # arrange
+    context = _create_room(db_session, stories=3)
+
+    service = worker_factory(PokerService, db=db_session)
+    version = service.snapshot('1aaa', context=context)['version']
+
+    story = db_session.query(Story).filter(Story.order == 1).one()
+    db_session.add(Event(story=story, poker_id=story.poker_id, type="comment", revealed=False, content="new",
+                         creator="Arthur", updated_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=1)))
+    db_session.commit()
+
+    # act
+    result = service.snapshot('1aaa', since=version, context=context)
+
+    # assert
+    assert result['since'] == version
+    assert result['version'] > version
+    assert [item['id'] for item in result['stories']] == [str(story.id)]
+    assert len(result['stories'][0]['events']) == 2
+    assert result['participants'] == []
+
+
+def test_when_querying_history_should_not_lazy_load_relationships(db_session, assert_query_count):
+    # arrange
+    contexts = [_create_room(db_session, stories=3) for _ in range(3)]
+    db_session.query(Participant).update({Participant.keycloak_user_id: "arthur"})
+    db_session.commit()
+    db_session.expire_all()
+
+    service = worker_factory(PokerService, db=db_session)
+
+    # act
+    # pokers, stories, events, pollings, votes with participants and participants
+    with assert_query_count(6):
+        result = service.history('1aaa', "arthur")
+
+    # assert
+    assert len(result['items']) == len(contexts)
+    assert len(result['items'][0]['stories'][0]['pollings'][0]['votes']) == 1
@@ -1,12 +1,17 @@
 import uuid
+from unittest.mock import Mock
 
 import pytest
 from nameko.testing.services import worker_factory
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
 
 from base.exceptions import NotFound
 from poker.models import Poker
 from story.models import Story
 from polling.models import Polling
+from participant.models import Participant
+from vote.models import Vote
 from polling.service import PollingService
 
 
@@ -26,7 +31,7 @@ def test_when_retrieving_polling_should_return_as_dict(db_session):
 
     service = worker_factory(PollingService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -47,7 +52,7 @@ def test_when_retrieving_polling_should_return_as_dict(db_session):
     assert result['completed'] is False
     assert 'revealed' in result
     assert result['revealed'] is False
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -73,7 +78,7 @@ def test_when_getting_current_polling_should_return_last_not_completed_as_dict(d
     db_session.commit()
 
     service = worker_factory(PollingService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -95,7 +100,7 @@ def test_when_getting_current_polling_should_return_last_not_completed_as_dict(d
     assert result['completed'] is False
     assert 'revealed' in result
     assert result['revealed'] is True
-    service.gateway_rpc.unicast.assert_not_called()
+    service.outbox.unicast.assert_not_called()
     service.dispatch.assert_not_called()
 
 
@@ -120,7 +125,7 @@ def test_when_completing_polling_should_return_completed_as_dict(db_session):
 
     service = worker_factory(PollingService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -141,7 +146,7 @@ def test_when_completing_polling_should_return_completed_as_dict(db_session):
     assert result['completed'] is True
     assert 'revealed' in result
     assert result['revealed'] is True
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
 
 
@@ -164,7 +169,7 @@ def test_when_trying_to_completing_non_existing_polling_should_cause_an_error(db
 
     service = worker_factory(PollingService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -172,7 +177,7 @@ def test_when_trying_to_completing_non_existing_polling_should_cause_an_error(db
     with pytest.raises(NotFound):
         result = service.complete(fake_sid, fake_payload)
 
-    service.gateway_rpc.broadcast.assert_not_called()
+    service.outbox.broadcast.assert_not_called()
     service.dispatch.assert_not_called()
 
 
@@ -191,7 +196,7 @@ def test_when_creating_polling_should_get_poker_id_from_story(db_session):
     db_session.commit()
 
     service = worker_factory(PollingService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -215,7 +220,7 @@ def test_when_creating_polling_should_get_poker_id_from_story(db_session):
     assert result['completed'] is False
     assert 'revealed' in result
     assert result['revealed'] is False
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -234,7 +239,7 @@ def test_when_creating_polling_with_anonymous_poker_should_create_anonymous_poll
     db_session.commit()
 
     service = worker_factory(PollingService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -261,5 +266,337 @@ def test_when_creating_polling_with_anonymous_poker_should_create_anonymous_poll
     assert result['completed'] is False
     assert 'revealed' in result
     assert result['revealed'] is False
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
+
+
+def test_when_poker_is_updated_should_update_open_pollings_in_bulk(db_session, sql_statements):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_ids = [uuid.uuid4() for _ in range(5)]
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    for order, fake_story_id in enumerate(fake_story_ids):
+        db_session.add(Story(id=fake_story_id, name=f"Story {order}", poker_id=fake_poker_id, order=order))
+    db_session.commit()
+    for fake_story_id in fake_story_ids:
+        db_session.add(Polling(story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.add(Polling(story_id=fake_story_ids[0], poker_id=fake_poker_id, completed=True, revealed=True))
+    db_session.commit()
+
+    service = worker_factory(PollingService, db=db_session)
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+    sql_statements.clear()
+
+    # act
+    service.handle_poker_updated({"id": str(fake_poker_id), "anonymousVoting": True})
+
+    # assert
+    statements = [statement.lstrip().split()[0].upper() for statement, _ in sql_statements]
+    assert statements == ["UPDATE", "SELECT", "SELECT"]
+    assert service.outbox.broadcast.call_count == len(fake_story_ids)
+    room_name, event, payload = service.outbox.broadcast.call_args.args
+    assert event == 'pollings_updated'
+    assert len(payload['items']) == 1
+    assert payload['items'][0]['anonymous'] is True
+    assert db_session.query(Polling).filter(Polling.anonymous == True).count() == len(fake_story_ids)
+
+
+def test_when_poker_is_updated_without_changing_anonymity_should_not_touch_pollings(db_session, sql_statements):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com', anonymous_voting=True))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id, anonymous=True))
+    db_session.commit()
+
+    service = worker_factory(PollingService, db=db_session)
+    sql_statements.clear()
+
+    # act
+    service.handle_poker_updated({"id": str(fake_poker_id), "anonymousVoting": True})
+
+    # assert
+    statements = [statement.lstrip().split()[0].upper() for statement, _ in sql_statements]
+    assert statements == ["UPDATE"]
+    assert db_session.get(Polling, fake_polling_id).version == 1
+    service.outbox.broadcast.assert_not_called()
+    service.dispatch.assert_not_called()
+
+
+def test_when_querying_pollings_should_load_votes_with_participants_at_once(db_session, assert_query_count):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_participant_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Participant(id=fake_participant_id, poker_id=fake_poker_id, name="Arthur", sid='1aaa'))
+    for order in range(5):
+        story = Story(name=f"Story {order}", poker_id=fake_poker_id, order=order)
+        polling = Polling(story=story, poker_id=fake_poker_id)
+        db_session.add_all([
+            story,
+            polling,
+            Vote(polling=polling, participant_id=fake_participant_id, poker_id=fake_poker_id, value="3"),
+        ])
+    db_session.commit()
+    db_session.expire_all()
+
+    fake_context = {"participantId": str(fake_participant_id), "pokerId": str(fake_poker_id)}
+    service = worker_factory(PollingService, db=db_session)
+
+    # act
+    # pollings, then votes joined with their participants
+    with assert_query_count(2):
+        result = service.query('1aaa', [], context=fake_context)
+
+    # assert
+    assert len(result['items']) == 5
+    assert result['items'][0]['votes'][0]['participant']['name'] == "Arthur"
+
+
+def test_when_completing_polling_should_set_story_value_in_single_commit(db_session, monkeypatch):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.commit()
+
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(fake_poker_id)}
+    service = worker_factory(PollingService, db=db_session)
+    commit = Mock(wraps=db_session.commit)
+    monkeypatch.setattr(db_session, 'commit', commit)
+
+    # act
+    result = service.complete('1aaa', {"id": str(fake_polling_id), "value": "8"}, context=fake_context)
+
+    # assert
+    commit.assert_called_once()
+    assert result['value'] == "8"
+    story = db_session.query(Story).filter(Story.id == fake_story_id).one()
+    assert story.value == "8"
+    assert [c.args[1] for c in service.outbox.broadcast.call_args_list] == ['polling_completed', 'story_updated']
+    assert [c.args[0] for c in service.dispatch.call_args_list] == ['polling_completed', 'story_updated']
+    service.outbox.broadcast.assert_any_call(f'story:{fake_story_id}', 'polling_completed', result)
+    service.dispatch.assert_any_call('polling_completed', result)
+    story_result = service.dispatch.call_args_list[1].args[1]
+    assert story_result['value'] == "8"
+    assert story_result['version'] == story.version == 2
+    service.outbox.broadcast.assert_any_call(str(fake_poker_id), 'story_updated', {
+        'id': str(fake_story_id),
+        'version': 2,
+        'changes': {
+            'value': "8",
+            'updatedAt': story_result['updatedAt'],
+        },
+    })
+
+
+def test_when_restarting_polling_should_leave_single_open_polling_in_single_commit(db_session, monkeypatch):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+    fake_stale_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com', anonymous_voting=True))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_stale_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.commit()
+
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(fake_poker_id)}
+    service = worker_factory(PollingService, db=db_session)
+    commit = Mock(wraps=db_session.commit)
+    monkeypatch.setattr(db_session, 'commit', commit)
+
+    # act
+    result = service.restart('1aaa', str(fake_polling_id), context=fake_context)
+
+    # assert
+    commit.assert_called_once()
+    open_pollings = db_session.query(Polling) \
+        .filter(Polling.story_id == fake_story_id) \
+        .filter(Polling.completed == False) \
+        .all()
+    assert [str(polling.id) for polling in open_pollings] == [result['id']]
+    assert result['anonymous'] is True
+    assert result['votes'] == []
+    room_name = f'story:{fake_story_id}'
+    assert [c.args[1] for c in service.outbox.broadcast.call_args_list] == \
+        ['pollings_updated', 'polling_created', 'polling_restarted']
+    assert [c.args[0] for c in service.dispatch.call_args_list] == \
+        ['pollings_updated', 'polling_created', 'polling_restarted']
+    completed = service.outbox.broadcast.call_args_list[0].args[2]['items']
+    assert sorted(item['id'] for item in completed) == sorted([str(fake_stale_polling_id), str(fake_polling_id)])
+    assert all(item['completed'] and item['version'] == 2 for item in completed)
+    service.outbox.broadcast.assert_any_call(room_name, 'polling_created', result)
+    service.outbox.broadcast.assert_any_call(room_name, 'polling_restarted', result)
+    service.dispatch.assert_any_call('polling_restarted', result)
+
+
+def test_when_restarting_non_existing_polling_should_cause_an_error(db_session):
+    # arrange
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(uuid.uuid4())}
+    service = worker_factory(PollingService, db=db_session)
+
+    # act
+    # assert
+    with pytest.raises(NotFound):
+        service.restart('1aaa', str(uuid.uuid4()), context=fake_context)
+
+    service.outbox.broadcast.assert_not_called()
+    service.dispatch.assert_not_called()
+
+
+def test_when_vote_is_placed_should_recount_polling_tally(db_session):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com', vote_pattern="1,2,3,?"))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    for value in ["2", "3", "3", "?"]:
+        participant = Participant(poker_id=fake_poker_id, name="Arthur", sid='1aaa')
+        db_session.add(participant)
+        db_session.add(Vote(polling_id=fake_polling_id, participant=participant, poker_id=fake_poker_id, value=value))
+    db_session.commit()
+
+    service = worker_factory(PollingService, db=db_session)
+    fake_payload = {"pollingId": str(fake_polling_id), "value": "3"}
+
+    # act
+    # redelivered events must not change the tally
+    service.handle_vote_changed(fake_payload)
+    service.handle_vote_changed(fake_payload)
+
+    # assert
+    tally = db_session.query(Polling).filter(Polling.id == fake_polling_id).one().tally
+    assert tally["counts"] == {"1": 0, "2": 1, "3": 2, "?": 1}
+    assert tally["total"] == 4
+    assert tally["median"] == 3
+    expected = {"pollingId": str(fake_polling_id), "storyId": str(fake_story_id), "tally": tally}
+    service.outbox.broadcast.assert_called_with(f'story:{fake_story_id}', 'polling_tallied', expected)
+    service.dispatch.assert_called_with('polling_tallied', expected)
+
+
+def test_when_another_vote_is_tallied_while_recounting_should_keep_tally_of_every_vote(db_session):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com', vote_pattern="1,2,3"))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    participant = Participant(poker_id=fake_poker_id, name="Arthur", sid='1aaa')
+    db_session.add(participant)
+    db_session.add(Vote(polling_id=fake_polling_id, participant=participant, poker_id=fake_poker_id, value="2"))
+    db_session.commit()
+
+    first = worker_factory(PollingService, db=db_session)
+    second = worker_factory(PollingService, db=db_session)
+    count_votes = first.count_votes
+
+    def count_votes_after_another_tally(polling_id):
+        # another vote arrives and is tallied by another worker meanwhile
+        other = Participant(poker_id=fake_poker_id, name="Ford", sid='2bbb')
+        db_session.add(other)
+        db_session.add(Vote(polling_id=fake_polling_id, participant=other, poker_id=fake_poker_id, value="3"))
+        db_session.flush()
+        second.handle_vote_changed({"pollingId": str(fake_polling_id), "value": "3"})
+        return count_votes(polling_id)
+
+    first.count_votes = count_votes_after_another_tally
+
+    # act
+    first.handle_vote_changed({"pollingId": str(fake_polling_id), "value": "2"})
+
+    # assert
+    polling = db_session.query(Polling).filter(Polling.id == fake_polling_id).one()
+    db_session.refresh(polling)
+    assert polling.tally["counts"] == {"1": 0, "2": 1, "3": 1}
+    # tallying isn't a change clients track by version
+    assert polling.version == 1
+    assert first.outbox.broadcast.call_args.args[2]["tally"] == polling.tally
+
+
+def test_when_recounting_votes_should_lock_polling_until_commit(db_session):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com', vote_pattern="1,2,3"))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.commit()
+
+    service = worker_factory(PollingService, db=db_session)
+
+    # sqlite doesn't lock rows, so statements are compiled as on postgresql
+    statements = []
+
+    def do_orm_execute(orm_execute_state):
+        statements.append(str(orm_execute_state.statement.compile(dialect=postgresql.dialect())))
+
+    event.listen(db_session, 'do_orm_execute', do_orm_execute)
+
+    # act
+    service.handle_vote_changed({"pollingId": str(fake_polling_id), "value": "2"})
+    event.remove(db_session, 'do_orm_execute', do_orm_execute)
+
+    # assert
+    assert statements[0].startswith('SELECT pollings.id AS pollings_id')
+    assert statements[0].endswith('FOR UPDATE OF pollings')
+    assert statements[-1].startswith('UPDATE pollings SET tally=')
+
+
+def test_when_getting_tally_of_polling_without_votes_should_return_empty_tally(db_session):
+    # arrange
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com', vote_pattern="1,2,3"))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.commit()
+
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(fake_poker_id)}
+    service = worker_factory(PollingService, db=db_session)
+
+    # act
+    result = service.tally('1aaa', str(fake_polling_id), context=fake_context)
+
+    # assert
+    assert result["pollingId"] == str(fake_polling_id)
+    assert result["tally"]["counts"] == {"1": 0, "2": 0, "3": 0}
+    assert result["tally"]["total"] == 0
+    service.outbox.unicast.assert_called_once_with('1aaa', 'polling_tallied', result)
@@ -0,0 +1,51 @@
+from polling.tally import build_tally
+
+
+def test_when_building_tally_should_count_every_pattern_value():
+    # act
+    result = build_tally("1,2,3,?", {"2": 2, "3": 1})
+
+    # assert
+    assert result["counts"] == {"1": 0, "2": 2, "3": 1, "?": 0}
+    assert result["total"] == 3
+    assert result["consensus"] is False
+
+
+def test_when_building_tally_should_ignore_non_numeric_values_on_mean_and_median():
+    # act
+    result = build_tally("1,2,3,5,8,?,__coffee", {"1": 1, "3": 1, "8": 2, "?": 3, "__coffee": 1})
+
+    # assert
+    assert result["mean"] == 5
+    assert result["median"] == 5.5
+    assert result["total"] == 8
+
+
+def test_when_building_tally_with_single_voted_value_should_have_consensus():
+    # act
+    result = build_tally("1,2,3", {"2": 4})
+
+    # assert
+    assert result["consensus"] is True
+    assert result["mean"] == 2
+    assert result["median"] == 2
+
+
+def test_when_building_tally_without_votes_should_not_have_statistics():
+    # act
+    result = build_tally("1,2,3", {})
+
+    # assert
+    assert result["total"] == 0
+    assert result["mean"] is None
+    assert result["median"] is None
+    assert result["consensus"] is False
+
+
+def test_when_building_tally_should_count_values_out_of_pattern():
+    # act
+    result = build_tally("1,2", {"13": 1})
+
+    # assert
+    assert result["counts"] == {"1": 0, "2": 0, "13": 1}
+    assert result["consensus"] is True
@@ -0,0 +1,206 @@
+import datetime
+import re
+import uuid
+
+from nameko.testing.services import worker_factory
+
+from poker.models import Poker
+from story.models import Story
+from polling.models import Polling
+from vote.models import Vote
+from event.models import Event
+from participant.models import Participant
+from invite.models import Invite
+from event.service import EventService
+from invite.service import InviteService
+from participant.service import ParticipantService
+from poker.service import PokerService
+from polling.service import PollingService
+from story.service import StoryService
+from vote.service import VoteService
+
+HOT_TABLES = ("participants", "stories", "pollings", "votes", "events", "invites")
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def explain_full_scans(db_connection, sql_statements) -> list:
+    """
+    Runs EXPLAIN QUERY PLAN on every recorded statement and returns the ones
+    which scan a whole hot table instead of searching through an index
+    """
+    recorded = list(sql_statements)
+    full_scans = []
+
+    for statement, parameters in recorded:
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            continue
+        plan = db_connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        for row in plan:
+            match = FULL_SCAN.match(row[-1])
+            if match and match.group(1) in HOT_TABLES:
+                full_scans.append((statement, row[-1]))
+
+    return full_scans
+
+
+def _populate(db_session) -> dict:
+    ids = {
+        "sid": '1aaa',
+        "poker_id": uuid.uuid4(),
+        "story_id": uuid.uuid4(),
+        "polling_id": uuid.uuid4(),
+        "participant_id": uuid.uuid4(),
+    }
+
+    db_session.add(Poker(id=ids["poker_id"], creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=ids["story_id"], name="Story 1", poker_id=ids["poker_id"], order=0))
+    db_session.add(Participant(id=ids["participant_id"], poker_id=ids["poker_id"], name="Arthur", sid=ids["sid"],
+                               keycloak_user_id="arthur"))
+    db_session.add(Invite(code="code", poker_id=ids["poker_id"],
+                          expires_at=datetime.datetime.now() + datetime.timedelta(hours=1)))
+    db_session.commit()
+    db_session.add(Polling(id=ids["polling_id"], story_id=ids["story_id"], poker_id=ids["poker_id"]))
+    db_session.add(Event(story_id=ids["story_id"], poker_id=ids["poker_id"], type="comment", revealed=False,
+                         content="hi", creator=str(ids["participant_id"])))
+    db_session.commit()
+    db_session.add(Vote(value="3", polling_id=ids["polling_id"], participant_id=ids["participant_id"],
+                        poker_id=ids["poker_id"]))
+    db_session.commit()
+    db_session.expire_all()
+
+    return ids
+
+
+def _mock_gateway(service, ids):
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: ids["poker_id"]
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+    return service
+
+
+def test_finding_current_participant_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(ParticipantService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    service.current(ids["sid"])
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_finding_current_polling_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(PollingService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    service.current(ids["sid"], str(ids["story_id"]))
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_placing_vote_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(VoteService, db=db_session), ids)
+    context = {"participantId": str(ids["participant_id"]), "pokerId": str(ids["poker_id"])}
+    sql_statements.clear()
+
+    # act
+    service.place(ids["sid"], {"value": "5", "pollingId": str(ids["polling_id"])}, context=context)
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_querying_unrevealed_story_events_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(EventService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    service.query(ids["sid"], [
+        {"attr": "story_id", "value": str(ids["story_id"])},
+        {"attr": "revealed", "value": "false"},
+    ])
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_querying_events_since_timestamp_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(EventService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    result = service.query(ids["sid"], [
+        {"attr": "created_at", "op": "since", "value": "2024-01-01T00:00:00"},
+    ])
+
+    # assert
+    assert len(result['items']) == 1
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_querying_poker_stories_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(StoryService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    service.query(ids["sid"], [])
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_validating_invite_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(InviteService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    valid = service.validate(code="code", poker_id=ids["poker_id"])
+
+    # assert
+    assert valid is True
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_querying_poker_history_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(PokerService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    service.history(ids["sid"], "arthur")
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
+
+
+def test_updating_pollings_from_poker_should_use_indexes(db_session, db_connection, sql_statements):
+    # arrange
+    ids = _populate(db_session)
+    service = _mock_gateway(worker_factory(PollingService, db=db_session), ids)
+    sql_statements.clear()
+
+    # act
+    service.handle_poker_updated({"id": str(ids["poker_id"]), "anonymousVoting": True})
+
+    # assert
+    assert explain_full_scans(db_connection, sql_statements) == []
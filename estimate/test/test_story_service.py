@@ -3,8 +3,9 @@ import uuid
 import pytest
 from nameko.testing.services import worker_factory
 from pydantic import ValidationError
+from sqlalchemy import event, update
 
-from base.exceptions import NotFound, InvalidFilter
+from base.exceptions import NotFound, InvalidFilter, InvalidField, VersionConflict
 from poker.models import Poker
 from story.models import Story
 from story.service import StoryService
@@ -22,7 +23,7 @@ def test_when_creating_story_should_return_as_dict(db_session):
     }
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -37,7 +38,7 @@ def test_when_creating_story_should_return_as_dict(db_session):
     assert result['pokerId'] == str(fake_poker_id)
     assert 'events' in result
     assert type(result['events']) is list
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -50,7 +51,7 @@ def test_when_creating_story_without_name_should_cause_error(db_session):
     }
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -72,7 +73,7 @@ def test_when_retrieving_story_should_return_as_dict(db_session):
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -86,7 +87,7 @@ def test_when_retrieving_story_should_return_as_dict(db_session):
     assert type(result['events']) is list
     assert 'pollings' in result
     assert type(result['pollings']) is list
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -98,7 +99,7 @@ def test_when_retrieving_non_existing_story_should_return_error(db_session):
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -113,7 +114,7 @@ def test_when_retrieving_story_with_non_uuid_string_should_return_value_error(db
     confused_entity_id = 'arthur'
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -141,7 +142,7 @@ def test_when_updating_story_should_return_as_dict(db_session):
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -159,10 +160,126 @@ def test_when_updating_story_should_return_as_dict(db_session):
     assert result['pokerId'] == str(fake_poker_id)
     assert 'events' in result
     assert type(result['events']) is list
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
+def test_when_updating_story_should_broadcast_only_changes_with_version(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_payload = {
+        'name': 'Revised Story 1',
+        'pokerId': str(fake_poker_id),
+        'order': 0
+    }
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id, order=0))
+    db_session.commit()
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+
+    # act
+    result = service.update(fake_sid, str(fake_story_id), fake_payload)
+
+    # assert
+    assert result['version'] == 2
+    service.outbox.broadcast.assert_called_once_with(str(fake_poker_id), 'story_updated', {
+        'id': str(fake_story_id),
+        'version': 2,
+        'changes': {
+            'name': 'Revised Story 1',
+            'updatedAt': result['updatedAt'],
+        },
+    })
+    service.dispatch.assert_called_once_with('story_updated', result)
+
+
+def test_when_updating_story_partially_should_only_write_received_fields(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_payload = {
+        'value': '8'
+    }
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", description="As a user", poker_id=fake_poker_id, order=3))
+    db_session.commit()
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+
+    # act
+    result = service.update(fake_sid, str(fake_story_id), fake_payload, version=1)
+
+    # assert
+    assert result['value'] == '8'
+    assert result['name'] == 'Story 1'
+    assert result['description'] == 'As a user'
+    assert result['order'] == 3
+    assert result['version'] == 2
+
+
+def test_when_updating_story_with_outdated_version_should_cause_conflict_error(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id, order=0))
+    db_session.commit()
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.update(fake_sid, str(fake_story_id), {'name': 'Revised by Arthur'}, version=1)
+
+    # act
+    # assert
+    with pytest.raises(VersionConflict):
+        result = service.update(fake_sid, str(fake_story_id), {'name': 'Revised by Ford'}, version=1)
+
+    assert db_session.get(Story, fake_story_id).name == 'Revised by Arthur'
+    service.outbox.broadcast.assert_called_once()
+
+
+def test_when_story_is_changed_concurrently_while_updating_should_cause_conflict_error(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id, order=0))
+    db_session.commit()
+
+    def write_concurrently(session, flush_context, instances):
+        session.connection().execute(
+            update(Story).where(Story.id == fake_story_id).values(name='Revised by Ford', version=Story.version + 1)
+        )
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    event.listen(db_session, 'before_flush', write_concurrently, once=True)
+
+    # act
+    # assert
+    with pytest.raises(VersionConflict):
+        result = service.update(fake_sid, str(fake_story_id), {'name': 'Revised by Arthur'}, version=1)
+
+    service.outbox.broadcast.assert_not_called()
+    service.dispatch.assert_not_called()
+
+
 def test_when_updating_non_existing_story_should_cause_not_found_error(db_session):
     # arrange
     fake_sid = '1aaa'
@@ -176,7 +293,7 @@ def test_when_updating_non_existing_story_should_cause_not_found_error(db_sessio
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -197,7 +314,7 @@ def test_when_updating_story_with_non_uuid_string_should_cause_value_error(db_se
     }
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -219,7 +336,7 @@ def test_when_deleting_story_should_return_as_dict(db_session):
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -237,7 +354,7 @@ def test_when_deleting_story_should_return_as_dict(db_session):
     assert result['pokerId'] == str(fake_poker_id)
     assert 'events' in result
     assert type(result['events']) is list
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -249,7 +366,7 @@ def test_when_deleting_non_existing_story_should_cause_not_found_error(db_sessio
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -265,7 +382,7 @@ def test_when_deleting_story_with_non_uuid_string_should_cause_value_error(db_se
     fake_story_id = 'arthur'
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -292,7 +409,7 @@ def test_when_querying_stories_should_return_as_dict_with_list(db_session):
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -310,7 +427,7 @@ def test_when_querying_stories_should_return_as_dict_with_list(db_session):
     assert 'filters' in result['metadata']
     assert type(result['metadata']['filters']) is list
     assert len(result['metadata']['filters']) == len(fake_filters)
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -340,7 +457,7 @@ def test_when_querying_stories_with_same_poker_id_should_return_only_stories_rel
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id1
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -369,7 +486,7 @@ def test_when_querying_stories_with_same_poker_id_should_return_only_stories_rel
     assert type(result['metadata']['filters'][0]['value']) is str
     assert result['metadata']['filters'][0]['attr'] == 'poker_id'
     assert result['metadata']['filters'][0]['value'] == str(fake_poker_id1)
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -390,7 +507,7 @@ def test_when_querying_stories_from_poker_id_without_stories_should_return_empty
 
     service = worker_factory(StoryService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id1
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -406,7 +523,7 @@ def test_when_querying_stories_from_poker_id_without_stories_should_return_empty
     assert 'filters' in result['metadata']
     assert type(result['metadata']['filters']) is list
     assert len(result['metadata']['filters']) == len(fake_filters)
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -435,7 +552,7 @@ def test_when_querying_stories_with_invalid_value_should_cause_error(db_session)
     db_session.commit()
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -469,7 +586,7 @@ def test_when_querying_stories_with_non_allowed_filter_should_cause_error(db_ses
     db_session.commit()
 
     service = worker_factory(StoryService, db=db_session)
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -500,14 +617,14 @@ def test_when_revealing_votes_for_story_should_return_story_as_dict(db_session):
                          story_id=fake_story_id1, poker_id=fake_poker_id1))
     db_session.commit()
 
-    def fake_event_query(*args, **kwargs):
+    def fake_event_reveal_story(*args, **kwargs):
         return {
             "items": [
                 {
                     "id": str(fake_event_id1),
                     "type": "vote",
                     "content": "5",
-                    "revealed": False,
+                    "revealed": True,
                     "creator": str(fake_participant_id1),
                     "storyId": str(fake_story_id1)
                 },
@@ -515,27 +632,16 @@ def test_when_revealing_votes_for_story_should_return_story_as_dict(db_session):
                     "id": str(fake_event_id2),
                     "type": "vote",
                     "content": "2",
-                    "revealed": False,
-                    "creator": str(fake_participant_id1),
+                    "revealed": True,
+                    "creator": str(fake_participant_id2),
                     "storyId": str(fake_story_id1)
                 }
             ]
         }
 
-    def fake_event_update(*args, **kwargs):
-        return {
-            "id": str(fake_event_id1),
-            "type": "vote",
-            "content": "5",
-            "revealed": True,
-            "creator": str(fake_participant_id1),
-            "storyId": str(fake_story_id1)
-        }
-
     service = worker_factory(StoryService, db=db_session)
-    service.event_rpc.query.side_effect = fake_event_query
-    service.event_rpc.update.side_effect = fake_event_update
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.event_rpc.reveal_story.side_effect = fake_event_reveal_story
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -551,10 +657,9 @@ def test_when_revealing_votes_for_story_should_return_story_as_dict(db_session):
     assert 'events' in result
     assert type(result['events']) is list
     assert len(result['events']) == 2
-    service.gateway_rpc.broadcast.assert_called_once()
+    service.outbox.broadcast.assert_called_once()
     service.dispatch.assert_called_once()
-    service.event_rpc.query.assert_called_once()
-    service.event_rpc.update.assert_called()
+    service.event_rpc.reveal_story.assert_called_once_with(sid=fake_sid, story_id=str(fake_story_id1), context=None)
 
 
 def test_when_revealing_votes_for_non_existing_story_should_cause_an_error(db_session):
@@ -567,14 +672,14 @@ def test_when_revealing_votes_for_non_existing_story_should_cause_an_error(db_se
     fake_participant_id1 = uuid.uuid4()
     fake_participant_id2 = uuid.uuid4()
 
-    def fake_event_query(*args, **kwargs):
+    def fake_event_reveal_story(*args, **kwargs):
         return {
             "items": [
                 {
                     "id": str(fake_event_id1),
                     "type": "vote",
                     "content": "5",
-                    "revealed": False,
+                    "revealed": True,
                     "creator": str(fake_participant_id1),
                     "storyId": str(fake_story_id1)
                 },
@@ -582,30 +687,204 @@ def test_when_revealing_votes_for_non_existing_story_should_cause_an_error(db_se
                     "id": str(fake_event_id2),
                     "type": "vote",
                     "content": "2",
-                    "revealed": False,
-                    "creator": str(fake_participant_id1),
+                    "revealed": True,
+                    "creator": str(fake_participant_id2),
                     "storyId": str(fake_story_id1)
                 }
             ]
         }
 
-    def fake_event_update(*args, **kwargs):
-        return {
-            "id": str(fake_event_id1),
-            "type": "vote",
-            "content": "5",
-            "revealed": True,
-            "creator": str(fake_participant_id1),
-            "storyId": str(fake_story_id1)
-        }
-
     service = worker_factory(StoryService, db=db_session)
-    service.event_rpc.query.side_effect = fake_event_query
-    service.event_rpc.update.side_effect = fake_event_update
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.event_rpc.reveal_story.side_effect = fake_event_reveal_story
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
     # assert
     with pytest.raises(NotFound):
         result = service.reveal(fake_sid, str(fake_story_id1))
+
+
+def test_when_retrieving_story_with_request_context_should_not_call_gateway_for_poker(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_context = {
+        "participantId": str(uuid.uuid4()),
+        "pokerId": str(fake_poker_id)
+    }
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+
+    service = worker_factory(StoryService, db=db_session)
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    result = service.retrieve(fake_sid, str(fake_story_id), context=fake_context)
+
+    # assert
+    assert result['id'] == str(fake_story_id)
+    service.gateway_rpc.get_current_poker_id.assert_not_called()
+
+
+def test_when_querying_stories_by_order_range_should_return_ordered_stories_inside_range(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+
+    fake_filters = [
+        {
+            "attr": "order",
+            "op": "gt",
+            "value": "1"
+        },
+        {
+            "attr": "order",
+            "op": "lt",
+            "value": "5"
+        }
+    ]
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    for i in range(6):
+        db_session.add(Story(name=f"Story {i}", poker_id=fake_poker_id, order=i))
+    db_session.commit()
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    result = service.query(fake_sid, fake_filters, order_by=["-order"])
+
+    # assert
+    assert [item['order'] for item in result['items']] == [4, 3, 2]
+    assert result['metadata']['orderBy'] == ["-order"]
+
+
+def test_when_querying_stories_with_in_operator_should_return_only_listed_stories(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+
+    fake_filters = [
+        {
+            "attr": "order",
+            "op": "in",
+            "value": ["0", "2"]
+        },
+        {
+            "attr": "order",
+            "op": "ne",
+            "value": "0"
+        }
+    ]
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    for i in range(3):
+        db_session.add(Story(name=f"Story {i}", poker_id=fake_poker_id, order=i))
+    db_session.commit()
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    result = service.query(fake_sid, fake_filters)
+
+    # assert
+    assert [item['order'] for item in result['items']] == [2]
+
+
+def test_when_querying_stories_with_in_operator_and_single_value_should_cause_error(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+
+    fake_filters = [
+        {
+            "attr": "order",
+            "op": "in",
+            "value": "0"
+        }
+    ]
+
+    service = worker_factory(StoryService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    # assert
+    with pytest.raises(InvalidFilter):
+        result = service.query(fake_sid, fake_filters)
+
+
+def test_when_querying_stories_with_fields_should_select_and_return_only_them(db_session, sql_statements):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", description="As a user...", poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.expire_all()
+
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(fake_poker_id)}
+    service = worker_factory(StoryService, db=db_session)
+    sql_statements.clear()
+
+    # act
+    result = service.query(fake_sid, [], fields=["id", "name"], context=fake_context)
+
+    # assert
+    assert result['items'] == [{"id": str(fake_story_id), "name": "Story 1"}]
+    assert len(sql_statements) == 1
+    statement, _ = sql_statements[0]
+    assert 'stories.description' not in statement
+    assert 'events' not in statement
+
+
+def test_when_retrieving_story_with_aliased_fields_should_return_only_them(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.commit()
+
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(fake_poker_id)}
+    service = worker_factory(StoryService, db=db_session)
+
+    # act
+    result = service.retrieve(fake_sid, str(fake_story_id), fields=["pokerId", "order"], context=fake_context)
+
+    # assert
+    assert result == {"pokerId": str(fake_poker_id), "order": 0}
+
+
+@pytest.mark.parametrize("field", ["events", "secret", "poker"])
+def test_when_querying_stories_with_invalid_field_should_cause_error(db_session, field):
+    # arrange
+    fake_sid = '1aaa'
+    fake_context = {"participantId": str(uuid.uuid4()), "pokerId": str(uuid.uuid4())}
+    service = worker_factory(StoryService, db=db_session)
+
+    # act
+    # assert
+    with pytest.raises(InvalidField):
+        service.query(fake_sid, [], fields=[field], context=fake_context)
@@ -5,7 +5,7 @@ from nameko.testing.services import worker_factory
 from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
 
-from base.exceptions import NotFound, InvalidFilter, InvalidInput
+from base.exceptions import NotFound, InvalidFilter, InvalidInput, UnindexedFilter
 from poker.models import Poker
 from story.models import Story
 from polling.models import Polling
@@ -37,7 +37,7 @@ def test_when_retrieving_vote_should_return_as_dict(db_session):
 
     service = worker_factory(VoteService, db=db_session)
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.unicast.side_effect = lambda *args, **kwargs: None
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -55,7 +55,7 @@ def test_when_retrieving_vote_should_return_as_dict(db_session):
     assert result['value'] == "?"
     assert 'participant' in result
     assert type(result['participant']) is dict
-    service.gateway_rpc.unicast.assert_called_once()
+    service.outbox.unicast.assert_called_once()
     service.dispatch.assert_called_once()
 
 
@@ -88,19 +88,9 @@ def test_when_placing_vote_should_return_new_vote_as_dict(db_session):
             "poker_id": str(fake_poker_id),
         }
 
-    def fake_polling_retrieve(*args, **kwargs):
-        return {
-            "id": str(fake_polling_id),
-            "value": "5",
-            "revealed": True,
-            "completed": False,
-            "storyId": str(fake_story_id)
-        }
-
     service = worker_factory(VoteService, db=db_session)
     service.participant_rpc.current.side_effect = fake_participant_current
-    service.polling_rpc.retrieve.side_effect = fake_polling_retrieve
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -113,7 +103,7 @@ def test_when_placing_vote_should_return_new_vote_as_dict(db_session):
     assert 'pollingId' in result
     assert 'participantId' in result
     assert 'participant' in result
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
 
 
@@ -150,20 +140,10 @@ def test_when_placing_vote_again_should_return_updated_vote_as_dict(db_session):
             "poker_id": str(fake_poker_id),
         }
 
-    def fake_polling_retrieve(*args, **kwargs):
-        return {
-            "id": str(fake_polling_id),
-            "value": "5",
-            "revealed": True,
-            "completed": False,
-            "storyId": str(fake_story_id)
-        }
-
     service = worker_factory(VoteService, db=db_session)
     service.participant_rpc.current.side_effect = fake_participant_current
-    service.polling_rpc.retrieve.side_effect = fake_polling_retrieve
     service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -177,7 +157,7 @@ def test_when_placing_vote_again_should_return_updated_vote_as_dict(db_session):
     assert 'pollingId' in result
     assert 'participantId' in result
     assert 'participant' in result
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
 
 
@@ -208,13 +188,9 @@ def test_when_placing_vote_on_non_existing_polling_should_cause_error(db_session
             "poker_id": str(fake_poker_id),
         }
 
-    def fake_polling_retrieve(*args, **kwargs):
-        raise NotFound()
-
     service = worker_factory(VoteService, db=db_session)
     service.participant_rpc.current.side_effect = fake_participant_current
-    service.polling_rpc.retrieve.side_effect = fake_polling_retrieve
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -253,19 +229,9 @@ def test_when_placing_vote_on_completed_polling_should_cause_error(db_session):
             "poker_id": str(fake_poker_id),
         }
 
-    def fake_polling_retrieve(*args, **kwargs):
-        return {
-            "id": str(fake_polling_id),
-            "value": "5",
-            "revealed": True,
-            "completed": True,
-            "storyId": str(fake_story_id)
-        }
-
     service = worker_factory(VoteService, db=db_session)
     service.participant_rpc.current.side_effect = fake_participant_current
-    service.polling_rpc.retrieve.side_effect = fake_polling_retrieve
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -303,20 +269,9 @@ def test_when_placing_vote_should_get_poker_id_from_polling(db_session):
             "poker_id": str(fake_poker_id),
         }
 
-    def fake_polling_retrieve(*args, **kwargs):
-        return {
-            "id": str(fake_polling_id),
-            "value": "5",
-            "revealed": True,
-            "completed": False,
-            "storyId": str(fake_story_id),
-            "pokerId": str(fake_poker_id)
-        }
-
     service = worker_factory(VoteService, db=db_session)
     service.participant_rpc.current.side_effect = fake_participant_current
-    service.polling_rpc.retrieve.side_effect = fake_polling_retrieve
-    service.gateway_rpc.broadcast.side_effect = lambda *args, **kwargs: None
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
     service.dispatch.side_effect = lambda *args, **kwargs: None
 
     # act
@@ -332,5 +287,116 @@ def test_when_placing_vote_should_get_poker_id_from_polling(db_session):
     assert 'pokerId' in result
     assert result['pokerId'] is not None
     assert result['pokerId'] == str(fake_poker_id)
-    service.gateway_rpc.broadcast.assert_called()
+    service.outbox.broadcast.assert_called()
     service.dispatch.assert_called()
+
+
+def test_when_placing_vote_with_request_context_should_not_resolve_session_again(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_participant_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    fake_payload = {
+        "value": "1",
+        "pollingId": str(fake_polling_id)
+    }
+    fake_context = {
+        "participantId": str(fake_participant_id),
+        "pokerId": str(fake_poker_id),
+        "keycloakUserId": None
+    }
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.add(Participant(id=fake_participant_id, poker_id=fake_poker_id, name="Arthur", sid=fake_sid))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.commit()
+    db_session.add(Vote(value="?", polling_id=fake_polling_id, participant_id=fake_participant_id,
+                        poker_id=fake_poker_id))
+    db_session.commit()
+
+    service = worker_factory(VoteService, db=db_session)
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    result = service.place(fake_sid, fake_payload, context=fake_context)
+
+    # assert
+    assert result['value'] == "1"
+    assert result['participantId'] == str(fake_participant_id)
+    service.participant_rpc.current.assert_not_called()
+    # the polling is read from the database, not asked to the polling service
+    assert not hasattr(service, 'polling_rpc')
+    service.gateway_rpc.get_current_poker_id.assert_not_called()
+
+
+def test_when_querying_votes_by_unindexed_range_should_cause_error(db_session):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+
+    fake_filters = [
+        {
+            "attr": "created_at",
+            "op": "since",
+            "value": "2024-01-01T00:00:00"
+        }
+    ]
+
+    service = worker_factory(VoteService, db=db_session)
+    service.gateway_rpc.get_current_poker_id.side_effect = lambda *args, **kwargs: fake_poker_id
+    service.outbox.unicast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    # assert
+    with pytest.raises(UnindexedFilter):
+        result = service.query(fake_sid, fake_filters)
+
+
+def test_when_placing_vote_twice_should_keep_single_vote_and_broadcast_once_per_place(db_session, sql_statements):
+    # arrange
+    fake_sid = '1aaa'
+    fake_poker_id = uuid.uuid4()
+    fake_participant_id = uuid.uuid4()
+    fake_story_id = uuid.uuid4()
+    fake_polling_id = uuid.uuid4()
+
+    fake_context = {
+        "participantId": str(fake_participant_id),
+        "pokerId": str(fake_poker_id),
+    }
+
+    db_session.add(Poker(id=fake_poker_id, creator='user@test.com'))
+    db_session.commit()
+    db_session.add(Story(id=fake_story_id, name="Story 1", poker_id=fake_poker_id))
+    db_session.add(Participant(id=fake_participant_id, poker_id=fake_poker_id, name="Arthur", sid=fake_sid))
+    db_session.commit()
+    db_session.add(Polling(id=fake_polling_id, story_id=fake_story_id, poker_id=fake_poker_id))
+    db_session.commit()
+
+    service = worker_factory(VoteService, db=db_session)
+    service.outbox.broadcast.side_effect = lambda *args, **kwargs: None
+    service.dispatch.side_effect = lambda *args, **kwargs: None
+
+    # act
+    first = service.place(fake_sid, {"value": "1", "pollingId": str(fake_polling_id)}, context=fake_context)
+    sql_statements.clear()
+    second = service.place(fake_sid, {"value": "8", "pollingId": str(fake_polling_id)}, context=fake_context)
+
+    # assert
+    writes = [statement for statement, _ in sql_statements if statement.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+    assert len(writes) == 1
+    assert second['id'] == first['id']
+    assert second['value'] == "8"
+    assert second['version'] == first['version'] + 1
+    assert db_session.query(Vote).filter(Vote.polling_id == fake_polling_id).count() == 1
+    assert service.outbox.broadcast.call_count == 2
+    service.outbox.broadcast.assert_called_with(f'story:{fake_story_id}', "vote_placed", second)
+    assert service.dispatch.call_count == 2
@@ -1,17 +1,35 @@
 import logging
+from typing import Optional
 from uuid import UUID
 from nameko.rpc import rpc, RpcProxy
+from nameko.events import event_handler, BROADCAST
 from nameko.exceptions import RemoteError
-from nameko.web.websocket import rpc as ws, WebSocketHub, WebSocketHubProvider
+from nameko.web.websocket import WebSocketHub
+
+from sessions import SessionCache, Sessions, SessionWebSocketHubProvider
+from transport import rpc as ws
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+# a line per request and pushed message; its level is set apart on the LOGGING config
+request_logger = logging.getLogger('gateway.requests')
+
+# methods that bind the sid to a participant, or don't depend on it, are called without a request context
+UNSCOPED_METHODS = {
+    ('participant_service', 'create'),
+    ('participant_service', 'update'),
+    ('participant_service', 'join'),
+    ('poker_service', 'start'),
+    ('poker_service', 'history'),
+}
+
+STREAM_PAGE_SIZE = 100
 
 
 class GatewayService:
     name = "gateway_service"
 
-    hub: WebSocketHub = WebSocketHubProvider()
+    hub: WebSocketHub = SessionWebSocketHubProvider()
+    sessions: SessionCache = Sessions()
 
     poker_rpc = RpcProxy("poker_service")
     story_rpc = RpcProxy("story_service")
@@ -22,8 +40,7 @@ class GatewayService:
     polling_rpc = RpcProxy("polling_service")
     invite_rpc = RpcProxy("invite_service")
 
-    @ws
-    def request(self, sid, service, method, data, transaction_id=None):
+    def get_service_rpc(self, service):
         services = {
             'poker_service': self.poker_rpc,
             'story_service': self.story_rpc,
@@ -34,28 +51,63 @@ class GatewayService:
             'polling_service': self.polling_rpc,
             'invite_service': self.invite_rpc
         }
+        return services.get(service)
 
-        logger.debug(f'called {service}:{method} by {sid}')
+    @ws
+    def request(self, sid, service, method, data, transaction_id=None):
+        request_logger.debug('called %s:%s by %s', service, method, sid)
 
         if sid is None:
             return
 
+        return self.call(sid, service, method, data, transaction_id)
+
+    @ws
+    def stream(self, sid, service, data, transaction_id=None):
+        """
+        Calls the paginated query of a service until there are no pages left.
+        Every page is unicasted to the client by the service as soon as it is
+        produced, so the returned envelope only holds the last page.
+        """
+        request_logger.debug('streaming %s:query to %s', service, sid)
+
+        if sid is None:
+            return
+
+        data = {'limit': STREAM_PAGE_SIZE, **data}
+        response = self.call(sid, service, 'query', data, transaction_id)
+        while response['success'] and response['result']['metadata']['nextCursor'] is not None:
+            data = {**data, 'cursor': response['result']['metadata']['nextCursor']}
+            response = self.call(sid, service, 'query', data, transaction_id)
+
+        return response
+
+    def call(self, sid, service, method, data, transaction_id=None):
         result = None
         error = None
         success = False
 
-        service_rpc = services.get(service)
+        service_rpc = self.get_service_rpc(service)
         method_inst = getattr(service_rpc, method)
 
         try:
-            result = method_inst(sid=sid, **data)
+            # resolving the context may fail too, which must be answered like any other error
+            context = None
+            if (service, method) not in UNSCOPED_METHODS:
+                context = self.get_context(sid)
+
+            result = method_inst(sid=sid, context=context, **data)
             success = True
+            if service == 'participant_service' and method in ('create', 'join'):
+                self.sessions.set(sid, result)
         except RemoteError as exc:
-            logger.error(f'error caused when calling {service}:{method} by {sid}. exception: {exc.value}')
+            logger.error('error caused when calling %s:%s by %s. exception: %s', service, method, sid, exc.value)
             error = {
                 'exc_type': exc.exc_type,
                 'value': exc.value,
                 'args': exc.args,
+                # the entity changed since the client loaded it; it must be loaded again before retrying
+                'conflict': exc.exc_type == 'VersionConflict',
             }
 
         return {
@@ -67,31 +119,98 @@ class GatewayService:
             'transaction_id': transaction_id,
         }
     
+    def get_current_participant(self, sid) -> Optional[dict]:
+        participant = self.sessions.get(sid)
+        if participant is not None:
+            return participant
+
+        try:
+            participant = self.participant_rpc.current(sid)
+        except RemoteError as exc:
+            if exc.exc_type != 'NotFound':
+                raise
+            return None  # sid not bound to any participant yet
+
+        self.sessions.set(sid, participant)
+        return participant
+
+    def get_context(self, sid) -> Optional[dict]:
+        """
+        Resolves the session used by the sid, which is sent to the services along
+        with the request
+        """
+        participant = self.get_current_participant(sid)
+        if participant is None:
+            return None
+        return {
+            'participantId': participant['id'],
+            'pokerId': participant['pokerId'],
+            'keycloakUserId': participant['keycloakUserId'],
+        }
+
     @rpc
     def get_current_poker_id(self, sid):
-        participant = self.participant_rpc.current(sid)
+        participant = self.get_current_participant(sid)
         if participant is None:
             return None
         return UUID(participant['pokerId'])
 
+    @rpc
+    def get_session_cache_stats(self):
+        return self.sessions.stats()
+
+    @event_handler("participant_service", "participant_updated", handler_type=BROADCAST, reliable_delivery=False)
+    def handle_participant_updated(self, payload: dict):
+        # the updated participant becomes the latest one bound to its sid
+        self.sessions.invalidate_participant(payload['id'])
+        self.sessions.set(payload['sid'], payload)
+
+    @event_handler("participant_service", "participant_deleted", handler_type=BROADCAST, reliable_delivery=False)
+    def handle_participant_deleted(self, payload: dict):
+        self.sessions.invalidate_participant(payload['id'])
+
     @rpc
     def unicast(self, sid, event, data):
-        logger.debug(f'unicasted event {event} to sid {sid}')
+        request_logger.debug('unicasted event %s to sid %s', event, sid)
         self.hub.unicast(sid, event, data)
 
     @rpc
     def broadcast(self, channel, event, data):
-        logger.debug(f'broadcasted event {event} to channel {channel}')
+        request_logger.debug('broadcasted event %s to channel %s', event, channel)
         self.hub.broadcast(channel, event, data)
 
+    @rpc
+    def broadcast_many(self, messages):
+        self.deliver(messages)
+
+    @event_handler("poker_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    @event_handler("story_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    @event_handler("participant_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    @event_handler("event_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    @event_handler("vote_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    @event_handler("polling_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    @event_handler("invite_service", "gateway_push", handler_type=BROADCAST, reliable_delivery=False)
+    def handle_push(self, messages):
+        # every gateway instance receives the pushed messages and delivers them to its own websockets
+        self.deliver(messages)
+
+    def deliver(self, messages):
+        # messages are sent in order; each one is either a broadcast or a unicast
+        for message in messages:
+            if message['type'] == 'unicast':
+                self.hub.unicast(message['target'], message['event'], message['data'])
+            else:
+                self.hub.broadcast(message['target'], message['event'], message['data'])
+        request_logger.debug('sent %s batched events', len(messages))
+
     @ws
     @rpc
     def subscribe(self, sid, channel):
-        logger.debug(f'subscribed {sid} to channel {channel}')
+        logger.debug('subscribed %s to channel %s', sid, channel)
         self.hub.subscribe(sid, channel)
 
     @ws
     @rpc
     def unsubscribe(self, sid, channel):
-        logger.debug(f'unsubscribed {sid} from channel {channel}')
+        logger.debug('unsubscribed %s from channel %s', sid, channel)
         self.hub.unsubscribe(sid, channel)
@@ -0,0 +1,72 @@
+from typing import Optional
+
+from nameko.extensions import DependencyProvider, SharedExtension
+
+from transport import EncodingWebSocketHubProvider
+
+
+class SessionCache(SharedExtension):
+    """
+    Keeps the participant currently bound to each websocket SID, so resolving
+    which poker session is being interacted doesn't need to reach the
+    participant service on every request.
+
+    Entries are kept in memory, therefore each gateway instance has its own
+    cache. Entries must be invalidated whenever the participant bound to a SID
+    might have changed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sid) -> Optional[dict]:
+        participant = self.entries.get(sid)
+        if participant is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return participant
+
+    def set(self, sid, participant: dict):
+        self.entries[sid] = {
+            'id': participant['id'],
+            'pokerId': participant['pokerId'],
+            'keycloakUserId': participant.get('keycloakUserId'),
+        }
+
+    def invalidate(self, sid):
+        self.entries.pop(sid, None)
+
+    def invalidate_participant(self, participant_id: str):
+        stale_sids = [sid for sid, participant in self.entries.items() if participant['id'] == participant_id]
+        for sid in stale_sids:
+            self.entries.pop(sid, None)
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class Sessions(DependencyProvider):
+    cache = SessionCache()
+
+    def get_dependency(self, worker_ctx):
+        return self.cache
+
+
+class SessionWebSocketHubProvider(EncodingWebSocketHubProvider):
+    """
+    Websocket hub that drops the cached session of a SID once its connection
+    is closed
+    """
+    cache = SessionCache()
+
+    def cleanup_websocket(self, socket_id):
+        super().cleanup_websocket(socket_id)
+        self.cache.invalidate(socket_id)
@@ -0,0 +1,169 @@
+import json
+from typing import Dict
+
+import msgpack
+from eventlet.websocket import WebSocketWSGI
+from nameko.exceptions import MalformedRequest, serialize
+from nameko.web.websocket import WebSocketServer, WebSocketHub, WebSocketHubProvider, WebSocketRpc
+
+WEBSOCKET_DEFLATE_KEY = 'WEBSOCKET_DEFLATE'
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# encodings a client can ask for on `Sec-WebSocket-Protocol`; without any, JSON is used
+SUBPROTOCOLS = {
+    'estimate.msgpack': MSGPACK,
+    'estimate.json': JSON,
+}
+
+
+def encode(encoding: str, payload):
+    """
+    Encodes a message for the wire. MessagePack is sent as binary frames and
+    JSON as text frames.
+    """
+    if encoding == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload)
+
+
+def decode(frame):
+    if isinstance(frame, bytes):
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+
+class NegotiatingWebSocketWSGI(WebSocketWSGI):
+    """
+    Negotiates the subprotocol (message encoding) of the connection and,
+    unless disabled, the per-message deflate compression offered by the client
+    """
+
+    def __init__(self, handler, deflate: bool = True):
+        super().__init__(handler)
+        self.supported_protocols = list(SUBPROTOCOLS)
+        self.deflate = deflate
+
+    def _negotiate_permessage_deflate(self, extensions):
+        if not self.deflate:
+            return None
+        return super()._negotiate_permessage_deflate(extensions)
+
+
+class EncodingWebSocketServer(WebSocketServer):
+    """
+    Websocket server which encodes the messages of each connection as
+    negotiated on its handshake
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.encodings: Dict[str, str] = {}
+
+    def get_encoding(self, socket_id) -> str:
+        return self.encodings.get(socket_id, JSON)
+
+    def deserialize_ws_frame(self, payload):
+        try:
+            data = decode(payload)
+            return (
+                data['method'],
+                data.get('data') or {},
+                data.get('correlation_id'),
+            )
+        except Exception:
+            raise MalformedRequest('Invalid request frame')
+
+    def serialize_event_as(self, encoding: str, event, data):
+        return encode(encoding, {
+            'type': 'event',
+            'event': event,
+            'data': data,
+        })
+
+    def websocket_mainloop(self, initial_context_data):
+        def handler(ws):
+            socket_id, context_data = self.add_websocket(ws, initial_context_data)
+            encoding = SUBPROTOCOLS.get(ws.protocol, JSON)
+            self.encodings[socket_id] = encoding
+            try:
+                ws.send(self.serialize_event_as(encoding, 'connected', {'socket_id': socket_id}))
+
+                while 1:
+                    raw_req = ws.wait()
+                    if raw_req is None:
+                        break
+                    ws.send(self.handle_websocket_request(socket_id, context_data, raw_req))
+            finally:
+                self.remove_socket(socket_id)
+
+        deflate = self.container.config.get(WEBSOCKET_DEFLATE_KEY, True)
+        return NegotiatingWebSocketWSGI(handler, deflate=deflate)
+
+    def handle_websocket_request(self, socket_id, context_data, raw_req):
+        correlation_id = None
+        try:
+            method, data, correlation_id = self.deserialize_ws_frame(raw_req)
+            provider = self.get_provider_for_method(method)
+            result = provider.handle_message(socket_id, data, context_data)
+            response = {
+                'type': 'result',
+                'success': True,
+                'data': result,
+                'correlation_id': correlation_id,
+            }
+        except Exception as exc:
+            response = {
+                'type': 'result',
+                'success': False,
+                'error': serialize(exc),
+                'correlation_id': correlation_id,
+            }
+
+        return encode(self.get_encoding(socket_id), response)
+
+    def remove_socket(self, socket_id):
+        super().remove_socket(socket_id)
+        self.encodings.pop(socket_id, None)
+
+
+class EncodingWebSocketHub(WebSocketHub):
+    """
+    Websocket hub which encodes a broadcast once per encoding used on the
+    channel, instead of once per connection
+    """
+
+    def broadcast(self, channel, event, data):
+        payloads = {}
+        for socket_id in self.subscriptions.get(channel, ()):
+            rv = self._server.sockets.get(socket_id)
+            if rv is None:
+                continue
+            encoding = self._server.get_encoding(socket_id)
+            payload = payloads.get(encoding)
+            if payload is None:
+                payload = payloads[encoding] = self._server.serialize_event_as(encoding, event, data)
+            rv.socket.send(payload)
+
+    def unicast(self, socket_id, event, data):
+        rv = self._server.sockets.get(socket_id)
+        if rv is None:
+            return False
+        rv.socket.send(self._server.serialize_event_as(self._server.get_encoding(socket_id), event, data))
+        return True
+
+
+class EncodingWebSocketHubProvider(WebSocketHubProvider):
+    server = EncodingWebSocketServer()
+
+    def setup(self):
+        self.hub = EncodingWebSocketHub(self.server)
+        self.server.register_provider(self)
+
+
+class EncodingWebSocketRpc(WebSocketRpc):
+    server = EncodingWebSocketServer()
+
+
+rpc = EncodingWebSocketRpc.decorator
@@ -0,0 +1,21 @@
+from nameko.exceptions import RemoteError
+from nameko.testing.services import worker_factory
+
+from main import GatewayService
+
+
+def test_when_resolving_context_fails_should_answer_with_error_envelope():
+    # arrange
+    fake_sid = '1aaa'
+    service = worker_factory(GatewayService)
+    service.sessions.get.return_value = None
+    service.participant_rpc.current.side_effect = RemoteError('DatabaseError', 'connection refused')
+
+    # act
+    result = service.call(fake_sid, 'story_service', 'query', {'filters': []}, transaction_id='1')
+
+    # assert
+    assert result['success'] is False
+    assert result['transaction_id'] == '1'
+    assert result['error']['exc_type'] == 'DatabaseError'
+    service.story_rpc.query.assert_not_called()
@@ -0,0 +1,137 @@
+from unittest.mock import Mock
+
+from nameko.exceptions import RemoteError
+from nameko.testing.services import worker_factory
+
+from main import GatewayService
+from sessions import SessionCache, SessionWebSocketHubProvider
+from transport import EncodingWebSocketServer, EncodingWebSocketHub
+
+
+def _participant(participant_id: str, poker_id: str, sid: str) -> dict:
+    return {'id': participant_id, 'pokerId': poker_id, 'keycloakUserId': None, 'sid': sid, 'name': 'Arthur'}
+
+
+def _create_hub_provider(cache: SessionCache) -> EncodingWebSocketServer:
+    server = EncodingWebSocketServer()
+    provider = SessionWebSocketHubProvider()
+    provider.server = server
+    provider.cache = cache
+    provider.hub = EncodingWebSocketHub(server)
+    server.register_provider(provider)
+    return server
+
+
+def test_when_resolving_context_twice_should_ask_participant_service_once():
+    # arrange
+    fake_sid = '1aaa'
+    cache = SessionCache()
+    service = worker_factory(GatewayService, sessions=cache)
+    service.participant_rpc.current.return_value = _participant('1', 'poker-1', fake_sid)
+
+    # act
+    first = service.get_context(fake_sid)
+    second = service.get_context(fake_sid)
+
+    # assert
+    assert first == second == {'participantId': '1', 'pokerId': 'poker-1', 'keycloakUserId': None}
+    service.participant_rpc.current.assert_called_once_with(fake_sid)
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+
+
+def test_when_joining_should_fill_cache_with_participant():
+    # arrange
+    fake_sid = '1aaa'
+    cache = SessionCache()
+    service = worker_factory(GatewayService, sessions=cache)
+    service.participant_rpc.join.return_value = _participant('1', 'poker-1', fake_sid)
+
+    # act
+    service.call(fake_sid, 'participant_service', 'join', {'entity_id': '1', 'payload': {}})
+    context = service.get_context(fake_sid)
+
+    # assert
+    assert context['pokerId'] == 'poker-1'
+    service.participant_rpc.current.assert_not_called()
+    assert cache.stats()['hits'] == 1
+
+
+def test_when_sid_is_not_bound_should_count_misses_and_not_cache():
+    # arrange
+    fake_sid = '1aaa'
+    cache = SessionCache()
+    service = worker_factory(GatewayService, sessions=cache)
+    service.participant_rpc.current.side_effect = RemoteError('NotFound')
+
+    # act
+    first = service.get_context(fake_sid)
+    second = service.get_context(fake_sid)
+
+    # assert
+    assert first is None and second is None
+    assert service.participant_rpc.current.call_count == 2
+    assert cache.stats() == {'size': 0, 'hits': 0, 'misses': 2}
+
+
+def test_when_websocket_disconnects_should_invalidate_its_session():
+    # arrange
+    cache = SessionCache()
+    server = _create_hub_provider(cache)
+    socket_id, _ = server.add_websocket(Mock())
+    other_socket_id, _ = server.add_websocket(Mock())
+    cache.set(socket_id, _participant('1', 'poker-1', socket_id))
+    cache.set(other_socket_id, _participant('2', 'poker-1', other_socket_id))
+
+    # act
+    server.remove_socket(socket_id)
+
+    # assert
+    assert cache.get(socket_id) is None
+    assert cache.get(other_socket_id)['id'] == '2'
+    assert socket_id not in server.encodings
+
+
+def test_when_participant_moves_to_another_sid_should_not_keep_old_sid_bound():
+    # arrange
+    cache = SessionCache()
+    cache.set('1aaa', _participant('1', 'poker-1', '1aaa'))
+    cache.set('2bbb', _participant('2', 'poker-2', '2bbb'))
+    service = worker_factory(GatewayService, sessions=cache)
+
+    # act
+    service.handle_participant_updated(_participant('1', 'poker-1', '3ccc'))
+
+    # assert
+    assert cache.get('1aaa') is None
+    assert cache.get('3ccc')['id'] == '1'
+    assert cache.get('2bbb')['pokerId'] == 'poker-2'
+
+
+def test_when_participant_rejoins_sid_used_in_another_room_should_replace_its_session():
+    # arrange
+    cache = SessionCache()
+    cache.set('1aaa', _participant('1', 'poker-1', '1aaa'))
+    service = worker_factory(GatewayService, sessions=cache)
+
+    # act
+    service.handle_participant_updated(_participant('2', 'poker-2', '1aaa'))
+
+    # assert
+    assert cache.get('1aaa') == {'id': '2', 'pokerId': 'poker-2', 'keycloakUserId': None}
+
+
+def test_when_participant_is_deleted_should_invalidate_all_of_its_sids():
+    # arrange
+    cache = SessionCache()
+    cache.set('1aaa', _participant('1', 'poker-1', '1aaa'))
+    cache.set('2bbb', _participant('1', 'poker-1', '2bbb'))
+    cache.set('3ccc', _participant('2', 'poker-1', '3ccc'))
+    service = worker_factory(GatewayService, sessions=cache)
+
+    # act
+    service.handle_participant_deleted(_participant('1', 'poker-1', '2bbb'))
+
+    # assert
+    assert cache.get('1aaa') is None
+    assert cache.get('2bbb') is None
+    assert cache.get('3ccc')['id'] == '2'
@@ -0,0 +1,214 @@
+import json
+from unittest.mock import Mock
+
+import msgpack
+
+from transport import EncodingWebSocketServer, EncodingWebSocketHub, JSON, MSGPACK, encode, decode
+
+WEBSOCKET_KEY = 'dGhlIHNhbXBsZSBub25jZQ=='
+
+# first byte of an unfragmented frame: FIN, RSV1 (compressed) and the opcode
+TEXT_FRAME = 0x81
+BINARY_FRAME = 0x82
+COMPRESSED = 0x40
+
+
+class FakeSocket:
+    """
+    Socket of a client which closes the connection right after the handshake
+    """
+
+    def __init__(self):
+        self.sent = b''
+
+    def sendall(self, data):
+        self.sent += data
+
+    def recv(self, size):
+        return b''
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+def _create_server(config: dict = None) -> EncodingWebSocketServer:
+    server = EncodingWebSocketServer()
+    server.container = Mock(config=config or {})
+    return server
+
+
+def _connect(server: EncodingWebSocketServer, protocols: str = None, extensions: str = None):
+    """
+    Opens a websocket on the server, returning the handshake reply and the
+    first frame sent by the server
+    """
+    sock = FakeSocket()
+    environ = {
+        'HTTP_CONNECTION': 'Upgrade',
+        'HTTP_UPGRADE': 'websocket',
+        'HTTP_SEC_WEBSOCKET_VERSION': '13',
+        'HTTP_SEC_WEBSOCKET_KEY': WEBSOCKET_KEY,
+        'eventlet.input': Mock(get_socket=lambda: sock),
+    }
+    if protocols is not None:
+        environ['HTTP_SEC_WEBSOCKET_PROTOCOL'] = protocols
+    if extensions is not None:
+        environ['HTTP_SEC_WEBSOCKET_EXTENSIONS'] = extensions
+
+    server.websocket_mainloop({})(environ, Mock())
+
+    handshake, frames = sock.sent.split(b'\r\n\r\n', 1)
+    return handshake.decode(), frames
+
+
+def _add_socket(server: EncodingWebSocketServer, encoding: str) -> str:
+    socket_id, _ = server.add_websocket(Mock())
+    server.encodings[socket_id] = encoding
+    return socket_id
+
+
+def test_when_client_asks_for_msgpack_should_send_binary_frames():
+    # arrange
+    server = _create_server()
+
+    # act
+    handshake, frames = _connect(server, protocols='estimate.msgpack, estimate.json')
+
+    # assert
+    assert 'Sec-WebSocket-Protocol: estimate.msgpack' in handshake
+    assert frames[0] == BINARY_FRAME
+    length = frames[1]
+    assert msgpack.unpackb(frames[2:2 + length])['event'] == 'connected'
+
+
+def test_when_client_asks_for_no_protocol_should_send_json_text_frames():
+    # arrange
+    server = _create_server()
+
+    # act
+    handshake, frames = _connect(server)
+
+    # assert
+    assert 'Sec-WebSocket-Protocol' not in handshake
+    assert frames[0] == TEXT_FRAME
+    length = frames[1]
+    assert json.loads(frames[2:2 + length])['event'] == 'connected'
+
+
+def test_when_client_asks_for_unknown_protocol_should_fall_back_to_json():
+    # arrange
+    server = _create_server()
+
+    # act
+    handshake, frames = _connect(server, protocols='estimate.xml')
+
+    # assert
+    assert 'Sec-WebSocket-Protocol' not in handshake
+    assert frames[0] == TEXT_FRAME
+
+
+def test_when_client_offers_deflate_should_compress_frames():
+    # arrange
+    server = _create_server()
+
+    # act
+    handshake, frames = _connect(server, extensions='permessage-deflate')
+
+    # assert
+    assert 'Sec-WebSocket-Extensions: permessage-deflate' in handshake
+    assert frames[0] == TEXT_FRAME | COMPRESSED
+
+
+def test_when_deflate_is_disabled_should_not_compress_frames():
+    # arrange
+    server = _create_server({'WEBSOCKET_DEFLATE': False})
+
+    # act
+    handshake, frames = _connect(server, extensions='permessage-deflate')
+
+    # assert
+    assert 'Sec-WebSocket-Extensions' not in handshake
+    assert frames[0] == TEXT_FRAME
+
+
+def test_when_socket_is_removed_should_forget_its_encoding():
+    # arrange
+    server = _create_server()
+    socket_id = _add_socket(server, MSGPACK)
+
+    # act
+    server.remove_socket(socket_id)
+
+    # assert
+    assert server.get_encoding(socket_id) == JSON
+
+
+def test_when_broadcasting_should_encode_once_per_encoding():
+    # arrange
+    server = _create_server()
+    server.serialize_event_as = Mock(wraps=server.serialize_event_as)
+    hub = EncodingWebSocketHub(server)
+    json_sockets = [_add_socket(server, JSON) for _ in range(3)]
+    msgpack_sockets = [_add_socket(server, MSGPACK) for _ in range(2)]
+    for socket_id in json_sockets + msgpack_sockets:
+        hub.subscribe(socket_id, 'poker:1')
+
+    # act
+    hub.broadcast('poker:1', 'story_updated', {'id': '1'})
+
+    # assert
+    assert server.serialize_event_as.call_count == 2
+    expected = {'type': 'event', 'event': 'story_updated', 'data': {'id': '1'}}
+    for socket_id in json_sockets:
+        server.sockets[socket_id].socket.send.assert_called_once_with(encode(JSON, expected))
+    for socket_id in msgpack_sockets:
+        server.sockets[socket_id].socket.send.assert_called_once_with(encode(MSGPACK, expected))
+
+
+def test_when_broadcasting_should_skip_closed_sockets():
+    # arrange
+    server = _create_server()
+    hub = EncodingWebSocketHub(server)
+    socket_id = _add_socket(server, JSON)
+    closed_socket_id = _add_socket(server, MSGPACK)
+    hub.subscribe(socket_id, 'poker:1')
+    hub.subscribe(closed_socket_id, 'poker:1')
+    closed_socket = server.sockets.pop(closed_socket_id).socket
+
+    # act
+    hub.broadcast('poker:1', 'story_updated', {'id': '1'})
+
+    # assert
+    server.sockets[socket_id].socket.send.assert_called_once()
+    closed_socket.send.assert_not_called()
+
+
+def test_when_unicasting_should_use_encoding_of_socket():
+    # arrange
+    server = _create_server()
+    hub = EncodingWebSocketHub(server)
+    socket_id = _add_socket(server, MSGPACK)
+
+    # act
+    sent = hub.unicast(socket_id, 'poker_snapshot', {'id': '1'})
+
+    # assert
+    assert sent is True
+    payload = server.sockets[socket_id].socket.send.call_args.args[0]
+    assert decode(payload) == {'type': 'event', 'event': 'poker_snapshot', 'data': {'id': '1'}}
+    assert hub.unicast('unknown', 'poker_snapshot', {}) is False
+
+
+def test_when_request_frame_is_msgpack_should_decode_it():
+    # arrange
+    server = _create_server()
+    frame = msgpack.packb({'method': 'request', 'data': {'sid': '1'}, 'correlation_id': 7})
+
+    # act
+    result = server.deserialize_ws_frame(frame)
+
+    # assert
+    assert result == ('request', {'sid': '1'}, 7)